@@ -0,0 +1,243 @@
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+import types
+
+# ビアフェンスと四角い配線の生成処理が配線数に対してどう伸びるかを,KiCadなしで計測するベンチマーク
+# pcbnewはfake_pcbnewで置き換え,プラグインのパッケージは__init__(ActionPluginの登録とwxの読み込み)を通さずに読み込む
+# 例: python benchmarks/bench.py --sizes 100 1000 5000 --json bench.json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_pcbnew as pcbnew  # noqa: E402
+sys.modules["pcbnew"] = pcbnew
+
+
+def _package(name, path):  # __init__.pyを実行せずにサブモジュールだけを読み込めるパッケージを登録する
+    module = types.ModuleType(name)
+    module.__path__ = [path]
+    sys.modules[name] = module
+
+
+_package("plugins", os.path.join(ROOT, "plugins"))
+_package("plugins.via_fence_generator", os.path.join(ROOT, "plugins", "via_fence_generator"))
+_package("plugins.square_track_generator", os.path.join(ROOT, "plugins", "square_track_generator"))
+
+from plugins.via_fence_generator import fence  # noqa: E402
+from plugins.square_track_generator import square  # noqa: E402
+from plugins.board_commit import BatchCommit  # noqa: E402
+
+WIDTH = pcbnew.FromMM(0.3)
+VIA_DIAMETER = pcbnew.FromMM(0.6)
+VIA_DRILL = pcbnew.FromMM(0.3)
+CLEARANCE = pcbnew.FromMM(0.2)
+
+
+# 合成した配線 -------------------------------------------------------------
+
+def lines_scenario(n, rng):  # 角度を少しずつ変えながらつながるn本の直線
+    tracks = []
+    x, y, angle = 0.0, 0.0, 0.0
+    for _ in range(n):
+        angle += rng.uniform(-0.5, 0.5)
+        length = pcbnew.FromMM(rng.uniform(1, 4))
+        nx, ny = x + length * math.cos(angle), y + length * math.sin(angle)
+        tracks.append(pcbnew.PCB_TRACK(pcbnew.VECTOR2I(x, y), pcbnew.VECTOR2I(nx, ny), WIDTH))
+        x, y = tracks[-1].GetEnd().x, tracks[-1].GetEnd().y
+    return tracks
+
+
+def arcs_scenario(n, rng):  # 半径0.5mmから20mmまでばらばらなn本の円弧 互いに重ならないよう格子状に置く
+    tracks = []
+    columns = max(1, int(math.sqrt(n)))
+    for i in range(n):
+        center = pcbnew.VECTOR2I(pcbnew.FromMM(50 * (i % columns)), pcbnew.FromMM(50 * (i // columns)))
+        radius = pcbnew.FromMM(rng.uniform(0.5, 20))
+        tracks.append(pcbnew.PCB_ARC(center, radius, rng.uniform(-math.pi, math.pi), rng.uniform(-2 * math.pi, 2 * math.pi), WIDTH))
+    return tracks
+
+
+def meander_scenario(n, rng):  # 直線と90度の円弧を交互につないだn本の蛇行配線
+    tracks = []
+    radius = pcbnew.FromMM(1)
+    leg = pcbnew.FromMM(3)
+    x, y = 0, 0
+    direction = 1  # 1=上向き -1=下向き
+    while len(tracks) < n:
+        end_y = y + direction * leg
+        tracks.append(pcbnew.PCB_TRACK(pcbnew.VECTOR2I(x, y), pcbnew.VECTOR2I(x, end_y), WIDTH))
+        # 上端(下端)で2つの四分円を使って折り返す
+        center = pcbnew.VECTOR2I(x + radius, end_y)
+        start_angle = math.pi if direction == 1 else -math.pi
+        sweep = direction * math.pi  # 角度はKiCadと同じくy軸下向き
+        tracks.append(pcbnew.PCB_ARC(center, radius, start_angle, sweep / 2, WIDTH))
+        tracks.append(pcbnew.PCB_ARC(center, radius, start_angle + sweep / 2, sweep / 2, WIDTH))
+        x, y = x + 2 * radius, end_y
+        direction = -direction
+    return tracks[:n]
+
+
+def pairs_scenario(n, rng):  # lines_scenarioの配線と,その左側を中心間隔0.5mmで並走する配線をn/2本ずつ並べた差動ペア
+    tracks = lines_scenario((n + 1) // 2, rng)
+    spacing = pcbnew.FromMM(0.5)
+    partners = []
+    for track in tracks:
+        start, end = track.GetStart(), track.GetEnd()
+        length = math.hypot(end.x - start.x, end.y - start.y)
+        nx, ny = -(end.y - start.y) / length * spacing, (end.x - start.x) / length * spacing
+        partners.append(pcbnew.PCB_TRACK(pcbnew.VECTOR2I(start.x + nx, start.y + ny), pcbnew.VECTOR2I(end.x + nx, end.y + ny), WIDTH))
+    return (tracks + partners)[:n]
+
+
+SCENARIOS = {"lines": lines_scenario, "arcs": arcs_scenario, "meander": meander_scenario, "pairs": pairs_scenario}
+
+
+def make_board(tracks):
+    board = pcbnew.BOARD()
+    net = board.FindNet("RF")
+    for track in tracks:
+        track.SetNet(net)
+        board.Add(track)
+    return board
+
+
+# 変更前の実装(配線ごとのスカラー計算と総当たりの重複判定) 比較用 ---------------
+
+def legacy_fence(tracks, via_diameter, clearance):
+    positions = []
+    comparisons = 0
+
+    def append_position(pos):
+        nonlocal comparisons
+        for stored in positions:
+            comparisons += 1
+            if math.dist(stored, pos) < pcbnew.FromMM(0.1):
+                return
+        positions.append(pos)
+
+    for track in tracks:
+        start, end, width = track.GetStart(), track.GetEnd(), track.GetWidth()
+        offset = width // 2 + via_diameter // 2 + clearance
+        if track.GetClass() == "PCB_TRACK":
+            length = track.GetLength()
+            DX, DY = end.x - start.x, end.y - start.y
+            dx, dy = int(offset * -DY / length), int(offset * DX / length)
+            via_num = 1 + int(length / via_diameter)
+            for step in range(via_num):
+                x = start.x + (step * int(DX / (via_num - 1)) if via_num > 1 else 0)
+                y = start.y + (step * int(DY / (via_num - 1)) if via_num > 1 else 0)
+                append_position([x - dx, y - dy])
+                append_position([x + dx, y + dy])
+        else:
+            center, radius = track.GetCenter(), track.GetRadius()
+            angle_disp, angle_start = track.GetAngle().AsRadians(), track.GetArcAngleStart().AsRadians()
+            for r, usable in ((radius - offset, offset <= radius), (radius + offset, True)):
+                if not usable:
+                    continue
+                num = 1 if via_diameter**2 > 4 * r**2 else 1 + int(abs(angle_disp) / math.acos(1 - via_diameter**2 / (2 * r**2)))
+                for step in range(num):
+                    angle = angle_start + (step * angle_disp / (num - 1) if num > 1 else 0)
+                    append_position([center.x + int(r * math.cos(angle)), center.y + int(r * math.sin(angle))])
+    return positions, comparisons
+
+
+def legacy_square_vertices(tracks):  # 0.1度刻みで円弧を分割していたときの頂点数
+    vertices = 0
+    for track in tracks:
+        if track.GetClass() == "PCB_TRACK":
+            vertices += 4
+        else:
+            vertices += 2 * (abs(round(track.GetAngle().AsDegrees() * 10)) + 1)
+    return vertices
+
+
+# 計測 -----------------------------------------------------------------------
+
+def run_fence(engine, tracks):
+    board = make_board(tracks)
+    t0 = time.perf_counter()
+    if engine == "legacy":
+        positions, comparisons = legacy_fence(tracks, VIA_DIAMETER, CLEARANCE)
+        t1 = time.perf_counter()
+        via_count = len(positions)
+    else:
+        pos_set = fence.create_position_set(board)
+        calc = fence.calc_path_fence_positions if engine == "path" else fence.calc_fence_positions
+        positions, sources = calc(tracks, VIA_DIAMETER, CLEARANCE)
+        if engine == "corridor":  # 並走する配線の束の内側の候補を重複判定の前に除く
+            positions = positions[fence.corridor_filter(tracks, positions, sources, VIA_DIAMETER, CLEARANCE)]
+        for pos in positions.tolist():
+            pos_set.append(pos)
+        t1 = time.perf_counter()
+        commit = BatchCommit(board, "bench")
+        for pos in pos_set:
+            fence.create_via(board, pos, VIA_DIAMETER, VIA_DRILL, "GND", True, pcbnew.VIATYPE_THROUGH, commit=commit)
+        commit.Push()
+        via_count = len(pos_set)
+        comparisons = pos_set.comparisons
+    t2 = time.perf_counter()
+    return {"geometry_s": t1 - t0, "total_s": t2 - t0, "vias": via_count, "comparisons": comparisons}
+
+
+def run_square(engine, tracks):
+    board = make_board(tracks)
+    t0 = time.perf_counter()
+    if engine == "legacy":
+        vertices = legacy_square_vertices(tracks)
+        return {"total_s": None, "vertices": vertices}
+    square.convert_tracks(board, tracks)
+    t1 = time.perf_counter()
+    vertices = sum(shape.GetPolyShape().TotalVertices() for shape in board.GetDrawings())
+    return {"total_s": t1 - t0, "vertices": vertices}
+
+
+def fmt(value):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return "{:.4f}".format(value)
+    return str(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark via fence and square track generation on synthetic selections")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000], help="numbers of selected tracks")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=sorted(SCENARIOS))
+    parser.add_argument("--engines", nargs="+", choices=["legacy", "per-track", "path", "corridor"], default=["legacy", "per-track", "path", "corridor"])
+    parser.add_argument("--legacy-max", type=int, default=200, help="skip the O(n^2) legacy engine above this many tracks")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = []
+    print("{:<8} {:>6} {:<10} {:>10} {:>10} {:>8} {:>12} {:>10}".format("scenario", "n", "engine", "geometry_s", "total_s", "vias", "comparisons", "vertices"))
+    for scenario in args.scenarios:
+        for n in args.sizes:
+            for engine in args.engines:
+                if engine == "legacy" and n > args.legacy_max:
+                    continue
+                tracks = SCENARIOS[scenario](n, random.Random(args.seed))  # 計測ごとに同じ配線を作り直す
+                row = {"scenario": scenario, "n": n, "engine": engine}
+                row.update(run_fence(engine, tracks))
+                if engine not in ("path", "corridor"):  # 四角い配線の変換はビアの並べ方と関係ないので2回測らない
+                    tracks = SCENARIOS[scenario](n, random.Random(args.seed))
+                    square_result = run_square(engine, tracks)
+                    row["square_s"] = square_result["total_s"]
+                    row["vertices"] = square_result["vertices"]
+                results.append(row)
+                print("{:<8} {:>6} {:<10} {:>10} {:>10} {:>8} {:>12} {:>10}".format(
+                    scenario, n, engine, fmt(row["geometry_s"]), fmt(row["total_s"]), row["vias"], row["comparisons"], fmt(row.get("vertices"))), flush=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,404 @@
+import math
+
+# ベンチマーク用のpcbnewの代用品 KiCadを起動せずにプラグインの計算部分を動かすため,使っているAPIだけを最小限に真似る
+# 描画や接続情報の計算は行わないので,計測できるのはPython側の処理時間だけ
+
+F_Cu = 0
+B_Cu = 2
+Dwgs_User = 17
+Edge_Cuts = 25
+PCB_LAYER_ID_COUNT = 128
+VIATYPE_THROUGH = 3
+VIATYPE_BLIND_BURIED = 2
+VIATYPE_MICROVIA = 1
+VIATYPE_NOT_DEFINED = 0
+SHAPE_T_CIRCLE = 3
+SHAPE_T_POLY = 4
+ADD_MODE_BULK_APPEND = 3
+REMOVE_MODE_BULK = 1
+
+
+def FromMM(mm):
+    return int(round(mm * 1e6))
+
+
+def ToMM(nm):
+    return nm / 1e6
+
+
+def IsCopperLayer(layer_id):
+    return layer_id < 64 and layer_id % 2 == 0
+
+
+def Refresh():
+    pass
+
+
+class ActionPlugin:
+    def register(self):
+        pass
+
+
+class VECTOR2I:
+    def __init__(self, x, y):
+        self.x = int(x)
+        self.y = int(y)
+
+
+class EDA_ANGLE:
+    def __init__(self, radians):
+        self.radians = radians
+
+    def AsRadians(self):
+        return self.radians
+
+    def AsDegrees(self):
+        return math.degrees(self.radians)
+
+
+class KIID:
+    count = 0
+
+    def __init__(self):
+        KIID.count += 1
+        self.value = "00000000-0000-0000-0000-{:012d}".format(KIID.count)
+
+    def AsString(self):
+        return self.value
+
+
+class NETINFO_ITEM:
+    def __init__(self, name, code):
+        self.name = name
+        self.code = code
+
+    def GetNetname(self):
+        return self.name
+
+    def GetNetCode(self):
+        return self.code
+
+
+class BOARD_ITEM:
+    def __init__(self, board=None):
+        self.m_Uuid = KIID()
+        self.layer = F_Cu
+        self.net = None
+        self.selected = False
+        self.parent_group = None
+
+    def GetLayer(self):
+        return self.layer
+
+    def SetLayer(self, layer):
+        self.layer = layer
+
+    def GetNet(self):
+        return self.net
+
+    def SetNet(self, net):
+        self.net = net
+
+    def GetNetCode(self):
+        return self.net.GetNetCode() if self.net is not None else 0
+
+    def GetNetname(self):
+        return self.net.GetNetname() if self.net is not None else ""
+
+    def GetParentGroup(self):
+        return self.parent_group
+
+    def IsSelected(self):
+        return self.selected
+
+    def ClearSelected(self):
+        self.selected = False
+
+
+class PCB_TRACK(BOARD_ITEM):
+    def __init__(self, start, end, width, board=None):
+        super().__init__(board)
+        self.start = start
+        self.end = end
+        self.width = width
+
+    def GetClass(self):
+        return "PCB_TRACK"
+
+    def GetStart(self):
+        return self.start
+
+    def GetEnd(self):
+        return self.end
+
+    def GetWidth(self):
+        return self.width
+
+    def GetLength(self):
+        return math.hypot(self.end.x - self.start.x, self.end.y - self.start.y)
+
+
+class PCB_ARC(PCB_TRACK):
+    def __init__(self, center, radius, angle_start, angle_disp, width, board=None):
+        self.center = center
+        self.radius = radius
+        self.angle_start = angle_start
+        self.angle_disp = angle_disp
+        start = VECTOR2I(center.x + radius * math.cos(angle_start), center.y + radius * math.sin(angle_start))
+        end = VECTOR2I(center.x + radius * math.cos(angle_start + angle_disp), center.y + radius * math.sin(angle_start + angle_disp))
+        super().__init__(start, end, width, board)
+
+    def GetClass(self):
+        return "PCB_ARC"
+
+    def GetCenter(self):
+        return self.center
+
+    def GetRadius(self):
+        return self.radius
+
+    def GetMid(self):
+        angle = self.angle_start + self.angle_disp / 2
+        return VECTOR2I(self.center.x + self.radius * math.cos(angle), self.center.y + self.radius * math.sin(angle))
+
+    def GetArcAngleStart(self):
+        return EDA_ANGLE(self.angle_start)
+
+    def GetAngle(self):
+        return EDA_ANGLE(self.angle_disp)
+
+    def GetLength(self):
+        return abs(self.radius * self.angle_disp)
+
+
+class PCB_VIA(BOARD_ITEM):
+    def __init__(self, board=None):
+        super().__init__(board)
+        self.position = VECTOR2I(0, 0)
+
+    def GetClass(self):
+        return "PCB_VIA"
+
+    def GetPosition(self):
+        return self.position
+
+    def SetPosition(self, pos):
+        self.position = pos
+
+    def SetWidth(self, width):
+        self.width = width
+
+    def SetDrill(self, drill):
+        self.drill = drill
+
+    def SetIsFree(self, is_free):
+        self.is_free = is_free
+
+    def SetViaType(self, via_type):
+        self.via_type = via_type
+
+    def SetLayerPair(self, start_layer_id, end_layer_id):
+        self.layer_pair = (start_layer_id, end_layer_id)
+
+    def SetRemoveUnconnected(self, remove):
+        self.remove_unconnected = remove
+
+    def GetWidth(self):
+        return self.width
+
+    def GetDrillValue(self):
+        return self.drill
+
+    def GetIsFree(self):
+        return self.is_free
+
+    def GetViaType(self):
+        return self.via_type
+
+    def TopLayer(self):
+        return self.layer_pair[0]
+
+    def BottomLayer(self):
+        return self.layer_pair[1]
+
+    def GetRemoveUnconnected(self):
+        return self.remove_unconnected
+
+
+class SHAPE_LINE_CHAIN:
+    def __init__(self):
+        self.points = []
+        self.closed = False
+
+    def Append(self, x, y):
+        self.points.append((x, y))
+
+    def SetClosed(self, closed):
+        self.closed = closed
+
+    def PointCount(self):
+        return len(self.points)
+
+
+class SHAPE_POLY_SET:
+    def __init__(self):
+        self.outlines = []
+
+    def AddOutline(self, chain):
+        self.outlines.append(chain)
+
+    def Append(self, other):
+        self.outlines.extend(other.outlines)
+
+    def OutlineCount(self):
+        return len(self.outlines)
+
+    def Outline(self, i):
+        return self.outlines[i]
+
+    def HoleCount(self, i):
+        return 0
+
+    def Simplify(self):  # 和集合は計算しない
+        pass
+
+    def TotalVertices(self):
+        return sum(chain.PointCount() for chain in self.outlines)
+
+
+class PCB_SHAPE(BOARD_ITEM):
+    def __init__(self, board=None, shape=SHAPE_T_POLY):
+        super().__init__(board)
+        self.shape = shape
+
+    def GetClass(self):
+        return "PCB_SHAPE"
+
+    def SetPolyShape(self, poly_set):
+        self.poly_set = poly_set
+
+    def GetPolyShape(self):
+        return self.poly_set
+
+    def SetWidth(self, width):
+        self.width = width
+
+    def SetCenter(self, center):
+        self.center = center
+
+    def SetEnd(self, end):
+        self.end = end
+
+    def SetFilled(self, filled):
+        self.filled = filled
+
+
+class PCB_GROUP(BOARD_ITEM):
+    def __init__(self, board=None):
+        super().__init__(board)
+        self.name = ""
+        self.items = []
+
+    def GetClass(self):
+        return "PCB_GROUP"
+
+    def SetName(self, name):
+        self.name = name
+
+    def GetName(self):
+        return self.name
+
+    def AddItem(self, item):
+        item.parent_group = self
+        self.items.append(item)
+
+    def RemoveItem(self, item):
+        item.parent_group = None
+        self.items.remove(item)
+
+    def GetItems(self):
+        return list(self.items)
+
+
+class PAD(BOARD_ITEM):
+    def __init__(self, position, board=None):
+        super().__init__(board)
+        self.position = position
+
+    def GetClass(self):
+        return "PAD"
+
+    def GetPosition(self):
+        return self.position
+
+
+class BOARD_DESIGN_SETTINGS:
+    def __init__(self):
+        self.m_MaxError = FromMM(0.005)
+        self.m_MinClearance = FromMM(0.2)
+        self.m_CopperEdgeClearance = FromMM(0.5)
+
+
+class BOARD:
+    def __init__(self, copper_layer_count=2):
+        self.tracks = {}    # 削除を定数時間で行うため挿入順を保つdictに入れる
+        self.drawings = {}
+        self.groups = {}
+        self.pads = []
+        self.nets = {"": NETINFO_ITEM("", 0)}
+        self.design_settings = BOARD_DESIGN_SETTINGS()
+        self.copper_layer_count = copper_layer_count
+        self.properties = {}
+
+    def GetTracks(self):
+        return list(self.tracks.values())
+
+    def GetPads(self):
+        return list(self.pads)
+
+    def Zones(self):
+        return []
+
+    def GetFootprints(self):
+        return []
+
+    def Groups(self):
+        return list(self.groups.values())
+
+    def GetDrawings(self):
+        return list(self.drawings.values())
+
+    def GetDesignSettings(self):
+        return self.design_settings
+
+    def FindNet(self, name):
+        if name not in self.nets:
+            self.nets[name] = NETINFO_ITEM(name, len(self.nets))
+        return self.nets[name]
+
+    def GetProperties(self):
+        return dict(self.properties)
+
+    def SetProperties(self, properties):
+        self.properties = dict(properties)
+
+    def IsLayerEnabled(self, layer_id):
+        return layer_id in (F_Cu, B_Cu) or 4 <= layer_id < 4 + 2 * (self.copper_layer_count - 2)
+
+    def Add(self, item, mode=None, skip_connectivity=False):
+        if isinstance(item, (PCB_TRACK, PCB_VIA)):
+            self.tracks[id(item)] = item
+        elif isinstance(item, PCB_GROUP):
+            self.groups[id(item)] = item
+        elif isinstance(item, PAD):  # フットプリントは作らずにパッドだけを置く
+            self.pads.append(item)
+        else:
+            self.drawings[id(item)] = item
+
+    def Remove(self, item, mode=None):
+        self.tracks.pop(id(item), None)
+        self.drawings.pop(id(item), None)
+        self.groups.pop(id(item), None)
+
+    def BuildConnectivity(self):
+        pass
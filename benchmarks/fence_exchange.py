@@ -0,0 +1,77 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# フェンスの書き出しと別の基板への置き直しにかかる時間を,座標計算からやり直す場合と比べる
+# 合成した配線にフェンスを生成して書き出し,同じ配線を持つ新しい基板に読み込む 一部の配線は動かして形の変わった配線として扱う
+# 例: python benchmarks/fence_exchange.py --tracks 5000 --moved 0.1
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import bench  # noqa: E402  pcbnewの偽物とパッケージの登録はbenchで行う
+from bench import pcbnew, fence  # noqa: E402
+from plugins.via_fence_generator import exchange  # noqa: E402
+
+
+def copy_tracks(tracks, moved, rng):  # 同じUUIDの配線を作る movedの割合の直線は少し動かす
+    copies = []
+    for track in tracks:
+        start = track.GetStart()
+        end = track.GetEnd()
+        shift = bench.WIDTH if track.GetClass() == "PCB_TRACK" and rng.random() < moved else 0
+        copy = pcbnew.PCB_TRACK(pcbnew.VECTOR2I(start.x + shift, start.y), pcbnew.VECTOR2I(end.x + shift, end.y), track.GetWidth())
+        copy.m_Uuid = track.m_Uuid
+        copies.append(copy)
+    return copies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark exporting fences and re-applying them to another board")
+    parser.add_argument("--tracks", type=int, default=5000)
+    parser.add_argument("--moved", type=float, default=0.1, help="fraction of tracks moved on the new board")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    tracks = bench.lines_scenario(args.tracks, bench.random.Random(args.seed))
+    settings = fence.FenceSettings(via_diameter=bench.VIA_DIAMETER, via_drill=bench.VIA_DRILL, clearance=bench.CLEARANCE, net_name="GND")
+    board = bench.make_board(tracks)
+    fence.place_fence(board, tracks, settings)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "fence.npz")
+        t0 = time.perf_counter()
+        exported = exchange.export_fences(board, path)
+        t1 = time.perf_counter()
+        size = os.path.getsize(path)
+        exchange.load_fences(path)
+        t2 = time.perf_counter()
+
+        new_tracks = copy_tracks(tracks, args.moved, rng)
+        new_board = bench.make_board(new_tracks)
+        t3 = time.perf_counter()
+        added, skipped = exchange.import_fences(new_board, path)
+        t4 = time.perf_counter()
+
+    regenerate_board = bench.make_board(copy_tracks(tracks, 0, rng))
+    t5 = time.perf_counter()
+    fence.place_fence(regenerate_board, regenerate_board.GetTracks(), settings)
+    t6 = time.perf_counter()
+
+    results = {"tracks": args.tracks, "exported_vias": exported, "file_bytes": size, "imported_vias": added, "skipped_tracks": skipped,
+               "export_seconds": t1 - t0, "load_seconds": t2 - t1, "import_seconds": t4 - t3, "regenerate_seconds": t6 - t5}
+    print("exported {} vias in {} bytes, imported {} vias, skipped {} moved tracks".format(exported, size, added, skipped))
+    print("export {:.3f} s, load {:.4f} s, import {:.3f} s, regenerate from scratch {:.3f} s".format(t1 - t0, t2 - t1, t4 - t3, t6 - t5), flush=True)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# 特性インピーダンスとフェンスの間隔の計算をまとめて行ったときの時間を計測する
+# 配線幅,ギャップ,誘電体の厚さ,比誘電率,周波数の格子のすべての組を1回の配列演算で計算し,目標のインピーダンスになる配線幅も求める
+# 例: python benchmarks/impedance_sweep.py --points 20 --target 50
+
+sys.path[:0] = [os.path.dirname(os.path.dirname(os.path.abspath(__file__))), os.path.dirname(os.path.abspath(__file__))]
+import fake_pcbnew  # noqa: E402
+sys.modules["pcbnew"] = fake_pcbnew  # pluginsの読み込みにpcbnewが必要なので偽物を使う
+from plugins.via_fence_generator import impedance  # noqa: E402
+
+
+def timed(function, repeat):  # 最短の時間と結果
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized impedance and fence pitch engine")
+    parser.add_argument("--points", type=int, default=20, help="grid points per swept parameter")
+    parser.add_argument("--target", type=float, default=50.0, help="target impedance in ohm for the width solve")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    n = args.points
+    widths = np.linspace(0.1, 1.0, n)[:, None, None, None]   # mm
+    gaps = np.linspace(0.1, 0.5, n)[None, :, None, None]     # mm
+    heights = np.linspace(0.1, 1.6, n)[None, None, :, None]  # mm
+    ers = np.linspace(3.0, 4.6, n)[None, None, None, :]
+    frequencies = np.linspace(1e9, 40e9, n)
+
+    results = {"points": n}
+    for line in impedance.LINES:
+        seconds, (z0, _) = timed(lambda: impedance.impedance(line, widths, gaps, heights, ers), args.repeat)
+        results[line] = {"design_points": int(z0.size), "seconds": seconds, "z0_min": float(np.nanmin(z0)), "z0_max": float(np.nanmax(z0))}
+
+    seconds, pitch = timed(lambda: impedance.max_via_pitch(frequencies[:, None], ers.reshape(1, -1)), args.repeat)
+    results["max_via_pitch"] = {"design_points": int(pitch.size), "seconds": seconds}
+
+    seconds, solved = timed(lambda: impedance.solve_width(args.target, "microstrip", heights.reshape(-1, 1), ers.reshape(1, -1)), args.repeat)
+    z0, _ = impedance.microstrip(solved, heights.reshape(-1, 1), ers.reshape(1, -1))
+    results["solve_width"] = {"design_points": int(solved.size), "seconds": seconds, "max_error_ohm": float(np.max(np.abs(z0 - args.target)))}
+
+    for key, value in results.items():
+        if isinstance(value, dict):
+            print("{:14s} {:8d} points {:9.3f} ms".format(key, value["design_points"], value["seconds"] * 1e3), flush=True)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# Grid Origin Alignerの最寄りのパッドの検索にかかる時間を,すべてのパッドを毎回調べる場合と比べる
+# 合成した基板にフットプリントのようにまとまったパッドを並べ,索引を1回作ってから乱数の位置で最寄りのパッドを求める
+# 例: python benchmarks/pad_index.py --pads 50000 --queries 1000
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import bench  # noqa: E402  pcbnewの偽物とパッケージの登録はbenchで行う
+from bench import pcbnew  # noqa: E402
+bench._package("plugins.grid_origin_aligner", os.path.join(bench.ROOT, "plugins", "grid_origin_aligner"))
+from plugins.grid_origin_aligner import origin  # noqa: E402
+
+MM = 1000000  # nm
+
+
+def make_board(count, size, rng):  # 0.5mmピッチで8個ずつ並んだパッドの列を基板全体にばらまく
+    board = pcbnew.BOARD()
+    anchors = rng.uniform(0, size, (count // 8 + 1, 2)) * MM
+    for anchor in anchors:
+        for k in range(8):
+            board.Add(pcbnew.PAD(pcbnew.VECTOR2I(anchor[0] + k * 0.5 * MM, anchor[1])))
+    return board
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the nearest-pad lookup of Grid Origin Aligner")
+    parser.add_argument("--pads", type=int, default=50000)
+    parser.add_argument("--size", type=float, default=300.0, help="board size in mm")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    board = make_board(args.pads, args.size, rng)
+    points = (rng.uniform(-0.1 * args.size, 1.1 * args.size, (args.queries, 2)) * MM).astype(np.int64)
+
+    t0 = time.perf_counter()
+    index = origin.PadIndex(board)
+    t1 = time.perf_counter()
+    found = [index.nearest(point) for point in points.tolist()]
+    t2 = time.perf_counter()
+    scanned = []  # 索引を使わずに毎回すべてのパッドを走査する
+    for x, y in points.tolist():
+        scanned.append(min(board.GetPads(), key=lambda pad: (pad.GetPosition().x - x) ** 2 + (pad.GetPosition().y - y) ** 2))
+    t3 = time.perf_counter()
+    mismatches = sum(1 for a, b in zip(found, scanned) if origin.position_of(a) != origin.position_of(b))
+
+    results = {"pads": len(index.pads), "queries": args.queries, "index_seconds": t1 - t0,
+               "lookup_ms": (t2 - t1) / args.queries * 1000, "scan_ms": (t3 - t2) / args.queries * 1000, "mismatches": mismatches}
+    print("{} pads, index built in {:.3f} s, cell {:.2f} mm".format(len(index.pads), t1 - t0, index.cell / MM))
+    print("lookup {:.3f} ms, full scan {:.3f} ms per query, {} mismatches".format(results["lookup_ms"], results["scan_ms"], mismatches), flush=True)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# pcbnewの起動時にプラグインの読み込みにかかる時間を計測する
+# 読み込みごとに新しいPythonを起動し,import pluginsにかかった時間と,そのとき読み込まれていた重いモジュールを調べる
+# 初回のRunで読み込まれるモジュール(NumPy,ビアと輪郭の計算,wxがあればダイアログ)の読み込み時間も別に測る
+# 例: python benchmarks/startup.py --repeat 20
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+
+HEAVY_MODULES = [
+    "numpy",
+    "wx",
+    "plugins.via_fence_generator.dialog",
+    "plugins.via_fence_generator.controller",
+    "plugins.via_fence_generator.fence",
+    "plugins.square_track_generator.square",
+    "plugins.grid_origin_aligner.origin",
+]
+
+DEFERRED_MODULES = [  # 初回のRunで読み込まれるモジュール
+    "plugins.via_fence_generator.fence",
+    "plugins.square_track_generator.square",
+    "plugins.via_fence_generator.controller",
+    "plugins.grid_origin_aligner.origin",
+]
+
+CHILD = r"""
+import json, sys, time
+sys.path[:0] = [{root!r}, {benchmarks!r}]
+import fake_pcbnew
+sys.modules["pcbnew"] = fake_pcbnew
+t0 = time.perf_counter()
+import plugins
+startup = time.perf_counter() - t0
+loaded = [name for name in {heavy!r} if name in sys.modules]
+deferred = {{}}
+for name in {deferred!r}:
+    t0 = time.perf_counter()
+    try:
+        __import__(name)
+    except ImportError:  # wxの無い環境ではダイアログを読み込めない
+        deferred[name] = None
+        continue
+    deferred[name] = time.perf_counter() - t0
+print(json.dumps({{"startup_s": startup, "loaded": loaded, "deferred_s": deferred}}))
+"""
+
+
+def measure_once():
+    code = CHILD.format(root=ROOT, benchmarks=BENCHMARKS, heavy=HEAVY_MODULES, deferred=DEFERRED_MODULES)
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure how long pcbnew spends importing the plugins at startup")
+    parser.add_argument("--repeat", type=int, default=10, help="number of fresh interpreters to measure")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args(argv)
+
+    runs = [measure_once() for _ in range(args.repeat)]
+    startup = statistics.median(run["startup_s"] for run in runs)
+    print("startup (import plugins): {:.4f} s median of {}".format(startup, len(runs)))
+    print("heavy modules loaded at startup: {}".format(", ".join(runs[0]["loaded"]) or "none"))
+    print("deferred to the first Run():")
+    deferred = {}
+    for name in DEFERRED_MODULES:
+        values = [run["deferred_s"][name] for run in runs if run["deferred_s"][name] is not None]
+        deferred[name] = statistics.median(values) if values else None
+        print("  {:<45} {}".format(name, "{:.4f} s".format(deferred[name]) if values else "not importable here"))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"startup_s": startup, "loaded": runs[0]["loaded"], "deferred_s": deferred}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# スティッチングビアでゾーンを埋めるときの候補の判定にかかる時間を計測する
+# 合成した塗りつぶし(外周の凹凸と円形の穴)の上に格子を作り,内外判定と輪郭からの距離の判定,他のネットの配線との干渉判定を行う
+# 例: python benchmarks/stitch_fill.py --size 100 --pitch 0.5 --tracks 2000
+
+sys.path[:0] = [os.path.dirname(os.path.dirname(os.path.abspath(__file__))), os.path.dirname(os.path.abspath(__file__))]
+import fake_pcbnew  # noqa: E402
+sys.modules["pcbnew"] = fake_pcbnew  # pluginsの読み込みにpcbnewが必要なので偽物を使う
+from plugins.via_fence_generator import path, stitch_grid  # noqa: E402
+
+MM = 1000000  # nm
+
+
+def synthetic_fill(size, holes, rng):  # 外周が波打った正方形に円形の穴を開けた塗りつぶしの輪郭
+    t = np.linspace(0, 1, 2000, endpoint=False)
+    wave = 0.02 * size * np.sin(2 * np.pi * 40 * t)
+    side = size * t
+    outer = np.concatenate([
+        np.stack([side, wave], axis=1),
+        np.stack([size + wave, side], axis=1),
+        np.stack([size - side, size + wave], axis=1),
+        np.stack([wave, size - side], axis=1),
+    ])
+    rings = [outer]
+    angles = np.linspace(0, 2 * np.pi, 64, endpoint=False)
+    for center, radius in zip(rng.uniform(0.1 * size, 0.9 * size, (holes, 2)), rng.uniform(0.005 * size, 0.02 * size, holes)):
+        rings.append(center + radius * np.stack([np.cos(angles), -np.sin(angles)], axis=1))  # 穴は逆回り
+    return [ring * MM for ring in rings]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the stitching via candidate tests")
+    parser.add_argument("--size", type=float, default=100.0, help="zone size in mm")
+    parser.add_argument("--pitch", type=float, default=0.5, help="grid pitch in mm")
+    parser.add_argument("--holes", type=int, default=200, help="round holes in the fill")
+    parser.add_argument("--tracks", type=int, default=2000, help="other-net tracks crossing the zone on another layer")
+    parser.add_argument("--via-diameter", type=float, default=0.4)
+    parser.add_argument("--staggered", action="store_true")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    size = args.size
+    radius = args.via_diameter * MM / 2
+    seg_a, seg_b = stitch_grid.polygon_edges(synthetic_fill(size, args.holes, rng))
+    starts = rng.uniform(0, size, (args.tracks, 2)) * MM
+    ends = starts + rng.uniform(-0.1 * size, 0.1 * size, (args.tracks, 2)) * MM
+    limits = np.full(args.tracks, 0.1 * MM + radius + 0.2 * MM)  # 配線幅の半分+ビアの半径+クリアランス
+
+    results = {"size_mm": size, "pitch_mm": args.pitch, "edges": len(seg_a), "tracks": args.tracks}
+    t0 = time.perf_counter()
+    points = stitch_grid.grid_points(-0.05 * size * MM, -0.05 * size * MM, 1.05 * size * MM, 1.05 * size * MM, args.pitch * MM, args.staggered)
+    t1 = time.perf_counter()
+    inside = points[stitch_grid.inside_with_margin(points, seg_a, seg_b, radius)]
+    t2 = time.perf_counter()
+    clear = inside[~path.too_close(inside.astype(np.float64), starts, ends, limits)]
+    t3 = time.perf_counter()
+    results.update({"candidates": len(points), "inside": len(inside), "vias": len(clear),
+                    "grid_seconds": t1 - t0, "fill_seconds": t2 - t1, "clearance_seconds": t3 - t2})
+
+    print("{} candidates, {} inside the fill, {} clear of other copper".format(len(points), len(inside), len(clear)))
+    print("grid {:.3f} s, fill {:.3f} s, clearance {:.3f} s".format(t1 - t0, t2 - t1, t3 - t2), flush=True)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
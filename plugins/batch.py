@@ -0,0 +1,139 @@
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+# マニフェストに並べた複数の基板にビアフェンスの配置と四角い配線への置き換えをまとめて行う
+# 基板ごとに別のプロセスでpcbnewを読み込み,CPUのコア数だけ並列に処理する 1枚ごとの処理はヘッドレス実行と同じ
+# 例: python -m plugins.batch release.json -j 8 --summary summary.json
+#
+# マニフェストはJSONで,"boards"の各項目に基板ファイルと配線の選び方,"fence","stitch","square"にヘッドレス実行と同じ名前の設定を書く
+# "defaults"に書いた項目はすべての基板に適用され,基板ごとの項目で上書きできる 相対パスはマニフェストのあるフォルダから
+# {
+#     "defaults": {"nets": ["RF*"], "fence": {"via_net": "GND", "via_diameter": 0.6, "via_hole": 0.3, "clearance": 0.2}},
+#     "boards": [
+#         {"board": "a.kicad_pcb", "output": "out/a.kicad_pcb"},
+#         {"board": "b.kicad_pcb", "layers": ["F.Cu"], "square": {"merge": true}}
+#     ]
+# }
+
+SELECTION_KEYS = {"nets": "--net", "netclasses": "--netclass", "layers": "--layer"}  # 複数指定できる配線の選び方
+
+
+def merge_entry(defaults, entry):  # 基板ごとの項目でdefaultsを上書きする fence,stitch,squareは中身ごとに上書きする
+    merged = dict(defaults)
+    for key, value in entry.items():
+        if key in ("fence", "stitch", "square") and isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = dict(merged[key], **value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def option_args(flag, options):  # {"via_net": "GND", "merge": true}を["--fence", "--via-net", "GND", "--merge"]のような引数にする
+    if options is None or options is False:
+        return []
+    argv = [flag]
+    for key, value in (options if isinstance(options, dict) else {}).items():
+        option = "--" + key.replace("_", "-")
+        if value is True:
+            argv.append(option)
+        elif value is not False and value is not None:
+            argv += [option, str(value)]
+    return argv
+
+
+def entry_argv(entry, base_dir):  # マニフェストの1項目をヘッドレス実行のコマンドライン引数にする
+    if "board" not in entry:
+        raise ValueError("manifest entry without 'board': {}".format(entry))
+    argv = [os.path.join(base_dir, entry["board"])]
+    if entry.get("output"):
+        argv += ["--output", os.path.join(base_dir, entry["output"])]
+    for key, flag in SELECTION_KEYS.items():
+        for value in entry.get(key) or []:
+            argv += [flag, value]
+    argv += option_args("--fence", entry.get("fence"))
+    argv += option_args("--stitch", entry.get("stitch"))  # ビアの設定はfenceと同じ引数なので,両方に書いた項目はstitchの値になる
+    argv += option_args("--square", entry.get("square"))
+    for key in ("import_fences", "export_fences"):  # 書き出したフェンスのファイル 基板と同じくマニフェストからの相対パス
+        if entry.get(key):
+            argv += ["--" + key.replace("_", "-"), os.path.join(base_dir, entry[key])]
+    if entry.get("force_import"):
+        argv.append("--force-import")
+    return argv
+
+
+def load_manifest(path):  # 基板ごとのコマンドライン引数のリスト
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    defaults = manifest.get("defaults", {})
+    return [entry_argv(merge_entry(defaults, entry), base_dir) for entry in manifest.get("boards", [])]
+
+
+def run_job(argv):  # ワーカープロセスで1枚の基板を処理する 例外は要約に書いて返す
+    t0 = time.perf_counter()
+    summary = {"board": argv[0], "vias": 0, "squared": 0, "seconds": None, "phases": {}, "error": None}
+    try:
+        from . import headless  # pcbnewとNumPyはワーカーごとに読み込む
+        from . import profiling
+        parser = headless.build_parser()
+        args = parser.parse_args(argv)
+        summary["output"] = args.output or args.board
+        if not (args.fence or args.stitch or args.square or args.import_fences or args.export_fences):
+            raise ValueError("nothing to do: give 'fence', 'stitch', 'square', 'import_fences' and/or 'export_fences'")
+        timer = profiling.RunTimer(args.board, mode="timing")
+        summary["vias"], summary["squared"] = headless.run(args, timer)
+        summary["phases"] = dict(timer.phases)
+    except SystemExit:  # argparseの引数エラー
+        summary["error"] = "invalid options: {}".format(" ".join(argv))
+    except Exception as e:
+        summary["error"] = "{}: {}".format(type(e).__name__, e)
+        summary["traceback"] = traceback.format_exc()
+    summary["seconds"] = time.perf_counter() - t0
+    return summary
+
+
+def run_batch(jobs, workers=None):  # 基板ごとの要約をマニフェストの順に返す
+    workers = workers or os.cpu_count() or 1
+    context = multiprocessing.get_context("spawn")  # pcbnewとwxの状態をforkで引き継がないようにする
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, max(1, len(jobs))), mp_context=context) as executor:
+        return list(executor.map(run_job, jobs))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m plugins.batch", description="Apply Via Fence Generator and Square Track Generator to many boards in parallel")
+    parser.add_argument("manifest", help="JSON manifest listing the boards and their settings")
+    parser.add_argument("-j", "--jobs", type=int, help="number of worker processes (default: number of CPU cores)")
+    parser.add_argument("--summary", help="write the per-board summary to this JSON file")
+    args = parser.parse_args(argv)
+
+    try:
+        jobs = load_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    t0 = time.perf_counter()
+    results = run_batch(jobs, args.jobs)
+    elapsed = time.perf_counter() - t0
+
+    for result in results:
+        if result["error"] is None:
+            print("{}: {} vias placed, {} tracks squared, {:.2f} s".format(result["output"], result["vias"], result["squared"], result["seconds"]))
+        else:
+            print("{}: FAILED {}".format(result["board"], result["error"]))
+    failures = sum(1 for result in results if result["error"] is not None)
+    print("{} boards, {} failed, {:.2f} s".format(len(results), failures, elapsed))
+
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump({"elapsed_s": elapsed, "boards": results}, f, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
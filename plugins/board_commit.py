@@ -0,0 +1,79 @@
+import pcbnew
+
+# 生成した図形を1回の操作でまとめて基板に反映する
+# BOARD_COMMITが使えるKiCadではアンドゥ1回分として登録し,使えない場合は一括追加モードで追加して接続情報の再計算を1回にまとめる
+
+
+def _create_board_commit(board):  # BOARD_COMMITを作る Pythonから使えないバージョンではNone
+    commit_class = getattr(pcbnew, "BOARD_COMMIT", None)
+    if commit_class is None:
+        return None
+    try:
+        return commit_class(board)
+    except (TypeError, ValueError, NotImplementedError):  # コンストラクタにフレームが必要なバージョンではPythonから作れない
+        return None
+
+
+class BatchCommit:
+    def __init__(self, board, message):
+        self.board = board
+        self.message = message  # アンドゥ履歴に表示される名前
+        self.added = []
+        self.removed = []
+        self.grouped = []  # (グループ, 図形) 既存のグループへの追加はアンドゥできるようにPushのときに行う
+
+    def Add(self, item):
+        self.added.append(item)
+
+    def Remove(self, item):
+        self.removed.append(item)
+
+    def AddToGroup(self, group, item):  # 図形をグループに入れる 図形とグループはそれぞれAddするか基板上にあるもの
+        self.grouped.append((group, item))
+
+    def Push(self):  # 溜めた変更を基板に反映する 反映した図形の数を返す
+        commit = _create_board_commit(self.board)
+        if commit is not None:
+            added = set(id(item) for item in self.added)
+            modified = set()
+            for group, _ in self.grouped:  # 既存のグループは変更前の状態をアンドゥ用に記録してから変更する
+                if id(group) not in added and id(group) not in modified:
+                    commit.Modify(group)
+                    modified.add(id(group))
+            self.apply_groups()
+            for item in self.removed:
+                commit.Remove(item)  # グループからの取り外しはBOARD_COMMITが行う
+            for item in self.added:
+                commit.Add(item)
+            commit.Push(self.message)
+        elif hasattr(pcbnew, "ADD_MODE_BULK_APPEND"):
+            self.apply_groups()
+            self.detach_removed()
+            for item in self.removed:
+                self.board.Remove(item, pcbnew.REMOVE_MODE_BULK)
+            for item in self.added:
+                self.board.Add(item, pcbnew.ADD_MODE_BULK_APPEND, True)  # 図形ごとの接続情報の更新は省略して最後に1回だけ行う
+            self.board.BuildConnectivity()
+        else:
+            self.apply_groups()
+            self.detach_removed()
+            for item in self.removed:
+                self.board.Remove(item)
+            for item in self.added:
+                self.board.Add(item)
+
+        count = len(self.added) + len(self.removed)
+        self.added = []
+        self.removed = []
+        self.grouped = []
+        return count
+
+    def apply_groups(self):
+        for group, item in self.grouped:
+            group.AddItem(item)
+
+    def detach_removed(self):  # BOARD_COMMITを使わずに削除する図形はグループから外しておく
+        for item in self.removed:
+            group = item.GetParentGroup() if hasattr(item, "GetParentGroup") else None
+            if group is not None:
+                group.RemoveItem(item)
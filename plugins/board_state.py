@@ -0,0 +1,13 @@
+# 基板の差し替えと編集を見分けるための値 基板から作ったキャッシュを使い回してよいかの判定に使う
+
+
+def board_key(board):  # 同じ基板か判定するための値 pcbnew.GetBoard()は呼ぶたびに別のPythonオブジェクトを返すのでC++側のポインタを使う
+    this = getattr(board, "this", None)
+    return int(this) if this is not None else id(board)
+
+
+def board_stamp(board, fallback):  # 基板が編集されると変わる値 GetTimeStampが無いバージョンではfallback(board)の値で代用する
+    get_time_stamp = getattr(board, "GetTimeStamp", None)  # 基板の変更のたびに増える
+    if get_time_stamp is not None:
+        return get_time_stamp()
+    return fallback(board)
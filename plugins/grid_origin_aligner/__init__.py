@@ -1,2 +1,5 @@
-from .action import PadToOriginAction
+from .action import PadToOriginAction, NearestPadToOriginAction, PadCentroidToOriginAction, FootprintAnchorToOriginAction
 PadToOriginAction().register()
+NearestPadToOriginAction().register()
+PadCentroidToOriginAction().register()
+FootprintAnchorToOriginAction().register()
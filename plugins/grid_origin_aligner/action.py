@@ -1,6 +1,38 @@
 import pcbnew
 import os
 
+# pcbnewの起動時に読み込まれるのはここまで NumPyとパッドの索引は初めてRunされたときに読み込む
+
+
+def align_grid_origin(name, locate):  # locate(board, selection, timer)が返す位置にグリッド原点を置く 位置が無ければ何もしない
+    from .. import profiling
+    from ..selection import Selection
+    from . import origin
+    timer = profiling.RunTimer(name).start()  # 環境変数KICAD_TLT_PROFILEで有効にしたときだけ工程ごとの時間を記録する
+    try:
+        # ボードを取得
+        board = pcbnew.GetBoard()
+
+        # 選択中の図形を読み込み,原点を置く位置を求める 最寄りのパッドの索引はlocateの中で必要なときだけ作る
+        with timer.phase("selection"):
+            selection = Selection(board)
+            selection.all_items()
+        pos = getattr(origin, locate)(board, selection, timer)
+        if pos is None:
+            timer.finish()
+            return  # 対象が選択されていない
+
+        # グリッド原点
+        origin.set_grid_origin(board, pos)
+
+        with timer.phase("refresh"):
+            pcbnew.Refresh()
+    except Exception:
+        timer.abort()  # cProfileを止めてから例外を伝える
+        raise
+    timer.finish()
+
+
 class PadToOriginAction(pcbnew.ActionPlugin):
     def defaults(self):
         self.name = "Grid Origin Aligner"
@@ -10,18 +42,40 @@ class PadToOriginAction(pcbnew.ActionPlugin):
         self.show_toolbar_button = True
 
     def Run(self):
-        # ボードとデザイン設定を取得
-        board = pcbnew.GetBoard()
-        design = board.GetDesignSettings()
+        align_grid_origin(self.name, "selected_pad_origin")
 
-        # パッドの座標を取得
-        pads = [pad for pad in board.GetPads() if pad.IsSelected()]
-        if not pads:
-            return  # パッドが選択されていない
-        pos = pads[0].GetPosition()
 
-        # グリッド原点
-        design.SetGridOrigin(pos)
-        # ドリル原点はSetAuxOriginで設定
+class NearestPadToOriginAction(pcbnew.ActionPlugin):  # 選択した図形(選択が無ければ今のグリッド原点)に最も近いパッドに合わせる
+    def defaults(self):
+        self.name = "Grid Origin Aligner (Nearest Pad)"
+        self.category = "Design PCB"
+        self.description = "Align the grid origin to the pad nearest the selected items, or nearest the current grid origin"
+        self.icon_file_name = os.path.join(os.path.dirname(__file__), "32x32.png")
+        self.show_toolbar_button = False  # ツールバーには通常版だけを置き,こちらは外部プラグインメニューから実行する
 
-        pcbnew.Refresh()
\ No newline at end of file
+    def Run(self):
+        align_grid_origin(self.name, "nearest_pad_origin")
+
+
+class PadCentroidToOriginAction(pcbnew.ActionPlugin):  # 選択した複数のパッドの中心に合わせる
+    def defaults(self):
+        self.name = "Grid Origin Aligner (Pad Centroid)"
+        self.category = "Design PCB"
+        self.description = "Align the grid origin to the centroid of the selected pads"
+        self.icon_file_name = os.path.join(os.path.dirname(__file__), "32x32.png")
+        self.show_toolbar_button = False
+
+    def Run(self):
+        align_grid_origin(self.name, "pad_centroid_origin")
+
+
+class FootprintAnchorToOriginAction(pcbnew.ActionPlugin):  # 選択したフットプリントのアンカーに合わせる
+    def defaults(self):
+        self.name = "Grid Origin Aligner (Footprint Anchor)"
+        self.category = "Design PCB"
+        self.description = "Align the grid origin to the anchor of the selected footprint, or of the footprint of the selected pad"
+        self.icon_file_name = os.path.join(os.path.dirname(__file__), "32x32.png")
+        self.show_toolbar_button = False
+
+    def Run(self):
+        align_grid_origin(self.name, "footprint_anchor_origin")
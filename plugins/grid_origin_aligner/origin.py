@@ -0,0 +1,125 @@
+import numpy as np
+import pcbnew
+from ..board_state import board_key, board_stamp
+
+# グリッド原点を置く位置を選択から求める NumPyを使うのでGrid Origin Alignerの初回実行時に読み込まれる
+# 最寄りのパッドの検索には基板上のすべてのパッドの座標を格子に分けた索引を使い,索引は基板が編集されるまで使い回す
+
+PADS_PER_CELL = 4   # 格子の1マスに入るパッドの数の目安
+MAX_RINGS = 8       # 格子をこのマス数だけ広げても見つからなければすべてのパッドとの距離をまとめて計算する
+
+
+def footprint_count(board):  # GetTimeStampが無いバージョンではフットプリントの数だけを比べる フットプリントの移動には気付かない
+    return len(board.GetFootprints() if hasattr(board, "GetFootprints") else board.GetModules())
+
+
+class PadIndex:  # 基板上のパッドの座標を格子のマスごとにまとめたもの
+    def __init__(self, board):
+        self.key = board_key(board)
+        self.stamp = board_stamp(board, footprint_count)
+        self.pads = list(board.GetPads())
+        self.positions = np.array([(pos.x, pos.y) for pos in (pad.GetPosition() for pad in self.pads)], dtype=np.int64).reshape(-1, 2)
+
+        # マスの大きさはパッドの外接矩形にPADS_PER_CELL個ずつ入るように決める
+        self.cell = 1
+        self.cells = {}  # (列, 行) -> そのマスのパッドの番号の配列
+        if len(self.pads) == 0:
+            return
+        width, height = np.ptp(self.positions, axis=0) + 1
+        self.cell = max(int(np.sqrt(float(width) * float(height) * PADS_PER_CELL / len(self.pads))), 1)
+        keys = self.positions // self.cell
+        order = np.lexsort((keys[:, 1], keys[:, 0]))
+        unique, starts = np.unique(keys[order], axis=0, return_index=True)
+        for (col, row), indices in zip(unique.tolist(), np.split(order, starts[1:])):
+            self.cells[(col, row)] = indices
+
+    def is_current(self, board):  # 作ったときから基板が差し替えられても編集されてもいないか
+        return board_key(board) == self.key and board_stamp(board, footprint_count) == self.stamp
+
+    def nearest(self, point):  # pointに最も近いパッド パッドが無ければNone
+        if len(self.pads) == 0:
+            return None
+        point = np.array(point, dtype=np.int64)
+        col, row = (point // self.cell).tolist()
+        best = None
+        best_dist = None
+        for ring in range(MAX_RINGS + 1):  # pointのマスから1マスずつ外側の輪を調べる
+            indices = [self.cells[(c, r)] for c in range(col - ring, col + ring + 1) for r in range(row - ring, row + ring + 1)
+                       if max(abs(c - col), abs(r - row)) == ring and (c, r) in self.cells]
+            if indices:
+                indices = np.concatenate(indices)
+                dist = np.hypot(*(self.positions[indices] - point).T.astype(np.float64))
+                k = int(np.argmin(dist))
+                if best_dist is None or dist[k] < best_dist:
+                    best, best_dist = int(indices[k]), float(dist[k])
+            if best_dist is not None and best_dist <= ring * self.cell:  # 外側の輪のパッドはすべてring*cellより遠い
+                return self.pads[best]
+        # パッドの無い場所から遠いpoint すべてのパッドとの距離を計算する
+        dist = np.hypot(*(self.positions - point).T.astype(np.float64))
+        return self.pads[int(np.argmin(dist))]
+
+
+_index = None  # 最後に作った索引 アクションを実行するたびに作り直さないように残しておく
+
+
+def pad_index(board, timer):  # 基板の索引 作ってから基板が編集されていれば作り直す
+    global _index
+    if _index is None or not _index.is_current(board):
+        with timer.phase("pad_index"):
+            _index = PadIndex(board)
+        timer.count("pads", len(_index.pads))
+    return _index
+
+
+def position_of(item):
+    pos = item.GetPosition()
+    return (pos.x, pos.y)
+
+
+def grid_origin(board):
+    origin = board.GetDesignSettings().GetGridOrigin()
+    return (origin.x, origin.y)
+
+
+def selected_pad_origin(board, selection, timer):  # 最初に選択したパッドの位置
+    pads = selection.pads()
+    timer.count("selected_pads", len(pads))
+    return position_of(pads[0]) if pads else None
+
+
+def pad_centroid_origin(board, selection, timer):  # 選択したパッドの位置の平均 1列に並んだコネクタの中央などに置く
+    pads = selection.pads()
+    timer.count("selected_pads", len(pads))
+    if not pads:
+        return None
+    return tuple(int(v) for v in np.rint(np.mean([position_of(pad) for pad in pads], axis=0)))
+
+
+def footprint_anchor_origin(board, selection, timer):  # 選択したフットプリント(パッドだけを選択していればそのパッドのフットプリント)のアンカー
+    footprints = selection.footprints()
+    if not footprints:
+        pads = selection.pads()
+        if pads:
+            pad = pads[0]
+            footprints = [pad.GetParentFootprint() if hasattr(pad, "GetParentFootprint") else pad.GetParent()]  # GetParentFootprintは7.0から
+    timer.count("selected_footprints", len(footprints))
+    return position_of(footprints[0]) if footprints else None
+
+
+def nearest_pad_origin(board, selection, timer):  # 選択した図形の中心に最も近いパッドの位置 何も選択していなければ今のグリッド原点に最も近いパッド
+    # pcbnewのPythonからはカーソルの位置を読めないので,カーソルの代わりにビアや配線の端などを選択して指す
+    items = selection.all_items()
+    timer.count("selected_items", len(items))
+    if items:
+        boxes = [item.GetBoundingBox() for item in items]
+        point = ((min(box.GetLeft() for box in boxes) + max(box.GetRight() for box in boxes)) // 2,
+                 (min(box.GetTop() for box in boxes) + max(box.GetBottom() for box in boxes)) // 2)
+    else:
+        point = grid_origin(board)
+    pad = pad_index(board, timer).nearest(point)
+    return position_of(pad) if pad is not None else None
+
+
+def set_grid_origin(board, pos):
+    board.GetDesignSettings().SetGridOrigin(pcbnew.VECTOR2I(int(pos[0]), int(pos[1])))
+    # ドリル原点はSetAuxOriginで設定
@@ -0,0 +1,170 @@
+import argparse
+import fnmatch
+import math
+import sys
+import pcbnew
+from .via_fence_generator import fence
+from .via_fence_generator import impedance
+from .via_fence_generator import stitching
+from .via_fence_generator import exchange
+from .square_track_generator.square import convert_tracks
+from . import profiling
+
+# GUIを使わずに.kicad_pcbへビアフェンスとスティッチングビアの配置と四角い配線への置き換えを行う
+# ダイアログもタイマーも作らず,配線は選択状態ではなくネット名,ネットクラス,レイヤーで指定する
+# 例: python -m plugins.headless board.kicad_pcb --net "RF*" --fence --via-net GND --via-diameter 0.6 --via-hole 0.3 --clearance 0.2 --square
+
+
+def select_tracks(board, nets=None, netclasses=None, layers=None):  # 条件に合う配線(PCB_TRACKとPCB_ARC)を返す 条件の種類同士はAND,同じ種類の中ではOR
+    tracks = []
+    for track in board.GetTracks():
+        if track.GetClass() not in ("PCB_TRACK", "PCB_ARC"):
+            continue  # ビアは対象外
+        if nets and not any(fnmatch.fnmatchcase(track.GetNetname(), pattern) for pattern in nets):  # ネット名はワイルドカード可
+            continue
+        if netclasses and track.GetNetClassName() not in netclasses:
+            continue
+        if layers and track.GetLayerName() not in layers:
+            continue
+        tracks.append(track)
+    return tracks
+
+
+def fence_settings_from_args(board, args):  # コマンドライン引数からダイアログと同じパラメータを組み立てる
+    if args.use_zone_clearance:
+        clearance = fence.zone_clearance(board, args.via_net)
+        if clearance is None:
+            raise ValueError("no zone found on net '{}' for --use-zone-clearance".format(args.via_net))
+    else:
+        clearance = pcbnew.FromMM(args.clearance)
+
+    if not (args.via_diameter > 0 and args.via_hole > 0 and args.via_diameter > args.via_hole):
+        raise ValueError("via diameter must be larger than via hole and both must be positive")
+
+    start_layer_id = board.GetLayerID(args.start_layer)
+    end_layer_id = board.GetLayerID(args.end_layer)
+    if start_layer_id == end_layer_id:
+        raise ValueError("start layer and end layer must differ")
+
+    if args.max_frequency is not None:  # 周波数から最大の間隔を求める 比誘電率の指定が無ければ始点レイヤーの下の誘電体の値を使う
+        if args.pitch:
+            raise ValueError("give either --pitch or --max-frequency, not both")
+        er = args.er
+        if er is None:
+            dielectric = fence.stackup_dielectric(board, start_layer_id)
+            if dielectric is None:
+                raise ValueError("no dielectric found below {} in the board stackup: give --er".format(args.start_layer))
+            er = dielectric[1]
+        pitch = pcbnew.FromMM(math.floor(float(impedance.max_via_pitch(args.max_frequency * 1e9, er)) * 100) / 100)  # 0.01mm単位で切り捨て
+    else:
+        pitch = pcbnew.FromMM(args.pitch)
+
+    return fence.FenceSettings(
+        via_diameter=pcbnew.FromMM(args.via_diameter),
+        via_drill=pcbnew.FromMM(args.via_hole),
+        clearance=clearance,
+        net_name=args.via_net,
+        is_free=not args.update_via_net,
+        via_type=fence.VIA_TYPES[args.via_type],
+        start_layer_id=start_layer_id,
+        end_layer_id=end_layer_id,
+        remove_unconnected_annular_ring=args.remove_unconnected_annular_rings,
+        connected_path=args.connected_path,
+        avoid_collisions=args.avoid_collisions,
+        corridor=args.corridor,
+        pitch=pitch,
+    )
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m plugins.headless", description="Apply Via Fence Generator and Square Track Generator to a .kicad_pcb file without the GUI")
+    parser.add_argument("board", help="input .kicad_pcb file")
+    parser.add_argument("-o", "--output", help="output .kicad_pcb file (default: overwrite the input)")
+
+    selection = parser.add_argument_group("track selection")
+    selection.add_argument("--net", action="append", dest="nets", help="net name or wildcard pattern (repeatable)")
+    selection.add_argument("--netclass", action="append", dest="netclasses", help="netclass name (repeatable)")
+    selection.add_argument("--layer", action="append", dest="layers", help="copper layer name such as F.Cu (repeatable)")
+
+    via = parser.add_argument_group("via fence")
+    via.add_argument("--fence", action="store_true", help="add a via fence to the selected tracks")
+    via.add_argument("--via-net", default="", help="net of the fence vias")
+    via.add_argument("--update-via-net", action="store_true", help="let KiCad update the via net automatically")
+    via.add_argument("--clearance", type=float, default=0.0, help="track to via clearance in mm")
+    via.add_argument("--use-zone-clearance", action="store_true", help="use the clearance of the zone on --via-net")
+    via.add_argument("--via-diameter", type=float, default=0.6, help="via diameter in mm")
+    via.add_argument("--via-hole", type=float, default=0.3, help="via hole in mm")
+    via.add_argument("--via-type", choices=sorted(fence.VIA_TYPES), default="through")
+    via.add_argument("--start-layer", default="F.Cu")
+    via.add_argument("--end-layer", default="B.Cu")
+    via.add_argument("--remove-unconnected-annular-rings", action="store_true", help="keep annular rings only on start, end and connected layers")
+    via.add_argument("--connected-path", action="store_true", help="fence connected tracks as one continuous path")
+    via.add_argument("--corridor", action="store_true", help="fence parallel tracks such as differential pairs only along the outer boundary of the bundle")
+    via.add_argument("--avoid-collisions", action="store_true", help="skip vias that would collide with other copper, keepouts or the board edge")
+    via.add_argument("--pitch", type=float, default=0.0, help="via center-to-center pitch in mm (default: the via diameter)")
+    via.add_argument("--max-frequency", type=float, help="set the pitch to 1/20 of the wavelength in the dielectric at this frequency in GHz")
+    via.add_argument("--er", type=float, help="dielectric constant for --max-frequency (default: the dielectric below --start-layer in the board stackup)")
+
+    stitch = parser.add_argument_group("via stitching")
+    stitch.add_argument("--stitch", action="store_true", help="fill every zone on --via-net with a grid of --pitch stitching vias (uses the via settings above)")
+    stitch.add_argument("--staggered", action="store_true", help="offset every other row of the stitching grid by half the pitch")
+
+    exchange_group = parser.add_argument_group("fence export and import")
+    exchange_group.add_argument("--import-fences", metavar="NPZ", help="re-apply fences exported from another revision of this board to the tracks that did not change")
+    exchange_group.add_argument("--force-import", action="store_true", help="also re-apply the fences of tracks that were moved or reshaped since the export")
+    exchange_group.add_argument("--export-fences", metavar="NPZ", help="export the generated fences of the selected tracks to this file")
+
+    square = parser.add_argument_group("square track")
+    square.add_argument("--square", action="store_true", help="replace the selected tracks with square-ended polygons")
+    square.add_argument("--merge", action="store_true", help="merge connected square tracks into one polygon per net and layer")
+    square.add_argument("--no-clip-to-pads", action="store_true", help="do not trim track ends that stick out of the pad they end in")
+    square.add_argument("--max-error", type=float, help="maximum chord error of arc outlines in mm (default: the board's maximum error setting)")
+    return parser
+
+
+def run(args, timer=profiling.DISABLED):  # 戻り値は(配置したビアの数, 置き換えた配線の数) timerには工程ごとの時間と件数を記録する スティッチングビアもビアの数に含める
+    with timer.phase("load"):
+        board = pcbnew.LoadBoard(args.board)
+    with timer.phase("selection"):
+        tracks = select_tracks(board, args.nets, args.netclasses, args.layers)
+
+    via_count = 0
+    square_count = 0
+    if args.import_fences:  # 書き出したフェンスは座標計算をせずに置き直す 新しく生成するフェンスは置き直したビアと重ならない位置に置く
+        via_count += exchange.import_fences(board, args.import_fences, args.force_import, timer)[0]
+    if args.fence:  # 配線をポリゴンに置き換える前にビアを配置する
+        via_count += fence.place_fence(board, tracks, fence_settings_from_args(board, args), timer)
+    if args.stitch:  # ゾーンの塗りつぶしは保存されているものを使う
+        settings = fence_settings_from_args(board, args)
+        if not settings.pitch:
+            raise ValueError("--stitch needs --pitch or --max-frequency")
+        zones = stitching.stitch_zones_of_net(board, args.via_net)
+        if not zones:
+            raise ValueError("no zone found on net '{}' for --stitch".format(args.via_net))
+        via_count += stitching.stitch_zones(board, zones, settings, args.staggered, timer)
+    if args.export_fences:  # 四角い配線に置き換えると元の配線が無くなるので,その前に書き出す
+        with timer.phase("export"):
+            exchange.export_fences(board, args.export_fences, tracks)
+    if args.square:
+        square_count = convert_tracks(board, tracks, None if args.max_error is None else pcbnew.FromMM(args.max_error), args.merge, timer, not args.no_clip_to_pads)
+
+    with timer.phase("save"):
+        pcbnew.SaveBoard(args.output or args.board, board)
+    return via_count, square_count
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not (args.fence or args.stitch or args.square or args.import_fences or args.export_fences):
+        parser.error("nothing to do: give --fence, --stitch, --square, --import-fences and/or --export-fences")
+    try:
+        via_count, square_count = run(args)
+    except (ValueError, OSError) as e:
+        parser.error(str(e))
+    print("{}: {} vias placed, {} tracks squared".format(args.output or args.board, via_count, square_count))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+import contextlib
+import cProfile
+import os
+import tempfile
+import time
+
+# プラグインの処理時間を工程ごとに計測する 環境変数で有効にしたときだけ動き,普段は何もしない
+# KICAD_TLT_PROFILE=1        工程ごとの時間と件数をログファイルに追記する
+# KICAD_TLT_PROFILE=cprofile 上に加えて実行ごとにcProfileの結果(.prof)を保存する
+# KICAD_TLT_PROFILE_DIR      ログと.profの保存先 未設定なら一時フォルダ
+
+LOG_FILE_NAME = "kicad-transmission-line-toolkit.log"
+
+
+def profile_mode():  # 計測の設定 ""=無効 "timing"=時間と件数 "cprofile"=cProfileも使う
+    value = os.environ.get("KICAD_TLT_PROFILE", "").strip().lower()
+    if value in ("", "0", "false", "off"):
+        return ""
+    return "cprofile" if value == "cprofile" else "timing"
+
+
+def output_dir():
+    return os.environ.get("KICAD_TLT_PROFILE_DIR") or tempfile.gettempdir()
+
+
+class RunTimer:
+    def __init__(self, name, mode=None):
+        self.name = name  # ログに表示するプラグイン名
+        self.mode = profile_mode() if mode is None else mode
+        self.enabled = bool(self.mode)
+        self.phases = []  # (工程名, 秒) 実行した順
+        self.counts = {}  # 件数の名前 -> 件数
+        self.profiler = None
+        self.started = time.perf_counter()
+
+    def start(self):  # 計測を始める cProfileはここから有効になる
+        self.started = time.perf_counter()
+        if self.mode == "cprofile":
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        return self
+
+    @contextlib.contextmanager
+    def phase(self, name):  # with timer.phase("geometry"): の範囲の時間を記録する 同じ名前は合算する
+        if not self.enabled:
+            yield
+            return
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - t0)
+
+    def add_time(self, name, seconds):
+        for i, (phase_name, total) in enumerate(self.phases):
+            if phase_name == name:
+                self.phases[i] = (name, total + seconds)
+                return
+        self.phases.append((name, seconds))
+
+    def count(self, name, value):  # 件数を加算する
+        if self.enabled:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def summary(self):  # 1行の要約 例: Via Fence Generator total=0.120s selection=0.010s ... | tracks=10 vias=200
+        total = time.perf_counter() - self.started
+        phases = " ".join("{}={:.3f}s".format(name, seconds) for name, seconds in self.phases)
+        counts = " ".join("{}={}".format(name, value) for name, value in self.counts.items())
+        return "{} total={:.3f}s {} | {}".format(self.name, total, phases, counts).strip(" |")
+
+    def finish(self):  # 計測を終えてログに書き出す 要約を返す 無効のときはNone
+        if not self.enabled:
+            return None
+        if self.profiler is not None:
+            self.profiler.disable()
+        summary = self.summary()
+        directory = output_dir()
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, LOG_FILE_NAME), "a", encoding="utf-8") as f:
+                f.write("{} {}\n".format(stamp, summary))
+            if self.profiler is not None:
+                file_name = "{}-{}.prof".format(self.name.lower().replace(" ", "-"), stamp)
+                self.profiler.dump_stats(os.path.join(directory, file_name))
+        except OSError:  # ログが書けなくてもプラグインの処理は止めない
+            pass
+        self.profiler = None
+        return summary
+
+    def abort(self):  # ログに書き出さずに計測をやめる 中止やエラーで抜けるときに呼ぶ cProfileを止めないと次の実行のenableが失敗する
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler = None
+
+
+DISABLED = RunTimer("", mode="")  # 計測しないときに渡す何もしないタイマー
@@ -0,0 +1,57 @@
+import pcbnew
+
+# 基板エディタで選択中の図形を取得する
+# pcbnew.GetCurrentSelection()が使えるKiCadでは選択ツールから直接受け取り,使えない場合は配線,パッド,グループ,ゾーン,フットプリントを1回だけ走査して選択中のものを覚えておく
+
+TRACK_CLASSES = ("PCB_TRACK", "PCB_ARC")  # 直線と円弧の配線 ビアは含まない
+PAD_CLASSES = ("PAD", "D_PAD")            # D_PADは6.0より前の名前
+GROUP_CLASSES = ("PCB_GROUP",)
+ZONE_CLASSES = ("ZONE", "ZONE_CONTAINER")  # ZONE_CONTAINERは6.0より前の名前
+FOOTPRINT_CLASSES = ("FOOTPRINT", "MODULE")  # MODULEは6.0より前の名前
+
+
+def _current_selection():  # 選択ツールが持っている選択中の図形 取得できないバージョンではNone
+    get_current_selection = getattr(pcbnew, "GetCurrentSelection", None)
+    if get_current_selection is None:
+        return None
+    try:
+        items = get_current_selection()
+    except (TypeError, RuntimeError):  # 基板エディタの外から呼ばれたなど
+        return None
+    return [item.Cast() if hasattr(item, "Cast") else item for item in items]  # BOARD_ITEMのままではクラス固有の関数が使えない
+
+
+class Selection:
+    def __init__(self, board):
+        self.board = board
+        self.items = None     # 選択中の図形 最初の問い合わせで取得する
+        self.scanned = False  # 基板全体を走査して取得したか
+
+    def all_items(self):
+        if self.items is None:
+            items = _current_selection()
+            if items is None:
+                groups = list(self.board.Groups()) if hasattr(self.board, "Groups") else []
+                footprints = list(self.board.GetFootprints() if hasattr(self.board, "GetFootprints") else self.board.GetModules())
+                items = [item for item in list(self.board.GetTracks()) + list(self.board.GetPads()) + groups + list(self.board.Zones()) + footprints if item.IsSelected()]
+                self.scanned = True
+            self.items = items
+        return self.items
+
+    def of_class(self, classes):  # 選択中の図形のうちGetClass()がclassesのどれかであるもの 選択した順
+        return [item for item in self.all_items() if item.GetClass() in classes]
+
+    def tracks(self):
+        return self.of_class(TRACK_CLASSES)
+
+    def pads(self):
+        return self.of_class(PAD_CLASSES)
+
+    def groups(self):
+        return self.of_class(GROUP_CLASSES)
+
+    def zones(self):
+        return self.of_class(ZONE_CLASSES)
+
+    def footprints(self):
+        return self.of_class(FOOTPRINT_CLASSES)
@@ -1,2 +1,3 @@
-from .action import SquareTrackAction
+from .action import SquareTrackAction, MergedSquareTrackAction
 SquareTrackAction().register()
+MergedSquareTrackAction().register()
@@ -0,0 +1,133 @@
+import math
+import pcbnew
+
+# 配線の端点がパッドの中にあるとき,四角くした配線の端のうちパッドからはみ出す部分を削る処理
+# パッドはレイヤーとネットごとの格子に1回の実行につき1回だけ登録し,端点ごとの検索では端点のある格子のパッドだけを調べる
+
+
+def _boolean(poly_set, operation, other):  # KiCad 8以前は多角形の扱い方の引数が必要
+    try:
+        getattr(poly_set, operation)(other)
+    except TypeError:
+        getattr(poly_set, operation)(other, pcbnew.SHAPE_POLY_SET.PM_FAST)
+
+
+class PadIndex:
+    def __init__(self, board, tracks, max_error, cell_size=pcbnew.FromMM(2)):
+        self.cell_size = cell_size
+        self.max_error = max_error
+        self.cells = {}     # (レイヤー, ネット番号, 格子座標) -> パッドのリスト
+        self.outlines = {}  # (パッドのUUID, レイヤー) -> パッドの輪郭のSHAPE_POLY_SET 使うときに作る
+        self.queries = 0    # 端点の検索回数 ベンチマーク用
+        keys = {(track.GetLayer(), track.GetNetCode()) for track in tracks}  # 選択中の配線と同じレイヤーとネットのパッドだけを登録する
+        layers = {layer for layer, _ in keys}
+        for pad in board.GetPads():
+            for layer in layers:
+                if (layer, pad.GetNetCode()) in keys and pad.IsOnLayer(layer):
+                    bbox = pad.GetBoundingBox()
+                    for cell in self.cell_range(bbox.GetLeft(), bbox.GetTop(), bbox.GetRight(), bbox.GetBottom()):
+                        self.cells.setdefault((layer, pad.GetNetCode()) + cell, []).append(pad)
+
+    def cell_range(self, left, top, right, bottom):
+        c = self.cell_size
+        for ix in range(left // c, right // c + 1):
+            for iy in range(top // c, bottom // c + 1):
+                yield (ix, iy)
+
+    def outline(self, pad, layer):  # パッドの輪郭 輪郭の内側に誤差を取って多角形にする
+        key = (pad.m_Uuid.AsString(), layer)
+        if key not in self.outlines:
+            poly_set = pcbnew.SHAPE_POLY_SET()
+            pad.TransformShapeToPolygon(poly_set, layer, 0, self.max_error, pcbnew.ERROR_INSIDE)
+            self.outlines[key] = poly_set
+        return self.outlines[key]
+
+    def pad_at(self, layer, net_code, pos):  # 端点posを含む同じレイヤーとネットのパッド 無ければNone
+        self.queries += 1
+        c = self.cell_size
+        point = pcbnew.VECTOR2I(int(pos[0]), int(pos[1]))
+        for pad in self.cells.get((layer, net_code, pos[0] // c, pos[1] // c), ()):
+            if self.outline(pad, layer).Contains(point):
+                return pad
+        return None
+
+
+def _rings(poly_set):  # 多角形の外周と穴の線
+    for i in range(poly_set.OutlineCount()):
+        yield poly_set.Outline(i)
+        for h in range(poly_set.HoleCount(i)):
+            yield poly_set.Hole(i, h)
+
+
+def exit_distance(pos, direction, poly_set):  # posから向きdirectionに進んでpoly_setの外へ出るまでの距離 外から始まるときは一度中に入ってから出るまで 出なければNone
+    crossings = []
+    for chain in _rings(poly_set):
+        points = [chain.CPoint(k) for k in range(chain.PointCount())]
+        for a, b in zip(points, points[1:] + points[:1]):
+            ex, ey = b.x - a.x, b.y - a.y
+            denom = direction[0] * ey - direction[1] * ex
+            if denom == 0:
+                continue  # 進む向きと平行な辺
+            ax, ay = a.x - pos[0], a.y - pos[1]
+            t = (ax * ey - ay * ex) / denom                      # 半直線上の位置
+            s = (ax * direction[1] - ay * direction[0]) / denom  # 辺上の位置 頂点を2回数えないように終点は含めない
+            if t >= 0 and 0 <= s < 1:
+                crossings.append(t)
+    crossings.sort()
+    inside = poly_set.Contains(pcbnew.VECTOR2I(int(round(pos[0])), int(round(pos[1]))))
+    i = 0 if inside else 1
+    return crossings[i] if i < len(crossings) else None
+
+
+def end_region(pos, direction, length, width):  # 端点から配線の内側へlength,幅widthの長方形
+    nx, ny = -direction[1], direction[0]
+    half = width / 2 + 1  # 配線の側面を確実に含めるため1nm広げる
+    back = (pos[0] + direction[0] * length, pos[1] + direction[1] * length)
+    front = (pos[0] - direction[0], pos[1] - direction[1])  # 端面を確実に含めるため1nm外から始める
+    chain = pcbnew.SHAPE_LINE_CHAIN()
+    for x, y in ((front[0] + nx * half, front[1] + ny * half), (back[0] + nx * half, back[1] + ny * half),
+                 (back[0] - nx * half, back[1] - ny * half), (front[0] - nx * half, front[1] - ny * half)):
+        chain.Append(int(round(x)), int(round(y)))
+    chain.SetClosed(True)
+    region = pcbnew.SHAPE_POLY_SET()
+    region.AddOutline(chain)
+    return region
+
+
+def clip_track_ends(track, poly_set, pad_index):  # 端点がパッドの中にある配線の輪郭から,端のパッドの外にはみ出す部分を削る 削ったらTrueを返す
+    layer = track.GetLayer()
+    net_code = track.GetNetCode()
+    start = track.GetStart()
+    end = track.GetEnd()
+    if track.GetClass() == "PCB_ARC":  # 円弧は端点から中点への向きで近似する パッドの大きさに比べて半径が十分大きければ誤差は小さい
+        mid = track.GetMid()
+        ends = (((start.x, start.y), (mid.x, mid.y)), ((end.x, end.y), (mid.x, mid.y)))
+    else:
+        ends = (((start.x, start.y), (end.x, end.y)), ((end.x, end.y), (start.x, start.y)))
+
+    clipped = False
+    for pos, toward in ends:
+        pad = pad_index.pad_at(layer, net_code, pos)
+        if pad is None:
+            continue
+        length = math.hypot(toward[0] - pos[0], toward[1] - pos[1])
+        if length == 0:
+            continue
+        direction = ((toward[0] - pos[0]) / length, (toward[1] - pos[1]) / length)  # 端点から配線の内側へ向かう単位ベクトル
+        outline = pad_index.outline(pad, layer)
+        # 削る範囲は中心線と両側面のうち最初にパッドの輪郭を出る所まで 外接矩形まで取ると,丸いパッドや斜めに入る配線で輪郭の外の配線まで削れてしまう
+        half = track.GetWidth() / 2
+        exits = [exit_distance((pos[0] - direction[1] * offset, pos[1] + direction[0] * offset), direction, outline) for offset in (0, half, -half)]
+        exits = [d for d in exits if d is not None]
+        if not exits or min(exits) == 0:
+            continue
+        region = end_region(pos, direction, min(length, min(exits)), track.GetWidth())
+
+        # 端からその位置までの部分はパッドの輪郭の内側だけを残す
+        inside = pcbnew.SHAPE_POLY_SET(poly_set)
+        _boolean(inside, "BooleanIntersection", region)
+        _boolean(inside, "BooleanIntersection", outline)
+        _boolean(poly_set, "BooleanSubtract", region)
+        _boolean(poly_set, "BooleanAdd", inside)
+        clipped = True
+    return clipped
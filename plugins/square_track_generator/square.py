@@ -0,0 +1,113 @@
+import pcbnew
+from ..board_commit import BatchCommit
+from .. import profiling
+from .tessellation import arc_outline
+from .pads import PadIndex, clip_track_ends
+
+# 配線を端が四角いポリゴンに置き換える処理 wxに依存しないのでアクションからもヘッドレス実行からも使える
+
+
+def default_max_error(board):  # 円弧を折れ線にするときの許容誤差 基板設定の「最大誤差」を使う
+    return getattr(board.GetDesignSettings(), "m_MaxError", pcbnew.FromMM(0.005))
+
+
+def square_track_chain(track, max_error):  # 配線の輪郭をSHAPE_LINE_CHAINとして返す max_errorは円弧の弦の許容誤差(nm)
+    start = track.GetStart()
+    end = track.GetEnd()
+    width = track.GetWidth()
+    length = track.GetLength()
+
+    chain = pcbnew.SHAPE_LINE_CHAIN()  # ポリゴン座標
+
+    if track.GetClass() == 'PCB_TRACK':
+        sin_ratio = -(end.y - start.y) / length
+        cos_ratio = (end.x - start.x) / length
+        dx = round((width / 2) * sin_ratio)
+        dy = round((width / 2) * cos_ratio)
+
+        chain.Append(start.x - dx, start.y - dy)
+        chain.Append(start.x + dx, start.y + dy)
+        chain.Append(end.x + dx, end.y + dy)
+        chain.Append(end.x - dx, end.y - dy)
+
+    elif track.GetClass() == 'PCB_ARC':
+        center = track.GetCenter()  # 回転中心
+        outline = arc_outline(
+            (center.x, center.y), track.GetRadius(), width,
+            track.GetArcAngleStart().AsRadians(), track.GetAngle().AsRadians(),
+            max_error,
+        )  # 点の数は半径と許容誤差から決まる
+        for x, y in outline.tolist():
+            chain.Append(x, y)
+
+    chain.SetClosed(True)
+    return chain
+
+
+def create_polygon(board, poly_set, layer, net):  # 塗りつぶしたポリゴンの図形を作る
+    poly = pcbnew.PCB_SHAPE(board, pcbnew.SHAPE_T_POLY)
+    poly.SetPolyShape(poly_set)
+    poly.SetWidth(0)
+    poly.SetFilled(True)
+    poly.SetLayer(layer)
+    poly.SetNet(net)
+    return poly
+
+
+def merge_outlines(poly_set):  # 重なった輪郭を合体し,つながった塊ごとのSHAPE_POLY_SETに分ける
+    poly_set.Simplify()  # 全輪郭の和集合を1回のブーリアン演算で求めて単純化する
+    pieces = []
+    for i in range(poly_set.OutlineCount()):
+        piece = pcbnew.SHAPE_POLY_SET()
+        piece.AddOutline(poly_set.Outline(i))
+        for j in range(poly_set.HoleCount(i)):  # 配線がループしているときは穴ができる
+            piece.AddHole(poly_set.Hole(i, j))
+        pieces.append(piece)
+    return pieces
+
+
+def convert_tracks(board, tracks, max_error=None, merge=False, timer=profiling.DISABLED, clip_to_pads=True):  # 配線を削除して同じ形のポリゴンに置き換え 置き換えた数を返す
+    # merge=Trueのときはネットとレイヤーが同じ配線の輪郭を合体し,つながった配線ごとに1つのポリゴンにする
+    # clip_to_pads=Trueのときは端点がパッドの中にある配線の端を,パッドからはみ出さないように削る
+    if max_error is None:
+        max_error = default_max_error(board)
+    timer.count("tracks", len(tracks))
+    pad_index = None
+    if clip_to_pads:
+        with timer.phase("pad_index"):
+            pad_index = PadIndex(board, tracks, max_error)  # 実行ごとに1回だけ作る
+    commit = BatchCommit(board, "Square Track Generator")  # 削除と追加をまとめて1回で反映する
+    groups = {}  # (ネット番号, レイヤー) -> [SHAPE_POLY_SET, ネット]
+    with timer.phase("outline"):
+        for track in tracks:
+            layer = track.GetLayer()  # レイヤーIDを取得 別解:layer = board.GetLayerID(track.GetLayerName())
+            net = track.GetNet()      # ネットを取得
+            chain = square_track_chain(track, max_error)
+            commit.Remove(track)      # 元の配線を削除
+            if track.GetClass() == "PCB_ARC":
+                timer.count("arcs", 1)
+
+            poly_set = pcbnew.SHAPE_POLY_SET()
+            poly_set.AddOutline(chain)
+            if pad_index is not None and clip_track_ends(track, poly_set, pad_index):
+                timer.count("clipped_tracks", 1)
+
+            if merge:
+                group = groups.setdefault((track.GetNetCode(), layer), [pcbnew.SHAPE_POLY_SET(), net])
+                group[0].Append(poly_set)
+                continue
+
+            timer.count("vertices", poly_set.TotalVertices())
+            commit.Add(create_polygon(board, poly_set, layer, net))
+    if pad_index is not None:
+        timer.count("pad_queries", pad_index.queries)
+
+    with timer.phase("merge"):
+        for (_, layer), (poly_set, net) in groups.items():
+            for piece in merge_outlines(poly_set):
+                timer.count("vertices", piece.TotalVertices())
+                commit.Add(create_polygon(board, piece, layer, net))
+    timer.count("polygons", len(commit.added))
+    with timer.phase("commit"):
+        commit.Push()
+    return len(tracks)
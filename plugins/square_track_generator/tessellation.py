@@ -0,0 +1,49 @@
+import math
+from functools import lru_cache
+import numpy as np
+
+# 円弧配線の輪郭を折れ線にする処理 pcbnewに依存しない純粋な関数のみを置く
+# 一定角度ごとに点を打つと半径によらず点数が決まってしまうので,弦と円弧の誤差(サグ)が許容値以下になる最小の点数にする
+# 同じ分割数の円弧では単位円上の点の表を使い回し,円弧ごとにcos,sinを計算しない 単位はnm
+
+
+@lru_cache(maxsize=None)
+def unit_circle(divisions):  # 全周をdivisions等分した単位円上の点のcosとsinの表
+    angles = 2 * np.pi * np.arange(divisions) / divisions
+    return np.cos(angles), np.sin(angles)
+
+
+def circle_divisions(radius, max_error):  # 半径radiusの円を弦の誤差max_error以下で折れ線にするときの全周の分割数
+    if radius <= max_error:
+        return 8
+    step = 2 * math.acos(1 - max_error / radius)  # 1辺あたりの中心角
+    divisions = math.ceil(2 * math.pi / step)
+    return 8 * math.ceil(divisions / 8)  # 8の倍数にそろえて表を使い回しやすくし,45度ごとの角度を必ず含める
+
+
+def arc_angle_indices(angle_start, angle_disp, divisions):  # 始点と終点の間(両端を除く)にある表の番号を始点から終点の順に返す 角度はラジアン
+    step = 2 * math.pi / divisions
+    first = angle_start / step
+    last = (angle_start + angle_disp) / step
+    eps = 1e-6  # 端点とほぼ同じ角度の表の点は端点と重複するので除く
+    if angle_disp >= 0:
+        k = np.arange(math.floor(first + eps) + 1, math.ceil(last - eps))
+    else:
+        k = np.arange(math.ceil(first - eps) - 1, math.floor(last + eps), -1)
+    return k % divisions
+
+
+def arc_edge(center, radius, angle_start, angle_disp, divisions):  # 半径radiusの円弧上の点列(始点と終点を含む)を整数座標で返す
+    cos_table, sin_table = unit_circle(divisions)
+    k = arc_angle_indices(angle_start, angle_disp, divisions)
+    angle_end = angle_start + angle_disp
+    cos = np.concatenate([[math.cos(angle_start)], cos_table[k], [math.cos(angle_end)]])  # 始点と終点だけは正確な角度で計算する
+    sin = np.concatenate([[math.sin(angle_start)], sin_table[k], [math.sin(angle_end)]])
+    return np.stack([center[0] + np.round(radius * cos), center[1] + np.round(radius * sin)], axis=1).astype(np.int64)
+
+
+def arc_outline(center, radius, width, angle_start, angle_disp, max_error):  # 円弧配線の輪郭 内側の縁を始点から終点へ,外側の縁を終点から始点へたどる
+    divisions = circle_divisions(radius + width / 2, max_error)  # 誤差が最も大きくなる外側の縁に合わせ,内側も同じ角度で分割する
+    inner = arc_edge(center, radius - width / 2, angle_start, angle_disp, divisions)
+    outer = arc_edge(center, radius + width / 2, angle_start, angle_disp, divisions)
+    return np.concatenate([inner, outer[::-1]])
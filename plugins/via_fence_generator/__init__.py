@@ -1,2 +1,6 @@
-from .action import ViaFenceAction
+from .action import ViaFenceAction, RegenerateFenceAction, StitchZoneAction, ExportFenceAction, ImportFenceAction
 ViaFenceAction().register()
+StitchZoneAction().register()
+RegenerateFenceAction().register()
+ExportFenceAction().register()
+ImportFenceAction().register()
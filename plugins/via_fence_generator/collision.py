@@ -0,0 +1,78 @@
+import pcbnew
+
+# ビアの候補位置が他の導体,キープアウト,基板外形と干渉しないかを調べるための格子インデックス
+# Applyごとに1回だけ基板を走査して図形を格子に登録し,候補1個あたりの判定では周囲の格子の図形だけを調べる
+
+
+class CopperIndex:
+    def __init__(self, board, via_net_code, via_layers, via_clearance, exclude_uuids=(), cell_size=pcbnew.FromMM(2)):
+        self.cell_size = cell_size
+        self.cells = {}    # 格子座標 -> 図形番号のリスト
+        self.items = []    # (判定関数, クリアランス)
+        self.checks = 0    # 詳細判定の回数 ベンチマーク用
+        via_layers = list(via_layers)
+
+        def on_via_layers(item):
+            return any(item.IsOnLayer(layer_id) for layer_id in via_layers)
+
+        def own_clearance(item, layer_id):  # 図形側のネットクラスのクリアランスとビア側のクリアランスの大きい方
+            try:
+                return max(via_clearance, item.GetOwnClearance(layer_id))
+            except (AttributeError, TypeError):
+                return via_clearance
+
+        # 他のネットの配線,ビア,パッド 同じネットの導体とはぶつかってもよい フェンスの元の配線は配線とビアのクリアランスで離してあるので除く
+        for item in list(board.GetTracks()) + list(board.GetPads()):
+            if item.GetNetCode() == via_net_code and via_net_code > 0:
+                continue
+            if item.m_Uuid.AsString() in exclude_uuids or not on_via_layers(item):
+                continue
+            layer_id = next(layer_id for layer_id in via_layers if item.IsOnLayer(layer_id))
+            self.insert(item.GetBoundingBox(), item.HitTest, own_clearance(item, layer_id))
+
+        # ビアを禁止したルールエリア(キープアウト)は内部も含めて判定する
+        for zone in board.Zones():
+            if zone.GetIsRuleArea() and zone.GetDoNotAllowVias() and on_via_layers(zone):
+                outline = zone.Outline()
+                self.insert(zone.GetBoundingBox(), lambda pos, accuracy, outline=outline: outline.Collide(pos, accuracy), 0)
+
+        # 基板外形の線からは導体と基板端のクリアランスだけ離す フットプリントの中のスロットや切り欠きも同じく扱う
+        edge_clearance = board.GetDesignSettings().m_CopperEdgeClearance
+        footprints = board.GetFootprints() if hasattr(board, "GetFootprints") else board.GetModules()  # GetModulesは6.0より前の名前
+        drawings = list(board.GetDrawings()) + [drawing for footprint in footprints for drawing in footprint.GraphicalItems()]
+        for drawing in drawings:
+            if drawing.GetLayer() == pcbnew.Edge_Cuts:
+                self.insert(drawing.GetBoundingBox(), drawing.HitTest, edge_clearance)
+
+        # 基板外形の外側にあるビアも除く 外形が閉じていない基板では判定しない
+        self.board_outline = pcbnew.SHAPE_POLY_SET()
+        if not board.GetBoardPolygonOutlines(self.board_outline) or self.board_outline.OutlineCount() == 0:
+            self.board_outline = None
+
+    def cell_range(self, left, top, right, bottom):
+        c = self.cell_size
+        for ix in range(left // c, right // c + 1):
+            for iy in range(top // c, bottom // c + 1):
+                yield (ix, iy)
+
+    def insert(self, bbox, hit_test, clearance):  # 外接矩形をクリアランス分広げた範囲の格子に登録する
+        index = len(self.items)
+        self.items.append((hit_test, clearance))
+        for cell in self.cell_range(bbox.GetLeft() - clearance, bbox.GetTop() - clearance, bbox.GetRight() + clearance, bbox.GetBottom() + clearance):
+            self.cells.setdefault(cell, []).append(index)
+
+    def collides(self, pos, radius):  # 半径radiusのビアを置くと何かと干渉するか
+        point = pcbnew.VECTOR2I(pos[0], pos[1])
+        if self.board_outline is not None and not self.board_outline.Contains(point):
+            return True
+        seen = set()
+        for cell in self.cell_range(pos[0] - radius, pos[1] - radius, pos[0] + radius, pos[1] + radius):
+            for index in self.cells.get(cell, ()):
+                if index in seen:
+                    continue
+                seen.add(index)
+                hit_test, clearance = self.items[index]
+                self.checks += 1
+                if hit_test(point, radius + clearance):
+                    return True
+        return False
@@ -0,0 +1,543 @@
+import numpy as np
+import pcbnew
+import time
+import wx
+from .dialog import Dialog
+from . import fence
+from . import impedance
+from . import stitching
+from .preview import FencePreview
+from .snapshot import BoardSnapshot, board_stamp
+from .. import profiling
+from ..board_state import board_key
+from ..selection import Selection
+
+# Via Fence Generatorの設定ダイアログの操作 wxとNumPyを使うのでViaFenceActionの初回実行時に読み込まれる
+
+PREVIEW_DELAY_MS = 300  # 最後の入力からプレビューを更新するまでの時間
+SLICE_SECONDS = 0.05    # ビアの配置を1回のイベントで進める時間 これより長く続けずにイベントループに戻して描画とCancelを受け付ける
+GAUGE_RANGE = 1000      # dialog.pyのgaugeProgressの最大値
+
+# 基板が変わっても前回の入力値を引き継ぐウィジェット
+CHOICE_WIDGETS = ("lstViaNet", "lstDefinedViaSizes", "lstViaType", "lstStartLayer", "lstEndLayer", "lstAnnularRings", "lstLineType")
+TEXT_WIDGETS = ("txtTrackToViaClearance", "txtViaDiameter", "txtViaHole", "txtViaPitch", "txtMaxFrequency", "txtEpsilonR", "txtDielectricHeight")
+CHECK_WIDGETS = ("chkUpdateViaNet", "chkUseZoneClearance", "chkConnectedPath", "chkAvoidCollisions", "chkPreview", "chkStaggered", "chkCorridor")
+
+LINE_TYPES = [("Microstrip", "microstrip"), ("Coplanar waveguide", "cpw"), ("Grounded coplanar waveguide", "gcpw")]  # 表示名とimpedanceでの名前
+
+
+class FenceDialog(Dialog):  # dialog.pyでBindされた割り込み関数のうち,プレビューを更新するもの(計算方法の切り替え,表示の切り替え,ピッチの入力)をコントローラーへ渡す
+    def __init__(self, parent, controller):
+        self.controller = controller
+        Dialog.__init__(self, parent)
+
+    def chkConnectedPathOnCheckBox(self, event):
+        self.controller.chkPreviewOnCheckBox(event)
+
+    def chkAvoidCollisionsOnCheckBox(self, event):
+        self.controller.chkPreviewOnCheckBox(event)
+
+    def chkPreviewOnCheckBox(self, event):  # chkCorridorもdialog.pyでこの関数にBindされている
+        self.controller.chkPreviewOnCheckBox(event)
+
+    def txtViaPitchOnText(self, event):  # 入力値の判定とプレビューの更新はチェックボックスと同じ
+        self.controller.chkPreviewOnCheckBox(event)
+
+
+class ViaFenceController:
+    def __init__(self, name, stitch=False):
+        self.name = name  # 計測のログに表示するプラグイン名
+        self.stitch = stitch  # True=配線のフェンスではなくゾーンをスティッチングビアで埋める
+        self.dlg = None       # ダイアログ 閉じても破棄せずに次のRunで使い回す
+        self.board = None
+        self.snapshot = None  # 選択肢に使った基板の情報 基板が変わったときだけ作り直す
+        self.zone_clearance_list = []
+        self.last_values = None  # 直近の入力値 ダイアログが親ウィンドウと一緒に破棄されたときに新しいダイアログへ引き継ぐ
+
+        self.lstDefinedViaSizesOnChoice_is_active = False  # 定義済みサイズが選択されたときの自動テキスト入力により定義済みサイズの選択が解除されてしまうことを避けるためのフラグ
+        self.chkUseZoneClearanceOnCheckBox_is_active = False
+        self.selected_tracks = []  # 選択中の配線のキャッシュ ダイアログに戻ってきたときに更新する
+        self.selected_zones = []   # スティッチングでの選択中のゾーンのキャッシュ
+        self.net_zones = None      # スティッチングでのビアのネットのゾーンのキャッシュ (ネット名, ゾーンのリスト) 選択と一緒に読み直す
+        self.selection_seconds = 0.0  # 直近の選択の読み直しにかかった時間 計測が有効なときにログに含める
+        self.preview = None        # 候補位置のプレビュー Run時に作る
+        self.preview_timer = None  # 入力が続いている間はプレビューを更新しないためのタイマー
+        self.steps = None       # 実行中のビアの配置(fence.place_fence_stepsの生成器) 実行中でなければNone
+        self.run_timer = None   # 実行中のビアの配置の計測
+        self.run_stamp = None   # ビアの配置を始めたときの基板のboard_stamp 途中で基板が編集されたら中止する
+
+    def is_numeric(self, s):  # 文字列が数値を表しているか
+        try:
+            float(s)
+            return True
+        except ValueError:
+            return False
+
+    def is_pitch_valid(self, s):  # ビアの間隔が空欄(ビアの直径)か0以上の数値であるか スティッチングでは隙間なく埋めても意味が無いので正の数値に限る
+        if self.stitch:
+            return self.is_numeric(s) and float(s) > 0
+        return s.strip() == "" or (self.is_numeric(s) and float(s) >= 0)
+    '''
+    def is_positive_num(self, s):  # 文字列が正の数値を表しているか否か
+        try:
+            if float(s) > 0:  # 正の数値
+                return True
+            else:  # 0以下の数値
+                return False
+        except ValueError:  # そもそも数値ではない
+            return False
+    '''
+    def is_via_size_valid(self, txt_diameter, txt_hole):  # ビアサイズが有効な数値であるか
+        try:
+            if all([float(txt_diameter) > 0, float(txt_hole) > 0, float(txt_diameter) > float(txt_hole)]):  # ここにアニュラリングの最小幅も含める？
+                return True
+            else:
+                return False
+        except ValueError:  # そもそも数値ではない
+            return False
+
+    def update_apply_button_state(self):  # Applyボタンを押してもよい諸条件を記述 入力が変わるたびに呼ばれるのでプレビューの更新もここで予約する
+        self.dlg.subsubSizer3Apply.Enable(all([
+            self.dlg.lstStartLayer.GetSelection() != self.dlg.lstEndLayer.GetSelection(),  # レイヤーが同じではない
+            self.is_numeric(self.dlg.txtTrackToViaClearance.GetValue()),  # クリアランスが数字である クリアランスは0以下でもよい
+            self.is_via_size_valid(self.dlg.txtViaDiameter.GetValue(), self.dlg.txtViaHole.GetValue()),  # ビアサイズが有効な数値であるか
+            self.is_pitch_valid(self.dlg.txtViaPitch.GetValue()),  # ビアの間隔が空欄か0以上の数値である
+            bool(self.stitch_targets() if self.stitch else self.selected_tracks),  # いずれかの配線(スティッチングではゾーン)がある 入力のたびに基板全体を走査しないようにキャッシュを使う
+            self.steps is None  # ビアの配置の実行中ではない 実行中はプレビューも表示しない
+        ]))
+        self.schedule_preview()
+
+    def schedule_preview(self):  # 入力が止まってからプレビューを更新する キー入力ごとに選択全体を計算し直さないようにする
+        if self.stitch or not self.dlg.chkPreview.IsChecked() or not self.dlg.subsubSizer3Apply.IsEnabled():  # スティッチングにはプレビューが無い
+            self.clear_preview()  # 入力が不正なときやプレビューが無効なときは表示しない
+            return
+        if self.preview_timer is None:
+            self.preview_timer = wx.CallLater(PREVIEW_DELAY_MS, self.update_preview)
+        else:
+            self.preview_timer.Start(PREVIEW_DELAY_MS)  # 実行前なら待ち時間を延ばし,実行後ならもう一度予約する
+
+    def update_preview(self):  # 変わった配線だけを計算し直して候補位置を表示する
+        if not self.dlg.IsActive() or not self.dlg.chkPreview.IsChecked() or not self.dlg.subsubSizer3Apply.IsEnabled():  # 基板エディタに移った後は表示しない
+            return
+        self.preview.show(self.selected_tracks, self.read_settings())
+        pcbnew.Refresh()
+
+    def clear_preview(self):
+        if self.preview_timer is not None:
+            self.preview_timer.Stop()
+        if self.preview is not None and self.preview.shapes:
+            self.preview.clear()
+            pcbnew.Refresh()
+
+    def chkPreviewOnCheckBox(self, event):  # プレビューの表示切り替えや計算方法の変更はすぐに反映する
+        self.update_apply_button_state()
+
+    def refresh_selected_tracks(self):  # 選択中の配線(スティッチングではゾーンも)を基板から読み直してキャッシュする
+        t0 = time.perf_counter()
+        selection = Selection(self.board)
+        self.selected_tracks = selection.tracks()
+        self.selected_zones = selection.zones() if self.stitch else []
+        self.net_zones = None  # 基板が編集されたかもしれないので次に必要になったときに探し直す
+        self.selection_seconds = time.perf_counter() - t0
+
+    def stitch_targets(self):  # スティッチングビアで埋めるゾーン 選択されていなければビアのネットのすべてのゾーン
+        if self.selected_zones:
+            return self.selected_zones
+        net_name = self.dlg.lstViaNet.GetStringSelection()
+        if self.net_zones is None or self.net_zones[0] != net_name:  # 入力のたびに全ゾーンを走査しないように,ネットが変わったときだけ探し直す
+            self.net_zones = (net_name, stitching.stitch_zones_of_net(self.board, net_name))
+        return self.net_zones[1]
+
+    def OnActivate(self, event):  # 基板エディタで選択を変えてからダイアログに戻ってきたときだけ選択状態を読み直す
+        if event.GetActive() and self.steps is None:  # ビアの配置の実行中は配置し終えるまで選択を読み直さない
+            self.preview.invalidate_board()  # 基板が編集されたかもしれないので既存ビアなどを読み直させる 配線ごとのキャッシュは形が変わった配線だけ無効になる
+            self.load_snapshot()  # ゾーンやレイヤーの設定が変わっていたときだけ選択肢を作り直す
+            self.refresh_selected_tracks()
+            self.update_apply_button_state()  # プレビューも表示し直す
+        elif not event.GetActive():  # 基板エディタを操作している間はプレビューの円を基板に残さない 保存や削除,アンドゥに巻き込まれないようにする
+            self.clear_preview()
+        event.Skip()
+
+    # クリアランス入力補間に関わる割り込み関数
+    def chkUseZoneClearanceOnCheckBox(self, event):
+        if self.dlg.chkUseZoneClearance.IsChecked():  # Use zone clearanceが有効になったとき,テキストボックスにゾーンのクリアランスを入力
+            self.chkUseZoneClearanceOnCheckBox_is_active = True
+            self.dlg.txtTrackToViaClearance.SetValue(str(pcbnew.ToMM(self.zone_clearance_list[self.dlg.lstViaNet.GetSelection()])))
+            self.chkUseZoneClearanceOnCheckBox_is_active = False
+
+        self.update_apply_button_state()
+
+    def txtTrackToViaClearanceOnText(self, event):  # 上の関数内のSetValueフラグが立っていないときチェックを外す
+        if not self.chkUseZoneClearanceOnCheckBox_is_active:
+            self.dlg.chkUseZoneClearance.SetValue(False)
+
+        self.update_apply_button_state()
+
+    # ビアサイズ入力補間に関わる割り込み関数
+    def lstDefinedViaSizesOnChoice(self, event):  # 定義済みビアサイズが選択されたとき,テキストボックスに定義済みサイズを入力
+        if self.dlg.lstDefinedViaSizes.GetSelection() != wx.NOT_FOUND:
+            self.lstDefinedViaSizesOnChoice_is_active = True
+            self.dlg.txtViaDiameter.SetValue(str(pcbnew.ToMM(self.snapshot.via_sizes[self.dlg.lstDefinedViaSizes.GetSelection()][0])))
+            self.dlg.txtViaHole.SetValue(str(pcbnew.ToMM(self.snapshot.via_sizes[self.dlg.lstDefinedViaSizes.GetSelection()][1])))
+            self.lstDefinedViaSizesOnChoice_is_active = False
+
+        self.update_apply_button_state()
+
+    def txtViaSizesOnText(self, event):  # 上の関数内のSetValueフラグが立っていないとき定義済みビアサイズの選択を外す
+        if not self.lstDefinedViaSizesOnChoice_is_active:
+            self.dlg.lstDefinedViaSizes.SetSelection(wx.NOT_FOUND)
+
+        self.update_apply_button_state()
+
+    # レイヤーペアの判定と操作の関数(レイヤーペアが隣接していれば当然アニュラリングはAll copper layersに必要になる)
+    def check_via_layer_pair_adjacency(self):
+        if abs(self.dlg.lstStartLayer.GetSelection() - self.dlg.lstEndLayer.GetSelection()) == 1:  # レイヤーが隣接
+            self.dlg.lstAnnularRings.SetSelection(0)  # All copper layersにする
+            self.dlg.lstAnnularRings.Enable(False)    # グレーアウトでAll copper layersに固定
+        else:
+            self.dlg.lstAnnularRings.Enable(True)
+
+    # ビアタイプの判定と操作の関数(ビアタイプがthroughならばレイヤーペアはF.Cu,B.Cuでないといけない)
+    def check_via_type_and_set_layer_pair(self):
+        if self.dlg.lstViaType.GetSelection() == 0:  # throughが選択されたときレイヤー設定をF.CuとB.Cuにしてからグレーアウト
+            self.dlg.lstStartLayer.SetSelection(0)   # F.Cu
+            self.dlg.lstEndLayer.SetSelection(self.dlg.lstEndLayer.GetCount() - 1)  # B.Cu
+            self.dlg.lstStartLayer.Enable(False)     # グレーアウトでF.Cu,B.Cuに固定
+            self.dlg.lstEndLayer.Enable(False)
+
+            self.check_via_layer_pair_adjacency()    # 変更されたレイヤーペアの隣接判定とそれに伴う設定
+
+        else:  # through以外でグレーアウトを解除
+            self.dlg.lstStartLayer.Enable(True)
+            self.dlg.lstEndLayer.Enable(True)
+
+    def lstViaTypeOnChoice(self, event):  # ビアタイプ変更時に呼ばれる割り込み関数
+        self.check_via_type_and_set_layer_pair()
+
+        self.update_apply_button_state()
+
+    def lstLayerPairOnChoice(self, event):  # レイヤーペア変更時に呼ばれる割り込み関数
+        self.check_via_layer_pair_adjacency()  # 変更されたレイヤーペアの隣接判定とそれに伴う設定
+
+        self.update_apply_button_state()
+
+    def Run(self):  # ツールバーアイコンが押された時にViaFenceActionから呼ばれる 2回目以降は前回のダイアログと入力値をそのまま使う
+        board = pcbnew.GetBoard()
+        if not self.dlg:  # 初回か,親ウィンドウと一緒にダイアログが破棄されていたとき wxでは破棄されたウィンドウは偽になる
+            self.create_dialog()
+        if self.board is None or board_key(board) != board_key(self.board):  # 別の基板が開かれていればプレビューのキャッシュも作り直す
+            self.clear_preview()
+            self.preview = FencePreview(board)
+        else:
+            self.preview.invalidate_board()  # 閉じている間に基板が編集されたかもしれないので既存ビアなどを読み直させる
+        self.board = board
+        self.load_snapshot()  # 基板が変わっていなければ選択肢は作り直さない
+
+        # Applyボタンの有効無効は定期的に調べず,入力や選択が変わったときにだけ判定する
+        self.refresh_selected_tracks()
+        self.update_apply_button_state()
+
+        self.dlg.Show()
+        self.dlg.Raise()
+
+    def create_dialog(self):  # ダイアログを作って割り込み関数を登録する 基板によらない選択肢もここで登録する
+        pcb_frame = next(
+            x for x in wx.GetTopLevelWindows() if x.GetName() == "PcbFrame"  # 親ウィンドウの設定
+        )
+        self.dlg = FenceDialog(pcb_frame, self)
+        self.snapshot = None  # 新しいダイアログには基板の選択肢がまだ無いので,次のload_snapshotで前回の入力値と一緒に登録する
+
+        # 配線とビアのクリアランスの補間制御
+        self.dlg.chkUseZoneClearance.Bind(wx.EVT_CHECKBOX, self.chkUseZoneClearanceOnCheckBox)  # Use zone clearanceの状態が変化したときに関数を呼び出す
+        self.dlg.txtTrackToViaClearance.Bind(wx.EVT_TEXT, self.txtTrackToViaClearanceOnText)
+        self.dlg.lstViaNet.Bind(wx.EVT_CHOICE, self.chkUseZoneClearanceOnCheckBox)  # ネットが変わったときにクリアランスも更新 チェックが入った時と同じ操作なので関数も同じ スティッチングで埋めるゾーンも変わる
+
+        # 定義済みビアサイズの補間制御
+        self.dlg.lstDefinedViaSizes.Bind(wx.EVT_CHOICE, self.lstDefinedViaSizesOnChoice)  # 定義済みビアサイズが選択されたときに関数を呼び出す
+        self.dlg.txtViaDiameter.Bind(wx.EVT_TEXT, self.txtViaSizesOnText)  # DiameterとHoleどちらのテキストボックスに入力されても呼び出す関数は同じ
+        self.dlg.txtViaHole.Bind(wx.EVT_TEXT, self.txtViaSizesOnText)
+
+        # 内層アニュラリングの選択肢を登録する
+        self.dlg.lstAnnularRings.Append("All copper layers")
+        self.dlg.lstAnnularRings.Append("Start, end, and connected layers")
+        #self.dlg.lstAnnularRings.Append("Connected layers only")  # これの設定方法は不明
+        self.dlg.lstAnnularRings.SetSelection(0)  # レイヤーペアが隣接していないときでもAll copper layersを初期設定とするため記述が必要
+
+        # ビアタイプを登録し初期設定をThroughとする
+        self.dlg.lstViaType.Append("Through")
+        self.dlg.lstViaType.Append("Micro")
+        self.dlg.lstViaType.Append("Blind/buried")
+        self.dlg.lstViaType.SetSelection(0)
+        self.dlg.lstViaType.Bind(wx.EVT_CHOICE, self.lstViaTypeOnChoice)  # ビアタイプが選択されたときに関数を呼び出す
+
+        self.dlg.lstStartLayer.Bind(wx.EVT_CHOICE, self.lstLayerPairOnChoice)  # レイヤーペア変更時に隣接判定を行う
+        self.dlg.lstEndLayer.Bind(wx.EVT_CHOICE, self.lstLayerPairOnChoice)
+
+        # 候補位置のプレビューを更新するchkConnectedPath,chkAvoidCollisions,chkPreview,chkCorridor,txtViaPitchはdialog.pyのBindからFenceDialogを通して呼ばれる
+
+        # 周波数と誘電体からフェンスの間隔とクリアランスの推奨値を求める 裏面にグラウンドのあるコプレーナ線路を初期設定とする
+        for label, _ in LINE_TYPES:
+            self.dlg.lstLineType.Append(label)
+        self.dlg.lstLineType.SetSelection(len(LINE_TYPES) - 1)
+        self.dlg.btnRecommend.Bind(wx.EVT_BUTTON, self.btnRecommendOnButtonClick)
+
+        # スティッチングでは配線のフェンス用の項目を隠し,格子の並べ方の項目だけを見せる
+        if self.stitch:
+            self.dlg.SetTitle("Via Stitching")
+            for widget in (self.dlg.chkConnectedPath, self.dlg.chkAvoidCollisions, self.dlg.chkPreview, self.dlg.chkCorridor):  # 干渉する位置には常に置かない
+                widget.Hide()
+        else:
+            self.dlg.chkStaggered.Hide()
+        self.dlg.Layout()
+
+        self.dlg.Bind(wx.EVT_ACTIVATE, self.OnActivate)  # 配線の選択はダイアログの外で変わるのでダイアログに戻ってきたときに読み直す
+
+        self.dlg.subsubSizer3Apply.Bind(wx.EVT_BUTTON, self.subsubSizer3OnApplyButtonClick)
+        self.dlg.subsubSizer3Cancel.Bind(wx.EVT_BUTTON, self.subsubSizer3OnCancelButtonClick)  # 閉じるボタンもwx.ID_CANCELのボタンとして扱われる
+
+    def load_snapshot(self):  # 基板が変わっていたときだけゾーンのネット,導体レイヤー,定義済みビアサイズの選択肢を作り直す
+        if self.snapshot is not None and self.snapshot.is_current(self.board):
+            return
+        self.snapshot = BoardSnapshot(self.board)
+        if self.dlg.lstStartLayer.GetCount() or self.last_values is None:
+            values = self.widget_values()  # 作り直す前の選択を名前で覚えておく
+        else:
+            values = self.last_values  # 作り直したダイアログには前のダイアログの入力値を引き継ぐ
+
+        self.dlg.lstViaNet.Clear()
+        for net_name, _ in self.snapshot.zone_nets:  # ネット名が同じゾーンは重複せずそれぞれ登録される
+            self.dlg.lstViaNet.Append(net_name)
+            if "GND" in net_name:
+                self.dlg.lstViaNet.SetSelection(self.dlg.lstViaNet.GetCount() - 1)  # 現在登録されている数を使うと直近で登録されたものを選べる
+        self.zone_clearance_list = [clearance for _, clearance in self.snapshot.zone_nets]
+        '''
+        # ゾーンのものに限らずすべてのネットを登録する場合
+        nets = self.board.GetNetsByName()
+        for index, (_ , net) in enumerate(nets.items(), -1):  # ダミーのネット(None?)が存在しているため実際に登録されるのはindex=0番から
+            net_name = net.GetNetname()
+            if net_name != None and net_name != "":
+                self.dlg.lstViaNet.Append(net_name)  # 同名ネットがあっても表示上は一つ
+                if "GND" in net_name:
+                    self.dlg.lstViaNet.SetSelection(index)
+        '''
+
+        self.dlg.lstDefinedViaSizes.Clear()
+        for diameter, drill in self.snapshot.via_sizes:
+            self.dlg.lstDefinedViaSizes.Append(str(pcbnew.ToMM(diameter)) + " / " + str(pcbnew.ToMM(drill)))
+
+        # 有効レイヤーの取得と登録(8.0以前)
+        '''
+        for layer_id in range(32):  # IDが0から31のレイヤーのうち有効なものを登録(初めの32層は全て導体レイヤー)
+            if self.board.IsLayerEnabled(layer_id):
+                self.dlg.lstStartLayer.Append(self.board.GetLayerName(layer_id))
+                self.dlg.lstEndLayer.Append(self.board.GetLayerName(layer_id))
+        '''
+
+        # 有効レイヤーの登録(9.0に対応) F.Cu,内層,B.Cuの順に並ぶ
+        self.dlg.lstStartLayer.Clear()
+        self.dlg.lstEndLayer.Clear()
+        for _, layer_name in self.snapshot.copper_layers:
+            self.dlg.lstStartLayer.Append(layer_name)
+            self.dlg.lstEndLayer.Append(layer_name)
+
+        self.restore_widget_values(values)  # 前の基板や前回のダイアログで選んでいたものが新しい選択肢にもあれば選び直す
+
+    def widget_values(self):  # ダイアログの入力値 選択肢は番号ではなく表示されている文字列で覚える
+        return {
+            "choices": {name: getattr(self.dlg, name).GetStringSelection() for name in CHOICE_WIDGETS},
+            "texts": {name: getattr(self.dlg, name).GetValue() for name in TEXT_WIDGETS},
+            "checks": {name: getattr(self.dlg, name).GetValue() for name in CHECK_WIDGETS},
+        }
+
+    def restore_widget_values(self, values):
+        for name, value in values["texts"].items():
+            getattr(self.dlg, name).ChangeValue(value)  # SetValueと違いEVT_TEXTが発生しないのでチェックや定義済みサイズの選択が外れない
+        for name, value in values["checks"].items():
+            getattr(self.dlg, name).SetValue(value)
+        for name, value in values["choices"].items():
+            index = getattr(self.dlg, name).FindString(value) if value else wx.NOT_FOUND
+            if index != wx.NOT_FOUND:
+                getattr(self.dlg, name).SetSelection(index)
+        if not values["choices"]["lstStartLayer"]:  # 初めて選択肢を作ったときはF.CuとB.Cuにする
+            self.dlg.lstStartLayer.SetSelection(0)
+            self.dlg.lstEndLayer.SetSelection(self.dlg.lstEndLayer.GetCount() - 1)
+
+        # ビアタイプの初期設定がthroughならばF.CuとB.Cuをレイヤーペアの初期設定としてグレーアウトしさらにそれらの隣接判定を行う
+        self.check_via_type_and_set_layer_pair()  # through以外ならばレイヤーペアは設定されないし隣接判定も行われない
+        self.check_via_layer_pair_adjacency()
+        if self.dlg.chkUseZoneClearance.IsChecked() and self.dlg.lstViaNet.GetSelection() != wx.NOT_FOUND:  # ゾーンのクリアランスが変わっていれば表示も合わせる
+            self.dlg.txtTrackToViaClearance.ChangeValue(str(pcbnew.ToMM(self.zone_clearance_list[self.dlg.lstViaNet.GetSelection()])))
+        if not self.dlg.txtEpsilonR.GetValue() and not self.dlg.txtDielectricHeight.GetValue():  # 誘電体が未入力なら始点レイヤーの下の誘電体を基板の層構成から入れておく
+            dielectric = self.snapshot.dielectrics.get(self.board.GetLayerID(self.dlg.lstStartLayer.GetStringSelection()))
+            if dielectric is not None:
+                self.dlg.txtEpsilonR.ChangeValue("{:g}".format(dielectric[1]))
+                self.dlg.txtDielectricHeight.ChangeValue(str(pcbnew.ToMM(dielectric[0])))
+
+    def subsubSizer3OnCancelButtonClick(self, event):  # ダイアログは破棄せずに隠して次のRunで入力値ごと使い回す
+        if self.steps is not None:  # ビアの配置の実行中なら中止するだけでダイアログは隠さない
+            self.steps.close()  # 基板への反映は最後の区切りでまとめて行うので途中で止めれば基板は変わらない
+            self.finish_run("Cancelled. The board was not changed.")
+            return
+        self.clear_preview()  # プレビューの円を基板に残さない
+        self.last_values = self.widget_values()
+        self.dlg.Hide()
+
+    def read_settings(self):  # ダイアログの入力値からビアのパラメータを読み込む
+        # netの読み込み 選択していないとネット無しになるがエラーは無い
+        via_net_name = self.dlg.lstViaNet.GetStringSelection()
+
+        # ビアのネットの自動更新の有無 自動更新無しがTrue
+        via_is_free = not self.dlg.chkUpdateViaNet.IsChecked()
+
+        # ビアタイプ読み込み 何かしらが必ず選択されている
+        VIA_TYPE_LIST = [pcbnew.VIATYPE_THROUGH,pcbnew.VIATYPE_MICROVIA, pcbnew.VIATYPE_BLIND_BURIED,pcbnew.VIATYPE_NOT_DEFINED]
+        via_type = VIA_TYPE_LIST[self.dlg.lstViaType.GetSelection()]
+
+        # 配線とビアのクリアランスの読み込み
+        if self.dlg.chkUseZoneClearance.IsChecked():
+            # Use zone clearanceにチェック時は導体ゾーンのクリアランスを使用
+            track_to_via_clearance = self.zone_clearance_list[self.dlg.lstViaNet.GetSelection()]
+        else:
+            # 無効時はテキストボックスから テキストボックスを編集するとチェックが外れる
+            track_to_via_clearance = pcbnew.FromMM(float(self.dlg.txtTrackToViaClearance.GetValue()))
+
+        # ビアサイズの読み込み
+        if self.dlg.lstDefinedViaSizes.GetSelection() != wx.NOT_FOUND:
+            # 定義済みサイズが選択されているときはリストから 割り込みにより定義済みサイズが選択されると同時にテキストボックスにも同じサイズが書き込まれる
+            via_diameter = self.snapshot.via_sizes[self.dlg.lstDefinedViaSizes.GetSelection()][0]  # テキストにも書き込まれているが変換されてるので元の値を使う
+            via_drill    = self.snapshot.via_sizes[self.dlg.lstDefinedViaSizes.GetSelection()][1]
+        else:
+            # 選択されていないときはテキストボックスから テキストボックスを編集すると選択が解除されてwx.NOT_FOUNDになる
+            via_diameter = pcbnew.FromMM(float(self.dlg.txtViaDiameter.GetValue()))
+            via_drill    = pcbnew.FromMM(float(self.dlg.txtViaHole.GetValue()))
+
+        # レイヤーペアの読み込み 何かしらが必ず選択されている
+        via_start_layer_id = self.board.GetLayerID(self.dlg.lstStartLayer.GetStringSelection())  # layer_idを保持するのは大変なのでレイヤー名だけ保持してここでIDに変換
+        via_end_layer_id   = self.board.GetLayerID(self.dlg.lstEndLayer.GetStringSelection())    # StartとEndのレイヤーの上下が逆の場合はKiCadが戻してくれる
+
+        # 内層アニュラリングの除去の有無
+        via_remove_unconnected_annular_ring = bool(self.dlg.lstAnnularRings.GetSelection())  # 0=All copper layers=False, 1=True
+
+        # ビアの間隔の読み込み 空欄ならビアの直径で隙間なく並べる
+        via_pitch = pcbnew.FromMM(float(self.dlg.txtViaPitch.GetValue())) if self.dlg.txtViaPitch.GetValue().strip() else 0
+
+        return fence.FenceSettings(
+            via_diameter=via_diameter, via_drill=via_drill, clearance=track_to_via_clearance,
+            net_name=via_net_name, is_free=via_is_free, via_type=via_type,
+            start_layer_id=via_start_layer_id, end_layer_id=via_end_layer_id,
+            remove_unconnected_annular_ring=via_remove_unconnected_annular_ring,
+            connected_path=self.dlg.chkConnectedPath.IsChecked(),  # 接続された配線を1本の経路として扱うか
+            avoid_collisions=self.dlg.chkAvoidCollisions.IsChecked(),  # 他の導体などと干渉する位置を避けるか
+            corridor=self.dlg.chkCorridor.IsChecked() and not self.stitch,  # 並走する配線の束の外周にだけ並べるか
+            pitch=via_pitch,
+        )
+
+    def btnRecommendOnButtonClick(self, event):  # 周波数と誘電体からフェンスの間隔(とマイクロストリップ線路ではクリアランス)を入力し,選択中の配線の特性インピーダンスを表示する
+        texts = (self.dlg.txtMaxFrequency.GetValue(), self.dlg.txtEpsilonR.GetValue(), self.dlg.txtDielectricHeight.GetValue())
+        if not all(self.is_numeric(text) and float(text) > 0 for text in texts):
+            self.show_recommendation("Enter max frequency, Er and dielectric height")
+            return
+        frequency, er, height = float(texts[0]) * 1e9, float(texts[1]), float(texts[2])  # 長さはmm
+        line = LINE_TYPES[self.dlg.lstLineType.GetSelection()][1]
+
+        # コプレーナ線路のギャップは今のクリアランス(ギャップの外側のグラウンドの縁にビアを並べる)
+        if self.dlg.chkUseZoneClearance.IsChecked() and self.dlg.lstViaNet.GetSelection() != wx.NOT_FOUND:
+            gap = pcbnew.ToMM(self.zone_clearance_list[self.dlg.lstViaNet.GetSelection()])
+        elif self.is_numeric(self.dlg.txtTrackToViaClearance.GetValue()):
+            gap = float(self.dlg.txtTrackToViaClearance.GetValue())
+        else:
+            gap = None
+        if line != "microstrip" and not (gap is not None and gap > 0):
+            self.show_recommendation("Enter the gap as the track to via clearance")
+            return
+
+        # 選択中の配線の幅ごとにまとめて計算する 配線が無ければ間隔だけを求める
+        widths = np.unique([pcbnew.ToMM(track.GetWidth()) for track in self.selected_tracks])
+        pitches, clearances = impedance.recommend_fence(line, widths if len(widths) else 1.0, gap, height, er, frequency)
+        pitch = np.floor(pitches.min() * 100) / 100  # 最大の間隔なので0.01mm単位で切り捨てる
+        self.dlg.txtViaPitch.SetValue("{:g}".format(pitch))
+        if line == "microstrip":
+            self.dlg.txtTrackToViaClearance.SetValue("{:g}".format(np.ceil(clearances.max() * 100) / 100))  # 入力したのでUse zone clearanceのチェックは外れる
+
+        message = "Max pitch {:g} mm".format(pitch)
+        if len(widths):
+            z0, eeff = impedance.impedance(line, widths, gap, height, er)
+            message = "Z0 {} ohm, Er eff {:.2f}, ".format("{:.1f}".format(z0.min()) if z0.min() == z0.max() else "{:.1f}-{:.1f}".format(z0.min(), z0.max()), eeff.mean()) + message
+        if self.is_via_size_valid(self.dlg.txtViaDiameter.GetValue(), self.dlg.txtViaHole.GetValue()) and pitch < float(self.dlg.txtViaDiameter.GetValue()):
+            message += " (smaller than the via diameter)"  # ビアを隙間なく並べても足りない
+        self.show_recommendation(message)
+
+    def show_recommendation(self, message):
+        self.dlg.lblImpedance.SetLabel(message)
+        self.dlg.Layout()
+
+    def subsubSizer3OnApplyButtonClick(self, event):  # ビアの配置を始める 区切りごとにcontinue_runで進めるので実行中もダイアログは操作できる
+        timer = profiling.RunTimer(self.name).start()  # 環境変数KICAD_TLT_PROFILEで有効にしたときだけ工程ごとの時間を記録する
+        timer.add_time("selection", self.selection_seconds)
+        try:
+            settings = self.read_settings()
+
+            self.clear_preview()  # プレビューの円を消してから本物のビアを置く
+            # pcbnewのオブジェクトは別のスレッドから触れないので,別スレッドではなくイベントループの合間に少しずつ進める
+            if self.stitch:
+                self.steps = stitching.stitch_steps(self.board, self.stitch_targets(), settings, self.dlg.chkStaggered.IsChecked(), timer)  # 他の導体と干渉しない格子点にだけビアを配置
+            else:
+                self.steps = fence.place_fence_steps(self.board, self.selected_tracks, settings, timer)  # 既存ビアと重ならない位置にだけビアを配置
+        except Exception:
+            timer.abort()
+            raise
+        self.run_timer = timer
+        self.run_stamp = board_stamp(self.board)
+        self.show_progress(0, 1, "Placing vias...")
+        self.update_apply_button_state()  # 実行中はApplyボタンを無効にする
+        wx.CallLater(1, self.continue_run)
+
+    def continue_run(self):  # SLICE_SECONDSの間だけビアの配置を進め,終わっていなければ次のイベントで続ける
+        if self.steps is None:  # Cancelで中止された
+            return
+        if board_stamp(self.board) != self.run_stamp:  # 途中で基板が編集されると選択した配線や既存ビアが変わっているかもしれない
+            self.steps.close()
+            self.finish_run("The board was edited. Cancelled without changing the board.")
+            return
+        deadline = time.perf_counter() + SLICE_SECONDS
+        try:
+            while time.perf_counter() < deadline:
+                done, total = next(self.steps)
+                self.show_progress(done, total, "Placing vias... {}%".format(100 * done // max(total, 1)))
+        except StopIteration as stop:  # 最後の区切りで基板に反映された
+            self.complete_run(stop.value[0])
+            return
+        except Exception:
+            self.finish_run("")
+            raise
+        wx.CallLater(1, self.continue_run)
+
+    def complete_run(self, added):
+        timer = self.run_timer
+        with timer.phase("clear_selection"):
+            for item in self.selected_tracks + self.selected_zones:
+                item.ClearSelected()  # 選択状態を解除 途中で中止したときは選択を残す
+        with timer.phase("refresh"):
+            pcbnew.Refresh()
+        timer.finish()  # 要約をログファイルに追記する
+
+        self.preview.invalidate_board()  # 置いたビアを既存ビアとして読み直させる
+        self.snapshot.touch(self.board)
+        self.last_values = self.widget_values()  # ビアの配置ではゾーン,レイヤー,ビアサイズの選択肢は変わらないので作り直さない
+        self.selected_tracks = []  # 選択はすべて解除したのでApplyボタンを無効にする
+        self.selected_zones = []
+        self.finish_run("{} vias placed".format(added))
+
+    def finish_run(self, message):  # 実行中の状態を片付けてApplyボタンの状態を戻す
+        if self.run_timer is not None:  # 中止やエラーで終わったときはログを書かずに計測だけ止める complete_runでfinishした後は何もしない
+            self.run_timer.abort()
+        self.steps = None
+        self.run_timer = None
+        self.run_stamp = None
+        self.show_progress(0, 1, message)
+        self.update_apply_button_state()
+
+    def show_progress(self, done, total, message):
+        self.dlg.gaugeProgress.SetValue(GAUGE_RANGE * done // max(total, 1))
+        self.dlg.lblProgress.SetLabel(message)
+        self.dlg.Layout()
@@ -0,0 +1,34 @@
+import numpy as np
+from .path import near_pairs, segment_distances
+
+# 差動ペアや並走する配線の束を1本の通路としてフェンスする計算 pcbnewに依存しない純粋な関数のみを置く
+# 配線ごとに両側へ並べた候補のうち,並走する別の配線の側にある(束の内側の)候補を除き,束の外周の候補だけを残す
+# 単位はすべてnm(KiCadの内部単位)
+
+PARALLEL_COS = np.cos(np.radians(20))  # 配線から候補へ進んだ距離のうちこの割合以上だけ別の配線に近づけば,その配線は候補の側を並走している
+
+
+def corridor_keep(points, feet, sources, seg_a, seg_b, seg_sources, offsets, pitch, tolerance):  # 束の外周にある候補はTrue
+    # points: 候補の座標 feet: 候補に最も近い元の配線上の点 sources: 候補の元の配線の番号
+    # seg_a, seg_b, seg_sources: 選択中の配線を折れ線にした線分と元の配線の番号 offsets: 配線ごとの中心からビア中心までの距離
+    # 候補を除くのは,別の配線Bに対して次のどちらかが成り立つとき
+    #   Bにクリアランスより近い(狭い差動ペアでは内側の候補がBを越えた先に来る)
+    #   Bが候補の側を並走していて,元の配線とBの間隔が両方のオフセットとpitchの和より狭い(間に置いても1列のフェンスにしかならない)
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    keep = np.ones(len(points), dtype=bool)
+    offsets = np.asarray(offsets, dtype=np.float64)
+    if len(points) == 0 or len(seg_a) == 0:
+        return keep
+    reach = offsets[seg_sources] + offsets.max() + pitch  # 束とみなす配線の間隔の上限 これより遠い線分は調べない
+    point, seg, dist = near_pairs(points, seg_a, seg_b, reach)
+    other = seg_sources[seg] != sources[point]
+    point, seg, dist = point[other], seg[other], dist[other]
+
+    own = offsets[sources[point]]
+    their = offsets[seg_sources[seg]]
+    spacing = segment_distances(np.asarray(feet, dtype=np.float64)[point], seg_a[seg], seg_b[seg])  # 元の配線とBの間隔
+    clash = dist < their - tolerance
+    facing = spacing - dist > own * PARALLEL_COS
+    bundled = spacing < own + their + pitch
+    keep[point[clash | (facing & bundled)]] = False
+    return keep
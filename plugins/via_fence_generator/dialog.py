@@ -20,7 +20,7 @@ _ = gettext.gettext
 class Dialog ( wx.Dialog ):
 
     def __init__( self, parent ):
-        wx.Dialog.__init__ ( self, parent, id = wx.ID_ANY, title = _(u"Via Fence Generator"), pos = wx.DefaultPosition, size = wx.Size( 900,500 ), style = wx.DEFAULT_DIALOG_STYLE )
+        wx.Dialog.__init__ ( self, parent, id = wx.ID_ANY, title = _(u"Via Fence Generator"), pos = wx.DefaultPosition, size = wx.Size( 900,750 ), style = wx.DEFAULT_DIALOG_STYLE )
 
         self.SetSizeHints( wx.DefaultSize, wx.DefaultSize )
 
@@ -146,8 +146,106 @@ class Dialog ( wx.Dialog ):
 
         mainSizer.Add( subSizer2, 1, wx.EXPAND, 5 )
 
+        subSizer4 = wx.StaticBoxSizer( wx.StaticBox( self, wx.ID_ANY, _(u"Fence settings") ), wx.VERTICAL )
+
+        subsubSizer4 = wx.FlexGridSizer( 0, 3, 0, 0 )
+        subsubSizer4.SetFlexibleDirection( wx.BOTH )
+        subsubSizer4.SetNonFlexibleGrowMode( wx.FLEX_GROWMODE_SPECIFIED )
+
+        self.chkConnectedPath = wx.CheckBox( subSizer4.GetStaticBox(), wx.ID_ANY, _(u"Fence connected tracks as one path"), wx.DefaultPosition, wx.DefaultSize, 0 )
+        subsubSizer4.Add( self.chkConnectedPath, 0, wx.ALL, 5 )
+
+        self.chkAvoidCollisions = wx.CheckBox( subSizer4.GetStaticBox(), wx.ID_ANY, _(u"Skip vias that collide with other copper or board edges"), wx.DefaultPosition, wx.DefaultSize, 0 )
+        subsubSizer4.Add( self.chkAvoidCollisions, 0, wx.ALL, 5 )
+
+        self.chkPreview = wx.CheckBox( subSizer4.GetStaticBox(), wx.ID_ANY, _(u"Preview fence (candidate vias drawn on User.Drawings)"), wx.DefaultPosition, wx.DefaultSize, 0 )
+        subsubSizer4.Add( self.chkPreview, 0, wx.ALL, 5 )
+
+        self.chkStaggered = wx.CheckBox( subSizer4.GetStaticBox(), wx.ID_ANY, _(u"Stagger stitching grid rows"), wx.DefaultPosition, wx.DefaultSize, 0 )
+        subsubSizer4.Add( self.chkStaggered, 0, wx.ALL, 5 )
+
+        self.chkCorridor = wx.CheckBox( subSizer4.GetStaticBox(), wx.ID_ANY, _(u"Fence parallel tracks as one corridor"), wx.DefaultPosition, wx.DefaultSize, 0 )
+        subsubSizer4.Add( self.chkCorridor, 0, wx.ALL, 5 )
+
+
+        subSizer4.Add( subsubSizer4, 1, wx.EXPAND, 5 )
+
+
+        mainSizer.Add( subSizer4, 1, wx.EXPAND, 5 )
+
+        subSizer5 = wx.StaticBoxSizer( wx.StaticBox( self, wx.ID_ANY, _(u"Fence pitch") ), wx.VERTICAL )
+
+        subsubSizer5 = wx.FlexGridSizer( 0, 4, 0, 0 )
+        subsubSizer5.SetFlexibleDirection( wx.BOTH )
+        subsubSizer5.SetNonFlexibleGrowMode( wx.FLEX_GROWMODE_SPECIFIED )
+
+        self.m_staticText10 = wx.StaticText( subSizer5.GetStaticBox(), wx.ID_ANY, _(u"Via pitch (mm, blank = via diameter):"), wx.DefaultPosition, wx.DefaultSize, 0 )
+        self.m_staticText10.Wrap( -1 )
+
+        subsubSizer5.Add( self.m_staticText10, 0, wx.ALL, 5 )
+
+        self.txtViaPitch = wx.TextCtrl( subSizer5.GetStaticBox(), wx.ID_ANY, wx.EmptyString, wx.DefaultPosition, wx.DefaultSize, 0 )
+        subsubSizer5.Add( self.txtViaPitch, 0, wx.ALL, 5 )
+
+        self.m_staticText11 = wx.StaticText( subSizer5.GetStaticBox(), wx.ID_ANY, _(u"Max frequency (GHz):"), wx.DefaultPosition, wx.DefaultSize, 0 )
+        self.m_staticText11.Wrap( -1 )
+
+        subsubSizer5.Add( self.m_staticText11, 0, wx.ALL, 5 )
+
+        self.txtMaxFrequency = wx.TextCtrl( subSizer5.GetStaticBox(), wx.ID_ANY, wx.EmptyString, wx.DefaultPosition, wx.DefaultSize, 0 )
+        subsubSizer5.Add( self.txtMaxFrequency, 0, wx.ALL, 5 )
+
+        self.m_staticText12 = wx.StaticText( subSizer5.GetStaticBox(), wx.ID_ANY, _(u"Dielectric constant (Er):"), wx.DefaultPosition, wx.DefaultSize, 0 )
+        self.m_staticText12.Wrap( -1 )
+
+        subsubSizer5.Add( self.m_staticText12, 0, wx.ALL, 5 )
+
+        self.txtEpsilonR = wx.TextCtrl( subSizer5.GetStaticBox(), wx.ID_ANY, wx.EmptyString, wx.DefaultPosition, wx.DefaultSize, 0 )
+        subsubSizer5.Add( self.txtEpsilonR, 0, wx.ALL, 5 )
+
+        self.m_staticText13 = wx.StaticText( subSizer5.GetStaticBox(), wx.ID_ANY, _(u"Dielectric height (mm):"), wx.DefaultPosition, wx.DefaultSize, 0 )
+        self.m_staticText13.Wrap( -1 )
+
+        subsubSizer5.Add( self.m_staticText13, 0, wx.ALL, 5 )
+
+        self.txtDielectricHeight = wx.TextCtrl( subSizer5.GetStaticBox(), wx.ID_ANY, wx.EmptyString, wx.DefaultPosition, wx.DefaultSize, 0 )
+        subsubSizer5.Add( self.txtDielectricHeight, 0, wx.ALL, 5 )
+
+        self.m_staticText14 = wx.StaticText( subSizer5.GetStaticBox(), wx.ID_ANY, _(u"Line type:"), wx.DefaultPosition, wx.DefaultSize, 0 )
+        self.m_staticText14.Wrap( -1 )
+
+        subsubSizer5.Add( self.m_staticText14, 0, wx.ALL, 5 )
+
+        lstLineTypeChoices = []
+        self.lstLineType = wx.Choice( subSizer5.GetStaticBox(), wx.ID_ANY, wx.DefaultPosition, wx.DefaultSize, lstLineTypeChoices, 0 )
+        self.lstLineType.SetSelection( 0 )
+        subsubSizer5.Add( self.lstLineType, 0, wx.ALL, 5 )
+
+        self.btnRecommend = wx.Button( subSizer5.GetStaticBox(), wx.ID_ANY, _(u"Recommend pitch and clearance"), wx.DefaultPosition, wx.DefaultSize, 0 )
+        subsubSizer5.Add( self.btnRecommend, 0, wx.ALL, 5 )
+
+        self.lblImpedance = wx.StaticText( subSizer5.GetStaticBox(), wx.ID_ANY, wx.EmptyString, wx.DefaultPosition, wx.DefaultSize, 0 )
+        self.lblImpedance.Wrap( -1 )
+
+        subsubSizer5.Add( self.lblImpedance, 0, wx.ALL, 5 )
+
+
+        subSizer5.Add( subsubSizer5, 1, wx.EXPAND, 5 )
+
+
+        mainSizer.Add( subSizer5, 1, wx.EXPAND, 5 )
+
         subSizer3 = wx.BoxSizer( wx.HORIZONTAL )
 
+        self.gaugeProgress = wx.Gauge( self, wx.ID_ANY, 1000, wx.DefaultPosition, wx.DefaultSize, wx.GA_HORIZONTAL )
+        self.gaugeProgress.SetValue( 0 )
+        subSizer3.Add( self.gaugeProgress, 1, wx.ALL|wx.EXPAND, 5 )
+
+        self.lblProgress = wx.StaticText( self, wx.ID_ANY, wx.EmptyString, wx.DefaultPosition, wx.DefaultSize, 0 )
+        self.lblProgress.Wrap( -1 )
+
+        subSizer3.Add( self.lblProgress, 0, wx.ALL, 5 )
+
 
         subSizer3.Add( ( 0, 0), 1, wx.EXPAND, 5 )
 
@@ -181,6 +279,12 @@ class Dialog ( wx.Dialog ):
         self.txtViaHole.Bind( wx.EVT_TEXT, self.txtViaHoleOnText )
         self.lstEndLayer.Bind( wx.EVT_CHOICE, self.lstEndLayerOnChoice )
         self.lstAnnularRings.Bind( wx.EVT_CHOICE, self.lstAnnularRingsOnChoice )
+        self.chkConnectedPath.Bind( wx.EVT_CHECKBOX, self.chkConnectedPathOnCheckBox )
+        self.chkAvoidCollisions.Bind( wx.EVT_CHECKBOX, self.chkAvoidCollisionsOnCheckBox )
+        self.chkPreview.Bind( wx.EVT_CHECKBOX, self.chkPreviewOnCheckBox )
+        self.chkCorridor.Bind( wx.EVT_CHECKBOX, self.chkPreviewOnCheckBox )
+        self.txtViaPitch.Bind( wx.EVT_TEXT, self.txtViaPitchOnText )
+        self.btnRecommend.Bind( wx.EVT_BUTTON, self.btnRecommendOnButtonClick )
         self.subsubSizer3Apply.Bind( wx.EVT_BUTTON, self.subsubSizer3OnApplyButtonClick )
         self.subsubSizer3Cancel.Bind( wx.EVT_BUTTON, self.subsubSizer3OnCancelButtonClick )
 
@@ -222,6 +326,21 @@ class Dialog ( wx.Dialog ):
     def lstAnnularRingsOnChoice( self, event ):
         event.Skip()
 
+    def chkConnectedPathOnCheckBox( self, event ):
+        event.Skip()
+
+    def chkAvoidCollisionsOnCheckBox( self, event ):
+        event.Skip()
+
+    def chkPreviewOnCheckBox( self, event ):
+        event.Skip()
+
+    def txtViaPitchOnText( self, event ):
+        event.Skip()
+
+    def btnRecommendOnButtonClick( self, event ):
+        event.Skip()
+
     def subsubSizer3OnApplyButtonClick( self, event ):
         event.Skip()
 
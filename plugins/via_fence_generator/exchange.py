@@ -0,0 +1,175 @@
+import json
+import struct
+import zipfile
+import numpy as np
+import pcbnew
+from ..board_commit import BatchCommit
+from .. import profiling
+from .records import FenceRecords, geometry_key
+from . import fence
+
+# 生成したフェンスを配列のファイル(.npz)に書き出し,別の版の基板へ座標計算をせずにそのまま置き直す
+# ビアの座標,サイズ,レイヤーペア,ネットと元の配線のUUID,配線の形,生成時の設定を配列として保存する
+# np.savezの無圧縮のzipに入れるので,読み込みではメンバーごとにファイルをメモリマップして全体を読み込まずに使える
+
+FORMAT_VERSION = 1
+TRACK_CLASSES = ("PCB_TRACK", "PCB_ARC")  # track_classesの番号
+
+
+def _via_flags(via):  # bit0=ネットを自動更新しない bit1=未接続の内層アニュラリングを除く
+    return int(bool(via.GetIsFree())) | int(bool(via.GetRemoveUnconnected())) << 1
+
+
+def export_fences(brd, path, tracks=None):  # 記録のあるフェンスをpathに書き出し,書き出したビアの数を返す tracks=Noneなら記録のあるすべての配線
+    # 記録には配線の形のハッシュしか無いので,生成したときから動いていない配線のフェンスだけを今の配線の形と一緒に書き出す
+    records = FenceRecords(brd)
+    track_uuids = records.track_uuids() if tracks is None else [t.m_Uuid.AsString() for t in tracks if t.m_Uuid.AsString() in records]
+    board_tracks = {t.m_Uuid.AsString(): t for t in brd.GetTracks() if t.GetClass() in TRACK_CLASSES}
+    vias = {via.m_Uuid.AsString(): via for via in brd.GetTracks() if via.GetClass() == "PCB_VIA"}
+    groups = fence.board_groups(brd)
+
+    settings_index = {}  # 設定のJSON -> 番号
+    net_index = {}       # ネット名 -> 番号
+    track_rows = []      # (UUID, 配線の種類, 形, 設定の番号)
+    via_rows = []        # (x, y, 直径, 穴径, 始点レイヤー, 終点レイヤー, ビアタイプ, ネットの番号, フラグ, 配線の番号)
+    for uuid in track_uuids:
+        record = records.get(uuid)
+        track = board_tracks.get(uuid)
+        if track is None or record["geometry"] != geometry_key(fence.track_geometry(track)):
+            continue  # 削除されたか動いた配線のフェンスは古いので書き出さない
+        track_vias = [vias[via_uuid] for via_uuid in fence.fence_vias(record, groups) if via_uuid in vias]  # 手で削除されたビアは書き出さない
+        if not track_vias:
+            continue
+        settings = json.dumps(fence.recorded_settings(record), sort_keys=True)
+        geometry = fence.track_geometry(track)
+        track_rows.append((uuid, TRACK_CLASSES.index(geometry[0]), (list(geometry[1:]) + [0, 0])[:7], settings_index.setdefault(settings, len(settings_index))))
+        for via in track_vias:
+            pos = via.GetPosition()
+            via_rows.append((pos.x, pos.y, via.GetWidth(), via.GetDrillValue(), via.TopLayer(), via.BottomLayer(), via.GetViaType(),
+                             net_index.setdefault(via.GetNetname(), len(net_index)), _via_flags(via), len(track_rows) - 1))
+
+    via_array = np.array(via_rows, dtype=np.int64).reshape(-1, 10)
+    np.savez(  # 無圧縮で保存する メモリマップで読めるようにするため
+        path,
+        version=np.array(FORMAT_VERSION),
+        via_positions=via_array[:, 0:2],
+        via_diameters=via_array[:, 2],
+        via_drills=via_array[:, 3],
+        via_layers=via_array[:, 4:6].astype(np.int32),
+        via_types=via_array[:, 6].astype(np.int8),
+        via_nets=via_array[:, 7].astype(np.int32),
+        via_flags=via_array[:, 8].astype(np.uint8),
+        via_tracks=via_array[:, 9].astype(np.int32),  # 配線の番号の昇順に並ぶ
+        nets=np.array(list(net_index), dtype=str),
+        track_uuids=np.array([row[0] for row in track_rows], dtype=str),
+        track_classes=np.array([row[1] for row in track_rows], dtype=np.int8),
+        track_geometry=np.array([row[2] for row in track_rows], dtype=np.int64).reshape(-1, 7),  # 始点,終点,幅,円弧の中点
+        track_settings=np.array([row[3] for row in track_rows], dtype=np.int32),
+        settings=np.array(list(settings_index), dtype=str),
+    )
+    return len(via_array)
+
+
+def load_fences(path, mmap=True):  # 書き出したファイルの配列の辞書 mmap=Trueでは無圧縮のメンバーをメモリマップする
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if not mmap or info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    arrays[name] = np.load(member, allow_pickle=False)
+                continue
+            # zipのローカルヘッダーの後ろにある.npyのヘッダーを読み,配列の本体の位置からメモリマップする
+            f.seek(info.header_offset)
+            name_length, extra_length = struct.unpack("<HH", f.read(30)[26:30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+            shape, fortran_order, dtype = read_header(f)
+            if dtype.hasobject:
+                raise ValueError("'{}' in {} holds Python objects and cannot be loaded safely".format(name, path))
+            if int(np.prod(shape)) == 0:  # 長さ0のメモリマップは作れない
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode="r", shape=shape, order="F" if fortran_order else "C", offset=f.tell())
+    if int(arrays.get("version", 0)) != FORMAT_VERSION:
+        raise ValueError("{} is not a via fence export (format version {})".format(path, FORMAT_VERSION))
+    return arrays
+
+
+def import_fences(brd, path, force=False, timer=profiling.DISABLED):  # 書き出したフェンスを基板に置き直す 戻り値は(追加したビアの数, 置かなかった配線の数)
+    # UUIDが同じ配線のうち形が書き出したときと同じものだけに置く force=Trueでは形が変わった配線にも置き,次の再生成で作り直させる
+    # 置いた配線の古いフェンスは取り除き,他のビアと0.1mm以内の位置には置かない 記録も書き出したときの形と設定で作り直す
+    with timer.phase("load"):
+        data = load_fences(path)
+        track_uuids = data["track_uuids"]
+        via_tracks = np.asarray(data["via_tracks"])
+        bounds = np.searchsorted(via_tracks, np.arange(len(track_uuids) + 1))  # 配線ごとのビアの範囲
+        nets = [str(net) for net in data["nets"]]
+        settings_list = [json.loads(str(settings)) for settings in data["settings"]]
+
+    records = FenceRecords(brd)
+    board_tracks = {t.m_Uuid.AsString(): t for t in brd.GetTracks() if t.GetClass() in TRACK_CLASSES}
+    vias = {via.m_Uuid.AsString(): via for via in brd.GetTracks() if via.GetClass() == "PCB_VIA"}
+
+    targets = []  # (書き出した配線の番号, 基板上の配線, 記録する形)
+    skipped = 0
+    for t, uuid in enumerate(str(uuid) for uuid in track_uuids):
+        track = board_tracks.get(uuid)
+        track_class = TRACK_CLASSES[int(data["track_classes"][t])]
+        geometry = [track_class] + [int(v) for v in data["track_geometry"][t][:7 if track_class == "PCB_ARC" else 5]]  # 直線には中点が無い
+        if track is None or (not force and geometry != list(fence.track_geometry(track))):
+            skipped += 1
+            continue
+        targets.append((t, track, geometry))
+    timer.count("tracks", len(targets))
+    timer.count("skipped_tracks", skipped)
+
+    commit = BatchCommit(brd, "Via Fence Generator (Import)")
+    fence_groups = fence.board_groups(brd)
+    replaced = set()
+    for _, track, _ in targets:  # 置き直す配線の古いフェンス
+        record = records.get(track.m_Uuid.AsString())
+        for via_uuid in (fence.fence_vias(record, fence_groups) if record is not None else ()):
+            if via_uuid in vias:
+                commit.Remove(vias[via_uuid])
+                replaced.add(via_uuid)
+    for group in fence_groups.values():  # ビアがすべて取り除かれるグループは残さない
+        members = [item.m_Uuid.AsString() for item in group.GetItems()]
+        if members and all(uuid in replaced for uuid in members):
+            commit.Remove(group)
+    with timer.phase("existing_vias"):
+        pos_set = fence.create_position_set(brd, fence.existing_via_positions(brd, replaced))
+
+    positions = np.asarray(data["via_positions"])
+    added = 0
+    groups = []  # 配線ごとのグループ
+    with timer.phase("create_via"):
+        for t, track, geometry in targets:
+            settings_number = int(data["track_settings"][t])
+            via_count = 0
+            group = None
+            for i in range(bounds[t], bounds[t + 1]):
+                pos = positions[i].tolist()
+                if not pos_set.append(pos):
+                    continue  # 他のビアと重なる
+                start_layer_id, end_layer_id = (int(layer_id) for layer_id in data["via_layers"][i])
+                flags = int(data["via_flags"][i])
+                via = fence.create_via(brd, pos, int(data["via_diameters"][i]), int(data["via_drills"][i]), nets[int(data["via_nets"][i])],
+                                       bool(flags & 1), int(data["via_types"][i]), start_layer_id, end_layer_id, bool(flags & 2), commit)
+                if group is None:
+                    group = pcbnew.PCB_GROUP(brd)
+                    group.SetName(fence.fence_group_name(fence.FenceSettings(**settings_list[settings_number])))
+                    groups.append(group)
+                commit.AddToGroup(group, via)
+                via_count += 1
+                added += 1
+            records.set(track.m_Uuid.AsString(), geometry, settings_list[settings_number], group.m_Uuid.AsString() if group is not None else None, via_count)
+    for group in groups:  # グループはビアを入れた後で追加する
+        commit.Add(group)
+
+    with timer.phase("commit"):
+        commit.Push()
+        records.save()
+    timer.count("vias", added)
+    return added, skipped
@@ -0,0 +1,486 @@
+import pcbnew
+import numpy as np
+from dataclasses import asdict, astuple, dataclass
+from ..board_commit import BatchCommit
+from .. import profiling
+from .position_set import ViaPositionSet
+from .collision import CopperIndex
+from .records import FenceRecords, geometry_key
+from . import corridor
+from . import geometry
+from . import path
+
+# ビアフェンス生成のうち基板を扱う部分 wxに依存しないのでダイアログからもヘッドレス実行からも使える
+
+VIA_TYPES = {  # ヘッドレス実行で指定するビアタイプ名
+    "through": pcbnew.VIATYPE_THROUGH,
+    "micro": pcbnew.VIATYPE_MICROVIA,
+    "blind": pcbnew.VIATYPE_BLIND_BURIED,
+}
+
+CHUNK_SIZE = 2000  # fence_stepsで1区切りに処理する配線の数 重複判定はこの10倍の候補ごとに区切る
+
+
+@dataclass
+class FenceSettings:  # ダイアログで設定するビアのパラメータ 長さはすべてnm
+    via_diameter: int
+    via_drill: int
+    clearance: int                 # 配線とビアのクリアランス
+    net_name: str = ""             # ビアのネット 空ならネット無し
+    is_free: bool = True           # True=ビアのネットを自動更新しない
+    via_type: int = pcbnew.VIATYPE_THROUGH
+    start_layer_id: int = pcbnew.F_Cu
+    end_layer_id: int = pcbnew.B_Cu
+    remove_unconnected_annular_ring: bool = False
+    connected_path: bool = False   # True=接続された配線を1本の経路としてビアを並べる
+    avoid_collisions: bool = False # True=他の導体,キープアウト,基板外形と干渉する位置にはビアを置かない
+    pitch: int = 0                 # ビアの中心間隔 0ならビアの直径(隙間なく並べる)
+    corridor: bool = False         # True=並走する配線の束の外周にだけビアを並べる
+
+
+def create_via(brd, pos, diameter, drill, net_name, is_free, type_, start_layer_id = pcbnew.F_Cu, end_layer_id = pcbnew.B_Cu, remove_unconnected_annular_ring = False, commit = None):
+    via = pcbnew.PCB_VIA(brd)
+    via.SetPosition(pcbnew.VECTOR2I(pos[0], pos[1]))
+    via.SetWidth(diameter)  # 外径
+    via.SetDrill(drill)     # ドリル径
+    via.SetNet(brd.FindNet(net_name))  # ネット
+    via.SetIsFree(is_free)             # True=手動でビアを置く場合と同じく自動更新されない False=ビアのネットは置かれた場所によって自動更新される
+    via.SetViaType(type_)              # pcbnew.VIATYPE_THROUGH,pcbnew.VIATYPE_BLIND_BURIED,pcbnew.VIATYPE_MICROVIA,pcbnew.VIATYPE_NOT_DEFINEDのどれか
+    via.SetLayerPair(start_layer_id, end_layer_id)  # レイヤーのID 導体レイヤーは0から31
+    via.SetRemoveUnconnected(remove_unconnected_annular_ring)  # True=始点,終点,および接続されたレイヤー False=すべての導体レイヤー
+    if commit is None:
+        brd.Add(via)
+    else:
+        commit.Add(via)  # まとめて追加する場合はPushで基板に反映される
+    return via
+
+
+def existing_via_positions(brd, exclude_uuids=()):  # 基板上の既存ビアの座標のリスト 作り直すビアはexclude_uuidsで除く
+    positions = []
+    for via in brd.GetTracks():
+        if via.GetClass() == "PCB_VIA" and via.m_Uuid.AsString() not in exclude_uuids:
+            pos = via.GetPosition()
+            positions.append([pos.x, pos.y])
+    return positions
+
+
+def track_geometry(track):  # ビアの位置を決める配線の形 配線が移動や変形されると変わる
+    start = track.GetStart()
+    end = track.GetEnd()
+    geometry = (track.GetClass(), start.x, start.y, end.x, end.y, track.GetWidth())
+    if track.GetClass() == "PCB_ARC":
+        mid = track.GetMid()
+        geometry += (mid.x, mid.y)
+    return geometry
+
+
+def create_position_set(brd, existing_positions=None):  # 基板上の既存ビアを登録済みの座標リストを作成 再実行時に同じ位置へビアが重ねて生成されるのを防ぐ
+    pos_set = ViaPositionSet(pcbnew.FromMM(0.1))  # 0.1mm以下の距離には複数のビアを配置しない
+    if existing_positions is None:
+        existing_positions = existing_via_positions(brd)
+    for pos in existing_positions:
+        pos_set.add_existing(pos)
+    return pos_set
+
+
+def calc_fence_positions(tracks, via_diameter, track_to_via_clearance, pitch=0):  # 配線の座標を配列に詰めてgeometryでビア座標をまとめて計算 戻り値は座標と元の配線の番号
+    line_index = [i for i, t in enumerate(tracks) if t.GetClass() == "PCB_TRACK"]
+    arc_index = [i for i, t in enumerate(tracks) if t.GetClass() == "PCB_ARC"]
+    lines = [tracks[i] for i in line_index]
+    arcs = [tracks[i] for i in arc_index]
+
+    line_positions, line_sources = geometry.track_fence_positions(
+        [(t.GetStart().x, t.GetStart().y) for t in lines],
+        [(t.GetEnd().x, t.GetEnd().y) for t in lines],
+        [t.GetWidth() for t in lines],
+        via_diameter, track_to_via_clearance, pitch,
+    )
+    arc_positions, arc_sources = geometry.arc_fence_positions(
+        [(t.GetCenter().x, t.GetCenter().y) for t in arcs],
+        [t.GetRadius() for t in arcs],
+        [t.GetWidth() for t in arcs],
+        [t.GetArcAngleStart().AsRadians() for t in arcs],
+        [t.GetAngle().AsRadians() for t in arcs],
+        via_diameter, track_to_via_clearance, pitch,
+    )
+    # 配線番号を選択中の配線全体での番号に直して選択順に並べ直す
+    return geometry.merge_by_source(
+        (line_positions, np.asarray(line_index, dtype=np.int64)[line_sources]),
+        (arc_positions, np.asarray(arc_index, dtype=np.int64)[arc_sources]),
+    )
+
+
+def track_polylines(tracks, tolerance):  # 配線ごとの始点から終点までの点列 円弧は弦の誤差がtolerance以下の折れ線にする
+    seg_points = []
+    for t in tracks:
+        start = t.GetStart()
+        end = t.GetEnd()
+        if t.GetClass() == "PCB_ARC":
+            center = t.GetCenter()
+            points = path.arc_points((center.x, center.y), t.GetRadius(), t.GetArcAngleStart().AsRadians(), t.GetAngle().AsRadians(), tolerance)
+            points[0] = (start.x, start.y)  # 計算誤差で端点がずれて隣の配線とつながらなくなるのを防ぐ
+            points[-1] = (end.x, end.y)
+        else:
+            points = np.array([(start.x, start.y), (end.x, end.y)], dtype=np.float64)
+        seg_points.append(points)
+    return seg_points
+
+
+def calc_path_fence_positions(tracks, via_diameter, track_to_via_clearance, pitch=0):  # 接続された配線を経路としてつないでからビア座標を計算 戻り値はcalc_fence_positionsと同じ
+    tolerance = pcbnew.FromMM(0.001)  # 端点の一致判定と円弧の折れ線近似の誤差
+    seg_points = track_polylines(tracks, tolerance)
+    offsets = geometry.fence_offsets([t.GetWidth() for t in tracks], via_diameter, track_to_via_clearance)
+    return path.path_fence_positions(seg_points, offsets, geometry.fence_pitch(via_diameter, pitch), tolerance)  # ビアの間隔は配線ごとの計算と同じ
+
+
+def fence_feet(tracks, positions, sources):  # 各候補に最も近い元の配線上の点 円弧は中心から候補への向きで円弧上に下ろす
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+    starts = np.array([(t.GetStart().x, t.GetStart().y) for t in tracks], dtype=np.float64).reshape(-1, 2)
+    ends = np.array([(t.GetEnd().x, t.GetEnd().y) for t in tracks], dtype=np.float64).reshape(-1, 2)
+    is_arc = np.array([t.GetClass() == "PCB_ARC" for t in tracks], dtype=bool)
+    centers = starts.copy()
+    radii = np.zeros(len(tracks))
+    for i in np.flatnonzero(is_arc):
+        center = tracks[i].GetCenter()
+        centers[i] = (center.x, center.y)
+        radii[i] = tracks[i].GetRadius()
+
+    a = starts[sources]
+    d = ends[sources] - a
+    t = np.clip(np.einsum("ij,ij->i", positions - a, d) / np.maximum(np.einsum("ij,ij->i", d, d), 1e-12), 0, 1)
+    feet = a + t[:, None] * d
+    arc = is_arc[sources]
+    v = positions[arc] - centers[sources[arc]]
+    length = np.hypot(v[:, 0], v[:, 1])
+    feet[arc] = centers[sources[arc]] + v * (radii[sources[arc]] / np.maximum(length, 1e-12))[:, None]
+    return feet
+
+
+def corridor_filter(tracks, positions, sources, via_diameter, track_to_via_clearance, pitch=0):  # 並走する配線の束の内側にある候補を除く 残す候補はTrue
+    tolerance = pcbnew.FromMM(0.001)
+    seg_points = track_polylines(tracks, tolerance)
+    if not seg_points:
+        return np.ones(len(positions), dtype=bool)
+    seg_a = np.concatenate([p[:-1] for p in seg_points])
+    seg_b = np.concatenate([p[1:] for p in seg_points])
+    seg_sources = np.repeat(np.arange(len(seg_points)), [len(p) - 1 for p in seg_points])
+    offsets = geometry.fence_offsets([t.GetWidth() for t in tracks], via_diameter, track_to_via_clearance)
+    return corridor.corridor_keep(positions, fence_feet(tracks, positions, sources), sources, seg_a, seg_b, seg_sources,
+                                  offsets, geometry.fence_pitch(via_diameter, pitch), 2 * tolerance)  # 折れ線近似による誤差は許容する
+
+
+def zone_clearance(brd, net_name):  # 指定したネットのゾーンのうち最初に見つかったもののクリアランス 見つからなければNone
+    for zone in brd.Zones():
+        if zone.GetNetname() == net_name:
+            return zone.GetLocalClearance()
+    return None
+
+
+def copper_layers(brd):  # 有効な導体レイヤーのIDを上から順に並べたリスト
+    layer_ids = [layer_id for layer_id in range(pcbnew.PCB_LAYER_ID_COUNT) if brd.IsLayerEnabled(layer_id) and pcbnew.IsCopperLayer(layer_id)]  # pcbnew.PCB_LAYER_ID_COUNTは128になるはず
+    inner_layers = [layer_id for layer_id in layer_ids if layer_id not in (pcbnew.F_Cu, pcbnew.B_Cu)]  # F.CuとB.CuのIDを除外して両端に置き直す
+    return [pcbnew.F_Cu] + inner_layers + [pcbnew.B_Cu]
+
+
+def stackup_dielectric(brd, layer_id):  # 導体レイヤーlayer_idと隣の導体レイヤーの間の誘電体の(厚さ, 比誘電率) 基板の層構成が読めなければNone
+    try:
+        items = list(brd.GetDesignSettings().GetStackupDescriptor().GetList())
+    except AttributeError:  # 層構成をPythonから読めないバージョン
+        return None
+    copper = [i for i, item in enumerate(items) if item.GetType() == pcbnew.BS_ITEM_TYPE_COPPER]
+    index = next((i for i in copper if items[i].GetBrdLayerId() == layer_id), None)
+    if index is None:
+        return None
+    step = -1 if index == copper[-1] else 1  # B.Cuは上の,それ以外は下の導体レイヤーまで
+    thickness = 0
+    er_thickness = 0.0
+    i = index + step
+    while 0 <= i < len(items) and items[i].GetType() != pcbnew.BS_ITEM_TYPE_COPPER:
+        if items[i].GetType() == pcbnew.BS_ITEM_TYPE_DIELECTRIC:
+            for sublayer in range(items[i].GetSublayersCount()):  # プリプレグを重ねた誘電体は副層ごとに厚さと比誘電率がある
+                thickness += items[i].GetThickness(sublayer)
+                er_thickness += items[i].GetThickness(sublayer) * items[i].GetEpsilonR(sublayer)
+        i += step
+    if thickness <= 0:
+        return None
+    return thickness, er_thickness / thickness  # 比誘電率は厚さで重み付けした平均で近似する
+
+
+def via_layers(brd, settings):  # ビアが貫通する導体レイヤー
+    layers = copper_layers(brd)
+    if settings.via_type == pcbnew.VIATYPE_THROUGH:
+        return layers
+    start, end = sorted((layers.index(settings.start_layer_id), layers.index(settings.end_layer_id)))
+    return layers[start:end + 1]
+
+
+def via_net_clearance(brd, net_name):  # ビアのネットのネットクラスで決まるクリアランス
+    net = brd.FindNet(net_name)
+    try:
+        return net.GetNetClass().GetClearance()
+    except AttributeError:  # ネット無しなど
+        return brd.GetDesignSettings().m_MinClearance
+
+
+def create_copper_index(brd, tracks, settings):  # ビアと干渉しうる基板上の図形の格子インデックスを作る フェンスの元の配線は除く
+    net = brd.FindNet(settings.net_name)
+    return CopperIndex(
+        brd,
+        net.GetNetCode() if net is not None else 0,
+        via_layers(brd, settings),
+        via_net_clearance(brd, settings.net_name),
+        {t.m_Uuid.AsString() for t in tracks},
+    )
+
+
+def filter_positions(positions, pos_set, via_diameter, copper_index=None, timer=profiling.DISABLED):  # 候補座標のうち既存ビアや他の候補と重ならず,干渉もしないものをpos_setに登録し,その候補の番号のリストを返す
+    kept = []
+    comparisons = pos_set.comparisons
+    with timer.phase("dedup"):
+        for index, pos in enumerate(positions.tolist()):
+            if copper_index is not None and copper_index.collides(pos, via_diameter // 2):
+                continue  # 干渉する候補は置かない
+            if pos_set.append(pos):
+                kept.append(index)
+    timer.count("comparisons", pos_set.comparisons - comparisons)  # 同じpos_setで何回かに分けて呼ばれても二重に数えない
+    return kept
+
+
+def recorded_settings(record):  # 記録された設定を今の設定と比べられる辞書にする 後から増えた項目は既定値で補う
+    return asdict(FenceSettings(**record["settings"]))
+
+
+def board_groups(brd):  # 基板上のPCB_GROUP UUID -> グループ
+    groups = brd.Groups() if hasattr(brd, "Groups") else []
+    return {group.m_Uuid.AsString(): group for group in groups}
+
+
+def fence_vias(record, groups):  # 記録された配線のフェンスのビアのUUID 配線ごとのグループの中身から読む 以前の版の記録は"vias"にUUIDを持つ
+    if "vias" in record:
+        return list(record["vias"])
+    group = groups.get(record.get("group"))
+    if group is None:
+        return []
+    return [item.m_Uuid.AsString() for item in group.GetItems() if item.GetClass() == "PCB_VIA"]
+
+
+def is_fence_complete(record, groups, vias):  # 記録されたビアがすべて基板に残っているか 手で削除されたビアは今のグループからも外れているので数で比べる
+    via_uuids = fence_vias(record, groups)
+    return all(via_uuid in vias for via_uuid in via_uuids) and ("vias" in record or len(via_uuids) == record.get("count"))
+
+
+def fence_group_name(settings):  # フェンスのグループ名 生成時のパラメータがわかるようにする
+    name = "Via Fence {} {}/{} mm clearance {} mm".format(
+        settings.net_name or "(no net)", pcbnew.ToMM(settings.via_diameter), pcbnew.ToMM(settings.via_drill), pcbnew.ToMM(settings.clearance))
+    if settings.pitch:
+        name += " pitch {} mm".format(pcbnew.ToMM(settings.pitch))
+    if settings.connected_path:
+        name += " path"
+    if settings.corridor:
+        name += " corridor"
+    return name
+
+
+def place_fence(brd, tracks, settings, timer=profiling.DISABLED):  # 配線の両側にビアを配置し配置したビアの数を返す timerには工程ごとの時間と件数を記録する
+    # 以前にフェンスを生成した配線は,形か設定が変わっていれば古いビアと置き換え,変わっていなければ何もしない
+    # 新しく置いたビアは配線ごとに1つのPCB_GROUPにまとめ,フェンス単位で選択,移動,削除できるようにする 記録はこのグループからビアを読む
+    added, _ = update_fence(brd, [(track, settings) for track in tracks], timer)
+    return added
+
+
+def place_fence_steps(brd, tracks, settings, timer=profiling.DISABLED):  # place_fenceを区切りごとに進める生成器 戻り値は(追加したビアの数, 削除したビアの数)
+    return fence_steps(brd, [(track, settings) for track in tracks], timer)
+
+
+def regenerate_fence(brd, tracks=None, timer=profiling.DISABLED):  # 記録された設定でフェンスを作り直す 戻り値は(追加したビアの数, 削除したビアの数)
+    # tracks=Noneのときは記録のあるすべての配線を対象にし,削除された配線のビアも取り除く 記録の無い配線は設定がわからないので対象外
+    # グループごと削除されたフェンスは作り直さずに記録を消す
+    records = FenceRecords(brd)
+    groups = board_groups(brd)
+    via_uuids = {via.m_Uuid.AsString() for via in brd.GetTracks() if via.GetClass() == "PCB_VIA"}
+    for track_uuid in records.track_uuids():
+        record = records.get(track_uuid)
+        if record.get("group") and record["group"] not in groups and not any(via_uuid in via_uuids for via_uuid in record.get("vias", ())):
+            records.delete(track_uuid)
+    orphans = []
+    if tracks is None:
+        board_tracks = {t.m_Uuid.AsString(): t for t in brd.GetTracks() if t.GetClass() in ("PCB_TRACK", "PCB_ARC")}
+        tracks = [board_tracks[uuid] for uuid in records.track_uuids() if uuid in board_tracks]
+        orphans = [uuid for uuid in records.track_uuids() if uuid not in board_tracks]
+    items = []
+    for track in tracks:
+        record = records.get(track.m_Uuid.AsString())
+        if record is not None:
+            items.append((track, FenceSettings(**record["settings"])))
+    return update_fence(brd, items, timer, records, orphans)
+
+
+def tracks_of_groups(brd, group_uuids):  # 指定したフェンスのグループを生成した元の配線
+    records = FenceRecords(brd)
+    track_uuids = {uuid for uuid in records.track_uuids() if records.get(uuid).get("group") in group_uuids}
+    return [t for t in brd.GetTracks() if t.GetClass() in ("PCB_TRACK", "PCB_ARC") and t.m_Uuid.AsString() in track_uuids]
+
+
+def run_steps(steps):  # 区切りごとに進める生成器を最後まで進めて戻り値を返す
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+
+def update_fence(brd, items, timer=profiling.DISABLED, records=None, orphans=()):  # (配線, 設定)の組ごとにフェンスを記録と比べて更新する 戻り値は(追加したビアの数, 削除したビアの数)
+    return run_steps(fence_steps(brd, items, timer, records, orphans))
+
+
+def fence_steps(brd, items, timer=profiling.DISABLED, records=None, orphans=()):  # update_fenceをCHUNK_SIZEずつの区切りで進める生成器
+    # 区切るたびに(済んだ量, 全体の量)をyieldし,最後に(追加したビアの数, 削除したビアの数)を返す
+    # 基板への反映と記録の保存は最後の区切りでまとめて行うので,途中で進めるのをやめれば基板は変わらない
+    if records is None:
+        records = FenceRecords(brd)
+    with timer.phase("existing_vias"):
+        vias = {via.m_Uuid.AsString(): via for via in brd.GetTracks() if via.GetClass() == "PCB_VIA"}
+    fence_groups = board_groups(brd)
+    commit = BatchCommit(brd, "Via Fence Generator")  # 削除と追加を1回で反映しアンドゥも1回で戻せるようにする
+    removed = 0
+    removed_uuids = set()   # 削除したビアのUUID 空になったグループを消すのに使う
+    touched_groups = {}     # ビアを削除したグループ UUID -> グループ
+    filled_groups = set()   # ビアを追加する既存のグループのUUID
+    new_groups = []         # 今回作る配線ごとのグループ
+
+    def remove_via(via_uuid):
+        nonlocal removed
+        via = vias.pop(via_uuid)
+        group = via.GetParentGroup() if hasattr(via, "GetParentGroup") else None
+        if group is not None:
+            touched_groups[group.m_Uuid.AsString()] = group
+        commit.Remove(via)
+        removed_uuids.add(via_uuid)
+        removed += 1
+
+    for track_uuid in orphans:  # 元の配線が削除されたフェンス
+        for via_uuid in fence_vias(records.get(track_uuid), fence_groups):
+            if via_uuid in vias:
+                remove_via(via_uuid)
+        records.delete(track_uuid)
+
+    # 形と設定が記録と同じで,ビアもすべて残っている配線はそのままにする
+    changed = []  # (配線, 設定, 記録)
+    for track, settings in items:
+        record = records.get(track.m_Uuid.AsString())
+        if (record is not None and record["geometry"] == geometry_key(track_geometry(track)) and recorded_settings(record) == asdict(settings)
+                and is_fence_complete(record, fence_groups, vias)):
+            continue
+        changed.append((track, settings, record))
+    timer.count("tracks", len(items))
+    timer.count("arcs", sum(1 for track, _ in items if track.GetClass() == "PCB_ARC"))
+    timer.count("changed_tracks", len(changed))
+
+    # 作り直す配線の古いビアは重複判定から外し,同じ位置に同じ設定のビアが必要ならそのまま使う
+    replaced = {via_uuid for _, _, record in changed if record is not None for via_uuid in fence_vias(record, fence_groups)}
+    with timer.phase("existing_vias"):
+        pos_set = create_position_set(brd, existing_via_positions(brd, replaced))
+
+    groups = {}  # 設定 -> changedの番号のリスト 設定ごとにまとめて配列演算で計算する
+    for index, (_, settings, _) in enumerate(changed):
+        groups.setdefault(astuple(settings), []).append(index)
+
+    # 配線ごとに座標計算,重複判定,ビアの生成の3段階を進捗として数える
+    done = 0
+    total = 3 * len(changed)
+    added = 0
+    for indices in groups.values():
+        settings = changed[indices[0]][1]
+        group_tracks = [changed[i][0] for i in indices]
+        if settings.connected_path:  # 経路はつながり方で決まるので分けずに計算する
+            with timer.phase("geometry"):
+                positions, sources = calc_path_fence_positions(group_tracks, settings.via_diameter, settings.clearance, settings.pitch)
+            done += len(group_tracks)
+            yield done, total
+        else:  # 配線ごとの計算は分けて計算してつないでも同じ結果になる
+            parts = []
+            for start in range(0, len(group_tracks), CHUNK_SIZE):
+                with timer.phase("geometry"):
+                    chunk_positions, chunk_sources = calc_fence_positions(group_tracks[start:start + CHUNK_SIZE], settings.via_diameter, settings.clearance, settings.pitch)
+                parts.append((chunk_positions, chunk_sources + start))
+                done += min(CHUNK_SIZE, len(group_tracks) - start)
+                yield done, total
+            positions = np.concatenate([p for p, _ in parts]) if parts else np.empty((0, 2), dtype=np.int64)
+            sources = np.concatenate([s for _, s in parts]) if parts else np.empty(0, dtype=np.int64)
+        if settings.corridor:  # 束の内側の候補は重複判定の前に除く 隣の配線が別の区切りにあっても判定できるようにすべての区切りを計算してから行う
+            with timer.phase("corridor"):
+                keep = corridor_filter(group_tracks, positions, sources, settings.via_diameter, settings.clearance, settings.pitch)
+            timer.count("corridor_dropped", int(len(keep) - keep.sum()))
+            positions, sources = positions[keep], sources[keep]
+        timer.count("candidates", len(positions))
+        copper_index = None
+        if settings.avoid_collisions:
+            with timer.phase("copper_index"):
+                copper_index = create_copper_index(brd, group_tracks, settings)  # Applyごとに1回だけ作る
+        new_positions = [[] for _ in indices]  # 配線ごとの新しいビアの座標
+        filtered = 0  # 重複判定を済ませた配線の数 候補の数の割合で数える
+        for start in range(0, len(positions), CHUNK_SIZE * 10):  # 候補の順に判定すれば分けても結果は同じ
+            for k in filter_positions(positions[start:start + CHUNK_SIZE * 10], pos_set, settings.via_diameter, copper_index, timer):
+                new_positions[sources[start + k]].append(positions[start + k].tolist())
+            filtered_now = len(group_tracks) * min(start + CHUNK_SIZE * 10, len(positions)) // len(positions)
+            done += filtered_now - filtered
+            filtered = filtered_now
+            yield done, total
+        done += len(group_tracks) - filtered  # 候補が1つも無かった場合
+
+        for start in range(0, len(indices), CHUNK_SIZE):
+            with timer.phase("create_via"):
+                for j in range(start, min(start + CHUNK_SIZE, len(indices))):
+                    track, _, record = changed[indices[j]]
+                    old_vias = {}  # 座標 -> 再利用できる古いビアのUUID
+                    # 古いビアを使い回すのは設定が同じで配線のグループが残っているときだけ 以前の版の記録のビアは設定ごとの共有のグループにあるので作り直す
+                    group = fence_groups.get(record.get("group")) if record is not None and "vias" not in record and recorded_settings(record) == asdict(settings) else None
+                    same_settings = group is not None
+                    for via_uuid in (fence_vias(record, fence_groups) if record is not None else ()):
+                        via = vias.get(via_uuid)
+                        if via is None:
+                            continue  # 手で削除されたビア
+                        pos = via.GetPosition()
+                        if same_settings and (pos.x, pos.y) not in old_vias:
+                            old_vias[(pos.x, pos.y)] = via_uuid
+                        else:
+                            remove_via(via_uuid)  # 設定が変わったビアは作り直す
+
+                    # 古いビアが残るなら同じグループに足し,そうでなければこの配線のグループを作る
+                    via_uuids = []
+                    for pos in new_positions[j]:
+                        via_uuid = old_vias.pop((pos[0], pos[1]), None)
+                        if via_uuid is None:
+                            via = create_via(brd, pos, settings.via_diameter, settings.via_drill, settings.net_name, settings.is_free, settings.via_type,
+                                             settings.start_layer_id, settings.end_layer_id, settings.remove_unconnected_annular_ring, commit)
+                            if group is None:
+                                group = pcbnew.PCB_GROUP(brd)
+                                group.SetName(fence_group_name(settings))
+                                new_groups.append(group)
+                            commit.AddToGroup(group, via)
+                            filled_groups.add(group.m_Uuid.AsString())
+                            via_uuid = via.m_Uuid.AsString()
+                            added += 1
+                        via_uuids.append(via_uuid)
+                    for via_uuid in old_vias.values():  # 新しい位置に無い古いビア
+                        remove_via(via_uuid)
+                    records.set(track.m_Uuid.AsString(), track_geometry(track), asdict(settings),
+                                group.m_Uuid.AsString() if group is not None and via_uuids else None, len(via_uuids))
+            done += min(CHUNK_SIZE, len(indices) - start)
+            yield done, total
+
+    for group in new_groups:  # グループはビアを入れた後で追加する
+        commit.Add(group)
+    for group_uuid, group in touched_groups.items():  # ビアがすべて削除されたグループは残さない
+        if group_uuid in filled_groups:
+            continue
+        members = [item.m_Uuid.AsString() for item in group.GetItems()]
+        if members and all(uuid in removed_uuids for uuid in members):
+            commit.Remove(group)
+
+    with timer.phase("commit"):
+        commit.Push()
+        records.save()
+    timer.count("vias", added)
+    timer.count("removed_vias", removed)
+    return added, removed
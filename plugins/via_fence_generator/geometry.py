@@ -0,0 +1,95 @@
+import numpy as np
+
+# ビアフェンスの座標計算 pcbnewに依存しない純粋な関数のみを置く
+# 配線ごとにループせず全配線分の座標をまとめて配列演算で求める 単位はすべてnm(KiCadの内部単位)
+# 戻り値はビア座標の(M,2)配列とそれぞれの座標が何番目の配線から生成されたかを表す(M,)配列
+
+
+def _trunc(a):  # Pythonのint()と同じくゼロ方向に切り捨てて整数にする
+    return np.trunc(a).astype(np.int64)
+
+
+def _steps(via_nums):  # 各配線のビア数から,全ビア分の配線番号と配線内でのステップ番号を作る
+    sources = np.repeat(np.arange(len(via_nums)), via_nums)
+    first = np.cumsum(via_nums) - via_nums  # 各配線の先頭ビアの通し番号
+    steps = np.arange(len(sources)) - np.repeat(first, via_nums)
+    return sources, steps
+
+
+def fence_offsets(widths, via_diameter, clearance):  # 配線中心からビア中心までの距離
+    return np.asarray(widths, dtype=np.int64) // 2 + via_diameter // 2 + clearance  # //で切り捨て除算
+
+
+def fence_pitch(via_diameter, pitch):  # ビアの中心間隔 0やビアの直径より狭い指定は隙間なく並べる間隔にする
+    return max(pitch or 0, via_diameter)
+
+
+def track_fence_positions(starts, ends, widths, via_diameter, clearance, pitch=0):  # 直線配線(PCB_TRACK)の両側のビア座標
+    starts = np.asarray(starts, dtype=np.int64).reshape(-1, 2)
+    ends = np.asarray(ends, dtype=np.int64).reshape(-1, 2)
+    if len(starts) == 0:
+        return np.empty((0, 2), dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    offsets = fence_offsets(widths, via_diameter, clearance)
+    D = ends - starts  # 整数
+    lengths = np.hypot(D[:, 0], D[:, 1])
+    safe_lengths = np.where(lengths > 0, lengths, 1)  # 長さ0の配線でゼロ除算にならないようにする
+    sin_ratio = -D[:, 1] / safe_lengths  # 0to1
+    cos_ratio = D[:, 0] / safe_lengths
+    d = np.stack([_trunc(offsets * sin_ratio), _trunc(offsets * cos_ratio)], axis=1)  # 配線に垂直なオフセット
+
+    via_nums = 1 + _trunc(lengths / fence_pitch(via_diameter, pitch))
+    increments = np.where((via_nums > 1)[:, None], _trunc(D / np.maximum(via_nums - 1, 1)[:, None]), 0)  # ビアを1個しか置けない配線は始点のみ
+
+    sources, steps = _steps(via_nums)
+    centers = starts[sources] + steps[:, None] * increments[sources]
+
+    # 1ステップごとに-側,+側の順に並べる
+    positions = np.stack([centers - d[sources], centers + d[sources]], axis=1).reshape(-1, 2)
+    return positions, np.repeat(sources, 2)
+
+
+def arc_via_nums(radii, angle_disps, pitch):  # 円弧上にビアを弦の長さpitch以上の間隔で並べる場合の個数
+    radii = np.asarray(radii, dtype=np.float64)
+    chord_ratio = np.divide(pitch**2, 2 * radii**2, out=np.full_like(radii, np.inf), where=radii > 0)
+    fits = pitch**2 <= 4 * radii**2  # acosが範囲外エラーにならない条件
+    pitch_angle = np.arccos(np.clip(1 - chord_ratio, -1, 1))
+    nums = 1 + _trunc(np.divide(np.abs(angle_disps), pitch_angle, out=np.zeros_like(radii), where=fits & (pitch_angle > 0)))  # ここのangle_dは絶対値でないといけない
+    return np.where(fits, nums, 1)
+
+
+def arc_fence_positions(centers, radii, widths, angle_starts, angle_disps, via_diameter, clearance, pitch=0):  # 円弧配線(PCB_ARC)の内側と外側のビア座標 角度はラジアン
+    centers = np.asarray(centers, dtype=np.int64).reshape(-1, 2)
+    if len(centers) == 0:
+        return np.empty((0, 2), dtype=np.int64), np.empty(0, dtype=np.int64)
+    radii = np.asarray(radii, dtype=np.int64)
+    angle_starts = np.asarray(angle_starts, dtype=np.float64)
+    angle_disps = np.asarray(angle_disps, dtype=np.float64)
+
+    offsets = fence_offsets(widths, via_diameter, clearance)
+    inner_radii = radii - offsets
+    outer_radii = radii + offsets
+
+    # 円弧半径が小さすぎて内側にビアを置くとクリアランスが保てない場合は内側にビアを置かない 内側に置けない場合でも外側に置けるなら置く
+    pitch = fence_pitch(via_diameter, pitch)
+    inner_nums = np.where(offsets > radii, 0, arc_via_nums(inner_radii, angle_disps, pitch))
+    outer_nums = arc_via_nums(outer_radii, angle_disps, pitch)
+
+    # 内側と外側をまとめて1回で計算する 配線ごとに内側,外側の順に並ぶように番号を振る
+    side_radii = np.stack([inner_radii, outer_radii], axis=1).reshape(-1)
+    side_nums = np.stack([inner_nums, outer_nums], axis=1).reshape(-1)
+    side_sources, steps = _steps(side_nums)
+    sources = side_sources // 2
+
+    nums = side_nums[side_sources]
+    angles = angle_starts[sources] + np.where(nums > 1, steps * angle_disps[sources] / np.maximum(nums - 1, 1), 0)  # ここのangle_dは正負問わない
+    r = side_radii[side_sources]
+    positions = centers[sources] + np.stack([_trunc(r * np.cos(angles)), _trunc(r * np.sin(angles))], axis=1)
+    return positions, sources
+
+
+def merge_by_source(*results):  # (座標,配線番号)の組を配線番号順に安定ソートして1つにまとめる 選択順に処理した場合と同じ並びにする
+    positions = np.concatenate([p for p, _ in results]) if results else np.empty((0, 2), dtype=np.int64)
+    sources = np.concatenate([s for _, s in results]) if results else np.empty(0, dtype=np.int64)
+    order = np.argsort(sources, kind="stable")
+    return positions[order], sources[order]
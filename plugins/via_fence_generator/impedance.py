@@ -0,0 +1,131 @@
+import numpy as np
+
+# 伝送線路の特性インピーダンスとビアフェンスの間隔の計算 pcbnewに依存しない純粋な関数のみを置く
+# 引数は数値でも配列でもよく,NumPyのブロードキャストで幅,ギャップ,誘電体の厚さ,比誘電率,周波数の組み合わせをまとめて計算する
+# 例: impedance("gcpw", widths[:, None], gaps[None, :], 0.2, 4.3)で幅とギャップのすべての組の特性インピーダンスが得られる
+# インピーダンスは長さの比だけで決まるので長さの単位はそろっていれば何でもよい 周波数から求める長さはmm,周波数はHz
+# 導体の厚さはマイクロストリップ線路だけで考慮し,周波数分散と導体損は無視する(準静的近似)
+
+C0 = 299792458.0      # 真空中の光速 m/s
+ETA0 = 376.730313668  # 真空の波動インピーダンス Ω
+LINES = ("microstrip", "cpw", "gcpw")
+ISOLATION_HEIGHTS = 3  # 誘電体の厚さの3倍以上離れたグラウンドはマイクロストリップ線路の特性インピーダンスを1,2%しか変えないという経験則
+
+
+def _arrays(*values):
+    return np.broadcast_arrays(*(np.asarray(value, dtype=np.float64) for value in values))
+
+
+def elliptic_ratio(k):  # 第1種完全楕円積分の比K(k)/K(k') Hilbergの近似で誤差は3ppm以下
+    k = np.clip(np.asarray(k, dtype=np.float64), 0.0, 1.0)
+    kp = np.sqrt((1 - k) * (1 + k))
+    low = k <= 1 / np.sqrt(2)
+    s = np.sqrt(np.where(low, kp, k))
+    with np.errstate(divide="ignore"):
+        r = np.log(2 * (1 + s) / (1 - s)) / np.pi  # k=0ではr=inf,比は0になる
+        return np.where(low, 1 / r, r)
+
+
+def _sinh_ratio(a, b):  # sinh(a)/sinh(b) 引数が大きくても桁あふれしないようにする
+    with np.errstate(over="ignore", invalid="ignore"):
+        return np.where(b > 20, np.exp(a - b) * (1 - np.exp(-2 * a)) / (1 - np.exp(-2 * b)), np.sinh(a) / np.sinh(b))
+
+
+def _microstrip_z01(u):  # 空気中のマイクロストリップ線路の特性インピーダンス u=幅/厚さ
+    f = 6 + (2 * np.pi - 6) * np.exp(-(30.666 / u) ** 0.7528)
+    return ETA0 / (2 * np.pi) * np.log(f / u + np.sqrt(1 + (2 / u) ** 2))
+
+
+def _microstrip_eeff(u, er):  # 導体の厚さが0のときの実効比誘電率
+    a = 1 + np.log((u**4 + (u / 52) ** 2) / (u**4 + 0.432)) / 49 + np.log(1 + (u / 18.1) ** 3) / 18.7
+    b = 0.564 * ((er - 0.9) / (er + 3)) ** 0.053
+    return (er + 1) / 2 + (er - 1) / 2 * (1 + 10 / u) ** (-a * b)
+
+
+def microstrip(width, height, er, thickness=0.0):  # マイクロストリップ線路の(特性インピーダンス, 実効比誘電率) Hammerstad-Jensenの式
+    w, h, er, t = _arrays(width, height, er, thickness)
+    u = w / h
+    tn = t / h
+    # 導体の厚さの分だけ幅が広がったとみなす 空気中(du1)と誘電体中(dur)で広がり方が違う
+    with np.errstate(divide="ignore", invalid="ignore"):
+        du1 = np.where(tn > 0, tn / np.pi * np.log(1 + 4 * np.e * np.tanh(np.sqrt(6.517 * u)) ** 2 / tn), 0.0)
+    dur = (1 + 1 / np.cosh(np.sqrt(np.maximum(er - 1, 0)))) / 2 * du1
+    u1 = u + du1
+    ur = u + dur
+    z0 = _microstrip_z01(ur) / np.sqrt(_microstrip_eeff(ur, er))
+    eeff = _microstrip_eeff(ur, er) * (_microstrip_z01(u1) / _microstrip_z01(ur)) ** 2
+    return z0, eeff
+
+
+def cpw(width, gap, height, er):  # 裏面にグラウンドの無いコプレーナ線路の(特性インピーダンス, 実効比誘電率) 誘電体の厚さheightは有限
+    w, g, h, er = _arrays(width, gap, height, er)
+    k0 = w / (w + 2 * g)
+    k1 = _sinh_ratio(np.pi * w / (4 * h), np.pi * (w + 2 * g) / (4 * h))
+    eeff = 1 + (er - 1) / 2 * elliptic_ratio(k1) / elliptic_ratio(k0)
+    return ETA0 / 4 / np.sqrt(eeff) / elliptic_ratio(k0), eeff
+
+
+def gcpw(width, gap, height, er):  # 裏面にグラウンドのあるコプレーナ線路の(特性インピーダンス, 実効比誘電率)
+    w, g, h, er = _arrays(width, gap, height, er)
+    k0 = w / (w + 2 * g)
+    k3 = np.tanh(np.pi * w / (4 * h)) / np.tanh(np.pi * (w + 2 * g) / (4 * h))
+    q = elliptic_ratio(k3) / elliptic_ratio(k0)
+    with np.errstate(invalid="ignore"):
+        eeff = np.where(np.isinf(q), er, (1 + er * q) / (1 + q))  # ギャップが十分広いとq=infになり誘電体だけで決まる
+    return ETA0 / 2 / np.sqrt(eeff) / (elliptic_ratio(k0) + elliptic_ratio(k3)), eeff
+
+
+def impedance(line, width, gap, height, er, thickness=0.0):  # lineで選んだ線路の(特性インピーダンス, 実効比誘電率) マイクロストリップ線路ではgapを使わない
+    if line == "microstrip":
+        return microstrip(width, height, er, thickness)
+    if line == "cpw":
+        return cpw(width, gap, height, er)
+    if line == "gcpw":
+        return gcpw(width, gap, height, er)
+    raise ValueError("unknown line type '{}' (choose from {})".format(line, ", ".join(LINES)))
+
+
+def solve(function, target, low, high, increasing, iterations=60):  # function(x)=targetとなるxを配列の要素ごとに二分法で求める
+    # functionはxについて単調で,low,highは正 何桁にもわたる範囲を同じ回数で絞れるように対数で二分する
+    # 範囲内に解が無い要素はlowかhighに張り付く
+    target, low, high = (np.array(a) for a in _arrays(target, low, high))
+    for _ in range(iterations):
+        mid = np.sqrt(low * high)
+        above = function(mid) > target
+        if increasing:
+            high, low = np.where(above, mid, high), np.where(above, low, mid)
+        else:
+            high, low = np.where(above, high, mid), np.where(above, mid, low)
+    return np.sqrt(low * high)
+
+
+def solve_width(z0, line, height, er, gap=None, thickness=0.0):  # 特性インピーダンスがz0になる配線幅 幅が広いほどインピーダンスは下がる
+    return solve(lambda w: impedance(line, w, gap, height, er, thickness)[0], z0,
+                 np.asarray(height, dtype=np.float64) * 1e-3, np.asarray(height, dtype=np.float64) * 1e2, increasing=False)
+
+
+def solve_gap(z0, line, width, height, er):  # コプレーナ線路の特性インピーダンスがz0になるギャップ ギャップが広いほどインピーダンスは上がる
+    return solve(lambda g: impedance(line, width, g, height, er)[0], z0,
+                 np.asarray(height, dtype=np.float64) * 1e-4, np.asarray(height, dtype=np.float64) * 1e2, increasing=True)
+
+
+def isolation_gap(height, heights=ISOLATION_HEIGHTS):  # マイクロストリップ線路の両側にフェンスやグラウンドを置いても線路にほとんど影響しない配線からの距離
+    return np.asarray(height, dtype=np.float64) * heights
+
+
+def max_via_pitch(frequency, er, fraction=20):  # 周波数frequency(Hz)まで効くビアフェンスの最大の中心間隔(mm) 誘電体中の波長のfraction分の1
+    f, er = _arrays(frequency, er)
+    return C0 * 1e3 / (f * np.sqrt(er)) / fraction
+
+
+def recommend_fence(line, width, gap, height, er, frequency, fraction=20):  # ビアフェンスの(最大の中心間隔, 配線とビアのクリアランス)
+    # コプレーナ線路ではギャップの外側のグラウンドの縁にビアを並べ,マイクロストリップ線路では線路に影響しない距離まで離す 長さはmm
+    pitch = max_via_pitch(frequency, er, fraction)
+    if line == "microstrip":
+        clearance = isolation_gap(height)
+    elif line in LINES:
+        clearance = np.asarray(gap, dtype=np.float64)
+    else:
+        raise ValueError("unknown line type '{}' (choose from {})".format(line, ", ".join(LINES)))
+    pitch, clearance, _ = np.broadcast_arrays(pitch, clearance, np.asarray(width, dtype=np.float64))  # 配線幅ごとに値を返す
+    return pitch, clearance
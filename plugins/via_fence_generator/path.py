@@ -0,0 +1,257 @@
+import numpy as np
+from .position_set import ViaPositionSet
+
+# 接続された配線を1本の経路としてビアフェンスを計算する pcbnewに依存しない純粋な関数のみを置く
+# 配線ごとにオフセットすると屈曲部や円弧と直線の接続部でビアが重なったり欠けたりするので,
+# 端点が一致する配線をつないだ折れ線ごとに連続したオフセット曲線を作り,その全長にわたって一定ピッチでビアを並べる
+# 単位はすべてnm(KiCadの内部単位)
+
+ROUND_JOIN_ANGLE = np.radians(10)  # 外側の曲がり角がこれより大きい屈曲部は丸くつなぐ それ以下はマイター(交点)でつなぐ
+MITER_LIMIT = 4                    # 内側のマイターがオフセット距離の何倍まで伸びてよいか
+
+
+def arc_points(center, radius, angle_start, angle_disp, tolerance):  # 円弧を弦の誤差がtolerance以下になる折れ線にする 角度はラジアン
+    if radius <= tolerance:
+        step = np.pi / 2
+    else:
+        step = 2 * np.arccos(1 - tolerance / radius)
+    n = max(1, int(np.ceil(abs(angle_disp) / step)))
+    angles = angle_start + angle_disp * np.arange(n + 1) / n
+    return np.stack([center[0] + radius * np.cos(angles), center[1] + radius * np.sin(angles)], axis=1)
+
+
+def chain_segments(starts, ends, tolerance):  # 端点が一致する配線をつないで経路のリストを作る
+    # 戻り値は[(配線番号と向きのリスト[(i, reversed), ...], 閉じているか), ...]
+    # 3本以上の配線が集まる点では経路を分ける
+    starts = np.asarray(starts, dtype=np.float64).reshape(-1, 2)
+    ends = np.asarray(ends, dtype=np.float64).reshape(-1, 2)
+    n = len(starts)
+    if n == 0:
+        return []
+
+    # 端点を格子で量子化して近い端点を同じ節点にまとめる
+    cell = max(1.0, float(tolerance))
+    node_of_cell = {}
+    node_pos = []
+
+    def node_id(p):
+        cx, cy = int(np.floor(p[0] / cell)), int(np.floor(p[1] / cell))
+        for ix in (cx - 1, cx, cx + 1):
+            for iy in (cy - 1, cy, cy + 1):
+                for k in node_of_cell.get((ix, iy), ()):
+                    if np.hypot(*(node_pos[k] - p)) <= tolerance:
+                        return k
+        k = len(node_pos)
+        node_pos.append(p)
+        node_of_cell.setdefault((cx, cy), []).append(k)
+        return k
+
+    seg_nodes = [(node_id(starts[i]), node_id(ends[i])) for i in range(n)]
+    adjacency = {}
+    for i, (a, b) in enumerate(seg_nodes):
+        adjacency.setdefault(a, []).append(i)
+        adjacency.setdefault(b, []).append(i)
+
+    used = [False] * n
+    paths = []
+
+    def walk(node, first_seg):  # nodeからfirst_segを通って次数2の節点が続く限り進む
+        path = []
+        seg = first_seg
+        while seg is not None and not used[seg]:
+            used[seg] = True
+            a, b = seg_nodes[seg]
+            reverse = (a != node)
+            path.append((seg, reverse))
+            node = a if reverse else b
+            nexts = [s for s in adjacency[node] if not used[s]]
+            seg = nexts[0] if len(adjacency[node]) == 2 and nexts else None
+        return path, node
+
+    # 端点(次数が2でない節点)から始まる経路
+    for node, segs in adjacency.items():
+        if len(segs) == 2:
+            continue
+        for seg in segs:
+            if not used[seg]:
+                path, _ = walk(node, seg)
+                paths.append((path, False))
+    # 残りはすべての節点の次数が2の閉路
+    for seg in range(n):
+        if not used[seg]:
+            start_node = seg_nodes[seg][0]
+            path, last = walk(start_node, seg)
+            paths.append((path, last == start_node))
+    return paths
+
+
+def path_points(seg_points, path):  # 経路上の配線の折れ線を向きをそろえてつなぐ 戻り値は点列と各辺の元の配線番号
+    points = [seg_points[path[0][0]][:1]] if not path[0][1] else [seg_points[path[0][0]][-1:]]  # 経路の始点
+    sources = []
+    for seg, reverse in path:
+        p = seg_points[seg][::-1] if reverse else seg_points[seg]
+        points.append(p[1:])  # 接続点は前の配線の終点と重複するので除く
+        sources.append(np.full(len(p) - 1, seg))
+    points = np.concatenate(points)
+    sources = np.concatenate(sources)
+
+    # 長さ0の辺は法線が求まらないので除く
+    edges = np.diff(points, axis=0)
+    nonzero = np.hypot(edges[:, 0], edges[:, 1]) > 0
+    return np.vstack([points[:1], points[1:][nonzero]]), sources[nonzero]
+
+
+def offset_polyline(points, edge_sources, offset, closed, tolerance):  # 折れ線を左側(offset>0)または右側(offset<0)にずらした点列と各辺の元の配線番号
+    if closed:
+        points = points[:-1]  # 始点と終点が同じ点なので1つにする
+    n = len(points)
+    edges = (np.roll(points, -1, axis=0) - points) if closed else np.diff(points, axis=0)
+    lengths = np.hypot(edges[:, 0], edges[:, 1])
+    tangents = edges / lengths[:, None]
+    normals = np.stack([-tangents[:, 1], tangents[:, 0]], axis=1)  # 左向きの法線
+
+    # 各頂点に入る辺と出る辺の法線 開いた経路の端では1本だけ
+    if closed:
+        n_in = np.roll(normals, 1, axis=0)
+        n_out = normals
+        t_in = np.roll(tangents, 1, axis=0)
+        t_out = tangents
+        src_in = np.roll(edge_sources, 1)
+        src_out = edge_sources
+    else:
+        n_in = np.vstack([normals[:1], normals])
+        n_out = np.vstack([normals, normals[-1:]])
+        t_in = np.vstack([tangents[:1], tangents])
+        t_out = np.vstack([tangents, tangents[-1:]])
+        src_in = np.concatenate([edge_sources[:1], edge_sources])
+        src_out = np.concatenate([edge_sources, edge_sources[-1:]])
+
+    cross = t_in[:, 0] * t_out[:, 1] - t_in[:, 1] * t_out[:, 0]
+    turn = np.arctan2(cross, np.einsum("ij,ij->i", t_in, t_out))  # 頂点での進行方向の回転角
+    outer = np.sign(offset) * turn < 0  # この側が曲がりの外側になる頂点
+
+    # マイター点 内側は伸びすぎないように制限する
+    m = n_in + n_out
+    half_cos = np.maximum(np.hypot(m[:, 0], m[:, 1]) / 2, 1 / MITER_LIMIT)
+    bisector = m / np.maximum(np.hypot(m[:, 0], m[:, 1]), 1e-12)[:, None]
+    miter = points + offset * bisector / half_cos[:, None]
+
+    # 外側の大きな屈曲部は頂点を中心とする円弧でつなぎ,それ以外はマイター点1個にする
+    round_step = 2 * np.arccos(max(-1.0, 1 - tolerance / abs(offset)))  # 丸いつなぎ目の弦の誤差がtolerance以下になる角度
+    rounded = outer & (np.abs(turn) > ROUND_JOIN_ANGLE)
+    k = np.where(rounded, np.ceil(np.abs(turn) / round_step), 0).astype(np.int64)  # 円弧部分の辺の数
+    counts = k + 1
+    vertex = np.repeat(np.arange(n), counts)
+    j = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)  # 頂点内での番号 0..k
+
+    angles = np.arctan2(n_in[vertex, 1], n_in[vertex, 0]) + turn[vertex] * j / np.maximum(k[vertex], 1)
+    arc = points[vertex] + offset * np.stack([np.cos(angles), np.sin(angles)], axis=1)
+    result = np.where(rounded[vertex][:, None], arc, miter[vertex])
+
+    # 円弧部分の辺は入る側の配線に,頂点から次の頂点への辺は出る側の配線に属する
+    sources = np.where(j < k[vertex], src_in[vertex], src_out[vertex])
+    if closed:
+        result = np.vstack([result, result[:1]])
+    else:
+        sources = sources[:-1]  # 終点から出る辺は無い
+    return result, sources
+
+
+def place_along(points, edge_sources, pitch, closed):  # 折れ線に沿って間隔pitch以上で等間隔に点を置く 戻り値は座標と元の配線番号
+    edges = np.diff(points, axis=0)
+    cumulative = np.concatenate([[0], np.cumsum(np.hypot(edges[:, 0], edges[:, 1]))])
+    total = cumulative[-1]
+    if closed:
+        num = max(1, int(total / pitch))
+        s = total * np.arange(num) / num
+    else:
+        num = 1 + int(total / pitch)  # 配線ごとの計算と同じく始点と終点に必ず置く
+        s = total * np.arange(num) / max(num - 1, 1)
+    x = np.interp(s, cumulative, points[:, 0])
+    y = np.interp(s, cumulative, points[:, 1])
+    edge = np.clip(np.searchsorted(cumulative, s, side="right") - 1, 0, len(edge_sources) - 1)
+    return np.stack([x, y], axis=1), edge_sources[edge]
+
+
+def near_pairs(points, seg_a, seg_b, limits):  # 点と線分の組のうち距離がその線分のlimitより近いもの 戻り値は(点の番号, 線分の番号, 距離)
+    # 線分を外接矩形+limitの範囲の格子に登録し,同じ格子にある点と線分の組だけ距離を計算する
+    if len(points) == 0 or len(seg_a) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    cell = max(float(limits.max()), 1.0)
+    lo = np.floor((np.minimum(seg_a, seg_b) - limits[:, None]) / cell).astype(np.int64)
+    hi = np.floor((np.maximum(seg_a, seg_b) + limits[:, None]) / cell).astype(np.int64)
+    nx = hi[:, 0] - lo[:, 0] + 1
+    ny = hi[:, 1] - lo[:, 1] + 1
+    counts = nx * ny
+    seg = np.repeat(np.arange(len(seg_a)), counts)
+    j = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    cx = lo[seg, 0] + j % nx[seg]
+    cy = lo[seg, 1] + j // nx[seg]
+    seg_keys = cx * (1 << 32) + cy
+    order = np.argsort(seg_keys, kind="stable")
+    seg_keys = seg_keys[order]
+    seg = seg[order]
+
+    p = np.floor(points / cell).astype(np.int64)
+    point_keys = p[:, 0] * (1 << 32) + p[:, 1]
+    first = np.searchsorted(seg_keys, point_keys, side="left")
+    last = np.searchsorted(seg_keys, point_keys, side="right")
+    pair_counts = last - first
+    point = np.repeat(np.arange(len(points)), pair_counts)
+    pair_seg = seg[np.repeat(first, pair_counts) + np.arange(pair_counts.sum()) - np.repeat(np.cumsum(pair_counts) - pair_counts, pair_counts)]
+
+    dist = segment_distances(points[point], seg_a[pair_seg], seg_b[pair_seg])
+    near = dist < limits[pair_seg]
+    return point[near], pair_seg[near], dist[near]
+
+
+def segment_distances(points, seg_a, seg_b):  # 点と線分の距離 点と線分は同じ数だけ並べる
+    d = seg_b - seg_a
+    rel = points - seg_a
+    t = np.clip(np.einsum("ij,ij->i", rel, d) / np.maximum(np.einsum("ij,ij->i", d, d), 1e-12), 0, 1)
+    return np.hypot(rel[:, 0] - t * d[:, 0], rel[:, 1] - t * d[:, 1])
+
+
+def too_close(points, seg_a, seg_b, limits):  # 各点がいずれかの線分にその線分のlimitより近いか
+    result = np.zeros(len(points), dtype=bool)
+    result[near_pairs(points, seg_a, seg_b, limits)[0]] = True
+    return result
+
+
+def path_fence_positions(seg_points, offsets, pitch, tolerance):  # 全配線の折れ線からつながった経路ごとのビア座標をまとめて求める
+    # seg_pointsは配線ごとの始点から終点までの点列,offsetsは配線ごとの中心からビア中心までの距離
+    offsets = np.asarray(offsets, dtype=np.float64)
+    if len(seg_points) == 0:
+        return np.empty((0, 2), dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    starts = np.array([p[0] for p in seg_points])
+    ends = np.array([p[-1] for p in seg_points])
+    positions = []
+    sources = []
+    for path, closed in chain_segments(starts, ends, tolerance):
+        points, edge_sources = path_points(seg_points, path)
+        if len(points) < (4 if closed else 2):
+            continue  # 長さのない経路
+        offset = offsets[[seg for seg, _ in path]].max()  # 経路内で幅が変わる場合は最も広い配線に合わせる
+        for side in (-1, 1):
+            curve, curve_sources = offset_polyline(points, edge_sources, side * offset, closed, tolerance)
+            p, s = place_along(curve, curve_sources, pitch, closed)
+            positions.append(p)
+            sources.append(s)
+    if not positions:
+        return np.empty((0, 2), dtype=np.int64), np.empty(0, dtype=np.int64)
+    positions = np.concatenate(positions)
+    sources = np.concatenate(sources)
+
+    # 内側のオフセット曲線が自己交差する急な屈曲部などで,選択中のいずれかの配線にクリアランスより近づいたビアを除く
+    seg_a = np.concatenate([p[:-1] for p in seg_points])
+    seg_b = np.concatenate([p[1:] for p in seg_points])
+    seg_offsets = np.concatenate([np.full(len(p) - 1, offsets[i]) for i, p in enumerate(seg_points)])
+    keep = ~too_close(positions, seg_a, seg_b, seg_offsets - 2 * tolerance)  # 折れ線近似による誤差は許容する
+    positions = np.trunc(positions[keep]).astype(np.int64)
+    sources = sources[keep]
+
+    # 内側の角では経路に沿った間隔がpitchでも直線距離はpitchより近くなるので,先に置いたビアとpitch未満の距離にあるビアを除く
+    spaced = ViaPositionSet(pitch - 2 * tolerance)
+    keep = np.array([spaced.append(pos) for pos in positions.tolist()], dtype=bool)
+    return positions[keep], sources[keep]
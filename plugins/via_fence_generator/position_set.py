@@ -0,0 +1,41 @@
+class ViaPositionSet:  # 互いに近すぎる座標を登録しない座標リスト
+    # マージ半径を一辺とする格子で空間ハッシュを行い,新しい座標は周囲3x3マスの格子に登録された座標とだけ比較する
+    # 全座標との総当たり比較(O(n^2))を避けるためのもので,登録済み座標との距離判定の結果は総当たりと変わらない
+
+    def __init__(self, merge_radius):
+        self.merge_radius = max(1, int(merge_radius))  # 格子の一辺 0だとゼロ除算になるので最低1nm
+        self.cells = {}       # 格子座標 -> その格子にある座標のリスト
+        self.positions = []   # 登録順に保持した新規座標(既存ビアの座標は含まない)
+        self.comparisons = 0  # 距離計算の回数 ベンチマーク用
+
+    def cell_of(self, pos):
+        return (pos[0] // self.merge_radius, pos[1] // self.merge_radius)  # 負の座標でも//は床関数なので格子が連続する
+
+    def is_near(self, pos):  # 登録済みのいずれかの座標との距離がマージ半径未満か
+        cx, cy = self.cell_of(pos)
+        r2 = self.merge_radius * self.merge_radius
+        for ix in (cx - 1, cx, cx + 1):
+            for iy in (cy - 1, cy, cy + 1):
+                for stored in self.cells.get((ix, iy), ()):
+                    self.comparisons += 1
+                    dx = stored[0] - pos[0]
+                    dy = stored[1] - pos[1]
+                    if dx * dx + dy * dy < r2:  # math.distと同じ判定を平方根なしで行う
+                        return True
+        return False
+
+    def add_existing(self, pos):  # 基板上に既にあるビアの座標を登録 重複判定には使うが新規配置リストには入れない
+        self.cells.setdefault(self.cell_of(pos), []).append((pos[0], pos[1]))
+
+    def append(self, pos):  # 近くに登録済みの座標が無ければ新規座標として登録しTrueを返す
+        if self.is_near(pos):
+            return False  # すでに登録された座標のどれかと距離が近すぎるので新しく登録せずに終了
+        self.cells.setdefault(self.cell_of(pos), []).append((pos[0], pos[1]))
+        self.positions.append(pos)
+        return True
+
+    def __iter__(self):
+        return iter(self.positions)
+
+    def __len__(self):
+        return len(self.positions)
@@ -0,0 +1,132 @@
+import pcbnew
+import numpy as np
+from collections import OrderedDict
+from . import fence
+from .records import FenceRecords
+
+# ダイアログで設定を変えている間にビアの候補位置を仮の円として表示するプレビュー
+# ビアは作らず作図レイヤーに円を置くだけなので,Applyするまで基板のビアもアンドゥ履歴も変わらない
+# pcbnewのPythonからはビューのオーバーレイに描けないので円は基板に置くが,名前の決まったロックしたグループにまとめ,ダイアログから離れるときに消す
+# 候補位置は配線ごとにキャッシュし,選択に加わった配線や形の変わった配線だけを計算し直す
+
+PREVIEW_LAYER = pcbnew.Dwgs_User  # 円を置くレイヤー
+PREVIEW_GROUP_NAME = "Via Fence Preview"  # 円をまとめるグループの名前 前の実行で残ったグループもこの名前で見つけて消す
+MAX_PREVIEW_VIAS = 20000          # これより多い候補は表示しない 円の追加と再描画に時間がかかりすぎるため
+MAX_CACHED_SETTINGS = 8           # 候補位置を覚えておくビア径,クリアランス,間隔の組の数 入力を戻したときに計算し直さずに済む
+
+
+def track_key(track):  # 配線を識別するキー 配線が移動や変形されたら別のキーになる
+    return (track.m_Uuid.AsString(),) + fence.track_geometry(track)
+
+
+class FencePreview:
+    def __init__(self, board, layer=PREVIEW_LAYER):
+        self.board = board
+        self.layer = layer
+        self.shapes = []              # 表示中の円のUUID 利用者が円を削除していることもあるので図形そのものは持たない
+        self.group_uuid = None        # 表示中の円をまとめたグループのUUID
+        self.track_cache = OrderedDict()  # (ビア径, クリアランス, 間隔) -> {配線のキー: 候補座標}
+        self.path_cache = {}          # 経路モードの候補座標 選択全体でしか計算できないので直近の1件だけ覚える
+        self.existing_positions = None  # 基板上の既存ビアの座標
+        self.existing_key = None        # existing_positionsを読んだときの選択中の配線のキー 記録されたビアを除くため選択が変わったら読み直す
+        self.copper_index_key = None
+        self.copper_index = None
+        self.recomputed = 0           # 直近の更新で計算し直した配線の数
+
+    def invalidate_board(self):  # 基板が編集されたかもしれないときに既存ビアと干渉判定用の図形を読み直させる
+        self.existing_positions = None
+        self.existing_key = None
+        self.copper_index_key = None
+        self.copper_index = None
+
+    def per_track_positions(self, tracks, keys, settings):  # 配線ごとのキャッシュを使って選択中の配線の候補座標を選択順に並べる 戻り値は座標と元の配線の番号
+        params = (settings.via_diameter, settings.clearance, settings.pitch)
+        cache = self.track_cache.pop(params, None)
+        if cache is None:
+            cache = {}
+            while len(self.track_cache) >= MAX_CACHED_SETTINGS:
+                self.track_cache.popitem(last=False)  # 最も古い組を捨てる
+        self.track_cache[params] = cache
+
+        missing = [i for i, key in enumerate(keys) if key not in cache]
+        if missing:  # キャッシュに無い配線だけをまとめて配列演算で計算する
+            positions, sources = fence.calc_fence_positions([tracks[i] for i in missing], settings.via_diameter, settings.clearance, settings.pitch)
+            bounds = np.searchsorted(sources, np.arange(len(missing) + 1))  # sourcesは配線番号順に並んでいる
+            for j, i in enumerate(missing):
+                cache[keys[i]] = positions[bounds[j]:bounds[j + 1]]
+        self.recomputed = len(missing)
+        if not keys:
+            return np.empty((0, 2), dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate([cache[key] for key in keys]), np.repeat(np.arange(len(keys)), [len(cache[key]) for key in keys])
+
+    def path_positions(self, tracks, keys, settings):  # 経路モードではつながり方が変わりうるので選択全体を1件としてキャッシュする
+        cache_key = (settings.via_diameter, settings.clearance, settings.pitch, tuple(keys))
+        if cache_key not in self.path_cache:
+            self.path_cache = {cache_key: fence.calc_path_fence_positions(tracks, settings.via_diameter, settings.clearance, settings.pitch)}
+            self.recomputed = len(tracks)
+        else:
+            self.recomputed = 0
+        return self.path_cache[cache_key]
+
+    def fence_positions(self, tracks, settings):  # Applyしたときに置かれるビアの座標
+        keys = [track_key(track) for track in tracks]
+        if settings.connected_path:
+            positions, sources = self.path_positions(tracks, keys, settings)
+        else:
+            positions, sources = self.per_track_positions(tracks, keys, settings)
+        if settings.corridor:  # 束の内側の候補は隣の配線次第で変わるのでキャッシュせずに毎回除く
+            positions = positions[fence.corridor_filter(tracks, positions, sources, settings.via_diameter, settings.clearance, settings.pitch)]
+
+        # 以前に生成したフェンスはApplyで置き換わるので,選択中の配線に記録されたビアは既存ビアとして扱わない
+        if self.existing_key != keys:
+            records = FenceRecords(self.board)
+            groups = fence.board_groups(self.board)
+            replaced = {via_uuid for key in keys if key[0] in records for via_uuid in fence.fence_vias(records.get(key[0]), groups)}
+            self.existing_positions = fence.existing_via_positions(self.board, replaced)
+            self.existing_key = keys
+        copper_index = None
+        if settings.avoid_collisions:
+            index_key = (settings.net_name, settings.start_layer_id, settings.end_layer_id, frozenset(key[0] for key in keys))
+            if index_key != self.copper_index_key:
+                self.copper_index = fence.create_copper_index(self.board, tracks, settings)
+                self.copper_index_key = index_key
+            copper_index = self.copper_index
+        pos_set = fence.create_position_set(self.board, self.existing_positions)
+        fence.filter_positions(positions, pos_set, settings.via_diameter, copper_index)
+        return pos_set.positions
+
+    def show(self, tracks, settings):  # 候補位置に円を表示し直す 表示した円の数を返す
+        positions = self.fence_positions(tracks, settings)
+        self.clear()
+        radius = settings.via_diameter // 2
+        group = pcbnew.PCB_GROUP(self.board)
+        group.SetName(PREVIEW_GROUP_NAME)
+        group.SetLocked(True)  # 円を選択して動かしたり消したりしにくくする
+        self.board.Add(group)
+        self.group_uuid = group.m_Uuid.AsString()
+        for pos in positions[:MAX_PREVIEW_VIAS]:
+            circle = pcbnew.PCB_SHAPE(self.board, pcbnew.SHAPE_T_CIRCLE)
+            circle.SetLayer(self.layer)
+            circle.SetCenter(pcbnew.VECTOR2I(pos[0], pos[1]))
+            circle.SetEnd(pcbnew.VECTOR2I(pos[0] + radius, pos[1]))  # 円周上の1点で半径を決める
+            circle.SetWidth(pcbnew.FromMM(0.05))
+            self.board.Add(circle)  # アンドゥ履歴に残さないようにcommitを使わず直接追加する
+            group.AddItem(circle)
+            self.shapes.append(circle.m_Uuid.AsString())
+        return len(self.shapes)
+
+    def clear(self):  # 表示中の円と前の実行で残ったプレビューのグループを基板から取り除く
+        # 利用者が削除した円はもう解放されているので,まだ基板上にある図形だけをUUIDで探し直して取り除く
+        uuids = set(self.shapes)
+        circles = {drawing.m_Uuid.AsString(): drawing for drawing in self.board.GetDrawings() if drawing.m_Uuid.AsString() in uuids}
+        groups = [group for group in fence.board_groups(self.board).values() if group.m_Uuid.AsString() == self.group_uuid or group.GetName() == PREVIEW_GROUP_NAME]
+        for group in groups:
+            for item in list(group.GetItems()):  # GetItemsは取り除くと変わる集合そのものなので写してから回す
+                group.RemoveItem(item)
+                circles[item.m_Uuid.AsString()] = item
+        for circle in circles.values():
+            self.board.Remove(circle)
+        for group in groups:
+            self.board.Remove(group)
+        self.shapes = []
+        self.group_uuid = None
@@ -0,0 +1,95 @@
+import hashlib
+import json
+
+# 生成したフェンスと元の配線の対応を基板のプロパティ(.kicad_pcbに保存される文字列の辞書)に記録する
+# 配線1本につき1項目で,キーは"via_fence:<配線のUUID>",値はビアを入れたグループのUUID,ビアの数,配線の形のハッシュ,設定のキーのJSON
+# ビアのUUIDは保存せず,配線ごとのグループの中身から読む 設定は同じものを1回だけ"via_fence_settings:<設定のキー>"に保存する
+# 再生成では形か設定が変わった配線の項目だけを読み書きする
+
+PROPERTY_PREFIX = "via_fence:"
+SETTINGS_PREFIX = "via_fence_settings:"
+
+
+def _digest(value):  # JSONにできる値の短いハッシュ
+    return hashlib.sha1(json.dumps(value, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()[:16]
+
+
+def geometry_key(geometry):  # 配線の形(fence.track_geometry)のハッシュ 記録と比べて配線が動いたかを調べる
+    return _digest(list(geometry))
+
+
+def _board_properties(board):  # 基板のプロパティ プロパティを扱えないバージョンではNone
+    get_properties = getattr(board, "GetProperties", None)
+    if get_properties is None or not hasattr(board, "SetProperties"):
+        return None
+    return get_properties()
+
+
+class FenceRecords:
+    def __init__(self, board):
+        self.board = board
+        self.records = {}   # 配線のUUID -> {"geometry": 形のハッシュ, "settings": {...}, "group": グループのUUID, "count": ビアの数}
+        self.settings = {}  # 設定のキー -> 設定の辞書
+        self.changed = {}   # 保存していない変更 プロパティのキー -> JSON文字列 削除はNone
+        properties = _board_properties(board)
+        if properties is None:
+            return
+        stored = {}
+        for key, value in properties.items():
+            key = str(key)
+            try:
+                if key.startswith(SETTINGS_PREFIX):
+                    self.settings[key[len(SETTINGS_PREFIX):]] = json.loads(str(value))
+                elif key.startswith(PROPERTY_PREFIX):
+                    stored[key[len(PROPERTY_PREFIX):]] = json.loads(str(value))
+            except ValueError:  # 手で書き換えられたなどで読めない項目は無視する
+                continue
+        for track_uuid, record in stored.items():
+            settings = record.get("settings")
+            if isinstance(settings, str):
+                settings = self.settings.get(settings)
+            if not isinstance(settings, dict):
+                continue  # 設定の項目が消えていれば再生成できないので無いものとする
+            record["settings"] = settings
+            if isinstance(record.get("geometry"), list):  # 以前の版の記録は形とビアのUUIDをそのまま持つ ビアは"vias"から読む
+                record["geometry"] = geometry_key(record["geometry"])
+            self.records[track_uuid] = record
+
+    def __contains__(self, track_uuid):
+        return track_uuid in self.records
+
+    def get(self, track_uuid):
+        return self.records.get(track_uuid)
+
+    def track_uuids(self):
+        return list(self.records)
+
+    def set(self, track_uuid, geometry, settings, group_uuid, via_count):  # settingsはFenceSettingsを辞書にしたもの group_uuidはこの配線のビアだけを入れたPCB_GROUP
+        settings_key = _digest(settings)
+        if settings_key not in self.settings:
+            self.settings[settings_key] = settings
+            self.changed[SETTINGS_PREFIX + settings_key] = json.dumps(settings, sort_keys=True, separators=(",", ":"))
+        self.records[track_uuid] = {"geometry": geometry_key(geometry), "settings": settings, "group": group_uuid, "count": via_count}
+        self.changed[PROPERTY_PREFIX + track_uuid] = json.dumps(
+            {"geometry": geometry_key(geometry), "settings": settings_key, "group": group_uuid, "count": via_count}, separators=(",", ":"))
+
+    def delete(self, track_uuid):
+        if self.records.pop(track_uuid, None) is not None:
+            self.changed[PROPERTY_PREFIX + track_uuid] = None
+
+    def save(self):  # 変更した項目だけを基板のプロパティに書き込む どの配線からも使われなくなった設定は消す
+        properties = _board_properties(self.board)
+        if properties is None or not self.changed:
+            self.changed = {}
+            return
+        used = {_digest(record["settings"]) for record in self.records.values()}
+        for settings_key in [key for key in self.settings if key not in used]:
+            del self.settings[settings_key]
+            self.changed[SETTINGS_PREFIX + settings_key] = None
+        for key, value in self.changed.items():
+            if value is not None:
+                properties[key] = value
+            elif key in properties:
+                del properties[key]
+        self.board.SetProperties(properties)
+        self.changed = {}
@@ -0,0 +1,44 @@
+from . import fence
+from .. import board_state
+from ..board_state import board_key
+
+# ダイアログの選択肢に使う基板の情報(ゾーンのネットとクリアランス,導体レイヤー,定義済みビアサイズ,層構成)の控え
+# ダイアログを開くたびに全ゾーンと全レイヤーIDを調べ直さないように,基板が変わったときだけ作り直す
+
+
+def choice_counts(board):  # GetTimeStampが無いバージョンでは選択肢に関わる数だけを比べる ゾーンのクリアランスの変更には気付かない
+    return (len(board.Zones()), board.GetCopperLayerCount(), len(board.GetViasDimensionsList()))
+
+
+def board_stamp(board):  # 基板が編集されると変わる値
+    return board_state.board_stamp(board, choice_counts)
+
+
+class BoardSnapshot:
+    def __init__(self, board):
+        self.key = board_key(board)
+        self.stamp = board_stamp(board)
+
+        # ネットのあるゾーンごとのネット名とクリアランス 同じネットのゾーンが複数あればそれぞれ登録する
+        self.zone_nets = []
+        for zone in board.Zones():
+            net_name = zone.GetNetname()
+            if net_name != None and net_name != "":  # ネット無しゾーンは登録しない
+                self.zone_nets.append((net_name, zone.GetLocalClearance()))
+
+        # 有効な導体レイヤーのIDと名前 F.Cu,内層,B.Cuの順
+        self.copper_layers = [(layer_id, board.GetLayerName(layer_id)) for layer_id in fence.copper_layers(board)]
+
+        # 導体レイヤーごとの隣の誘電体の(厚さ, 比誘電率) フェンスの間隔の推奨値の計算に使う
+        self.dielectrics = {layer_id: fence.stackup_dielectric(board, layer_id) for layer_id, _ in self.copper_layers}
+
+        # 定義済みビアサイズの直径と穴径 0個目(最初)はネットクラスの値を使う項目で直径と穴径が0なので除く
+        self.via_sizes = [(via_dimension.m_Diameter, via_dimension.m_Drill) for via_dimension in board.GetViasDimensionsList()
+                          if via_dimension.m_Diameter != 0 and via_dimension.m_Drill != 0]
+
+    def is_current(self, board):  # 作ったときから基板が差し替えられても編集されてもいないか
+        return board_key(board) == self.key and board_stamp(board) == self.stamp
+
+    def touch(self, board):  # 選択肢に関わらない編集(ビアの配置など)の後で今の基板を最新として扱う
+        if board_key(board) == self.key:
+            self.stamp = board_stamp(board)
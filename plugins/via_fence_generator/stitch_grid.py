@@ -0,0 +1,69 @@
+import numpy as np
+from .path import too_close
+
+# ゾーンを埋めるスティッチングビアの候補の計算 pcbnewに依存しない純粋な関数のみを置く
+# 候補の格子を作り,多角形の内外判定と輪郭や障害物からの距離の判定を候補ごとにループせず配列演算でまとめて行う
+# 多角形は閉じた輪郭(穴も含む)の辺を始点の配列seg_aと終点の配列seg_bに並べて表す 単位はすべてnm(KiCadの内部単位)
+
+
+def grid_points(left, top, right, bottom, pitch, staggered=False, origin=(0, 0)):  # 矩形の範囲にある格子点の(N,2)配列
+    # 格子はoriginを通るように置くので,範囲の違うゾーンでも格子点の位置がそろい重なったゾーンで同じ位置を2回数えずに済む
+    # staggered=Trueでは行の間隔をpitch*√3/2にして奇数行をpitch/2ずらす どの格子点も周りの6点からpitchの距離になる
+    row_pitch = pitch * np.sqrt(3) / 2 if staggered else pitch
+    rows = np.arange(np.ceil((top - origin[1]) / row_pitch), np.floor((bottom - origin[1]) / row_pitch) + 1, dtype=np.int64)
+    shifts = np.where(staggered & (rows % 2 == 1), pitch / 2, 0.0)  # 奇数行のずれ
+    first = np.ceil((left - origin[0] - shifts) / pitch).astype(np.int64)
+    counts = np.maximum(np.floor((right - origin[0] - shifts) / pitch).astype(np.int64) - first + 1, 0)
+    row = np.repeat(np.arange(len(rows)), counts)
+    column = first[row] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    x = origin[0] + shifts[row] + column * pitch
+    y = origin[1] + rows[row] * row_pitch
+    return np.trunc(np.stack([x, y], axis=1)).astype(np.int64)
+
+
+def points_inside(points, seg_a, seg_b):  # 各点が多角形の内側にあるか 輪郭が重なった部分は外側になる(偶奇規則)
+    # 点のy座標ごとに水平線と辺の交点を求め,点より右にある交点の数が奇数なら内側とする
+    # 辺ごとにまたぐ水平線だけを数えるので,格子のように同じy座標の点が多いほど速い
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    seg_a = np.asarray(seg_a, dtype=np.float64).reshape(-1, 2)
+    seg_b = np.asarray(seg_b, dtype=np.float64).reshape(-1, 2)
+    if len(points) == 0 or len(seg_a) == 0:
+        return np.zeros(len(points), dtype=bool)
+    ys, point_rows = np.unique(points[:, 1], return_inverse=True)
+    point_rows = point_rows.reshape(-1)
+    first = np.searchsorted(ys, np.minimum(seg_a[:, 1], seg_b[:, 1]), side="left")  # 下端を含み上端を含まない 頂点を通る水平線で2回数えない
+    last = np.searchsorted(ys, np.maximum(seg_a[:, 1], seg_b[:, 1]), side="left")
+    counts = last - first
+    seg = np.repeat(np.arange(len(seg_a)), counts)
+    row = first[seg] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    a = seg_a[seg]
+    d = seg_b[seg] - a
+    x = a[:, 0] + (ys[row] - a[:, 1]) * d[:, 0] / d[:, 1]  # 水平な辺はどの水平線もまたがないのでd[:, 1]は0にならない
+    if len(x) == 0:
+        return np.zeros(len(points), dtype=bool)
+
+    # (行, x座標)の順に並べた交点の中で,点と同じ行にあり点より右にある交点を二分探索で数える
+    low = min(x.min(), points[:, 0].min())
+    span = max(x.max(), points[:, 0].max()) - low + 1
+    keys = np.sort(row * span + (x - low))
+    row_ends = np.searchsorted(keys, (point_rows + 1) * span, side="left")
+    right_of = row_ends - np.searchsorted(keys, point_rows * span + (points[:, 0] - low), side="right")
+    return right_of % 2 == 1
+
+
+def inside_with_margin(points, seg_a, seg_b, margin):  # 各点が多角形の内側にあり,輪郭からmargin以上離れているか ビアが塗りつぶしからはみ出さない位置
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    seg_a = np.asarray(seg_a, dtype=np.float64).reshape(-1, 2)
+    seg_b = np.asarray(seg_b, dtype=np.float64).reshape(-1, 2)
+    inside = points_inside(points, seg_a, seg_b)
+    if margin > 0 and inside.any():
+        inside[inside] = ~too_close(points[inside], seg_a, seg_b, np.full(len(seg_a), float(margin)))
+    return inside
+
+
+def polygon_edges(rings):  # 閉じた輪郭の点列のリストから辺の始点と終点の配列を作る
+    rings = [np.asarray(ring, dtype=np.float64).reshape(-1, 2) for ring in rings]
+    rings = [ring for ring in rings if len(ring) >= 3]
+    if not rings:
+        return np.empty((0, 2)), np.empty((0, 2))
+    return np.concatenate(rings), np.concatenate([np.roll(ring, -1, axis=0) for ring in rings])  # 最後の点から最初の点へ戻る辺も含める
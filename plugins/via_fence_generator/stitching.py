@@ -0,0 +1,210 @@
+import pcbnew
+import numpy as np
+from ..board_commit import BatchCommit
+from .. import profiling
+from . import fence
+from . import geometry
+from . import path
+from . import stitch_grid
+
+# ゾーンを格子状のスティッチングビアで埋める処理のうち基板を扱う部分 wxに依存しないのでダイアログからもヘッドレス実行からも使える
+# ビアのサイズ,タイプ,レイヤーペア,ネットはビアフェンスと同じFenceSettingsで指定し,間隔settings.pitchで格子を作る
+# 候補の内外判定と干渉判定はstitch_gridで配列演算としてまとめて行い,pcbnewを呼ぶのは図形ごとに1回だけにする
+
+def grid_origin(brd):  # 格子の基準点 グリッド原点に合わせてビアを並べる
+    try:
+        origin = brd.GetDesignSettings().GetGridOrigin()
+    except AttributeError:  # グリッド原点をPythonから読めないバージョン
+        return (0, 0)
+    return (origin.x, origin.y)
+
+
+def stitch_pitch(settings):  # 格子の間隔 0やビアの直径より狭い指定は隙間なく並べる間隔にする
+    return geometry.fence_pitch(settings.via_diameter, settings.pitch)
+
+
+def stitch_zones_of_net(brd, net_name):  # ネットがnet_nameの導体ゾーン キープアウトとネット無しのゾーンは除く
+    if not net_name:
+        return []
+    return [zone for zone in brd.Zones() if not zone.GetIsRuleArea() and zone.GetNetname() == net_name]
+
+
+def poly_set_rings(poly_set):  # SHAPE_POLY_SETの輪郭と穴の点列のリスト
+    rings = []
+    for i in range(poly_set.OutlineCount()):
+        chains = [poly_set.Outline(i)] + [poly_set.Hole(i, h) for h in range(poly_set.HoleCount(i))]
+        for chain in chains:
+            rings.append([(point.x, point.y) for point in (chain.CPoint(k) for k in range(chain.PointCount()))])
+    return rings
+
+
+def poly_set_edges(poly_set):
+    return stitch_grid.polygon_edges(poly_set_rings(poly_set))
+
+
+def zone_candidates(zone, layers, pitch, staggered, origin, radius):  # ゾーンの外接矩形の格子点のうち,ゾーンのすべてのlayersで塗りつぶしの内側にありビアがはみ出さないもの
+    bbox = zone.GetBoundingBox()
+    points = stitch_grid.grid_points(bbox.GetLeft(), bbox.GetTop(), bbox.GetRight(), bbox.GetBottom(), pitch, staggered, origin)
+    for layer_id in layers:
+        seg_a, seg_b = poly_set_edges(zone.GetFilledPolysList(layer_id))
+        points = points[stitch_grid.inside_with_margin(points, seg_a, seg_b, radius)]
+    return points
+
+
+class CopperObstacles:  # ビアと干渉しうる基板上の図形を線分と多角形の配列に詰めたもの
+    # 線分はビアの中心が近づいてはいけない距離limitsと組にし,多角形(パッドとキープアウト)は内側にもビアを置かない
+    # fence.CopperIndexと同じ図形を対象にするが,候補ごとにHitTestを呼ばずに全候補をまとめて判定する
+    def __init__(self, board, via_net_code, via_layers, via_clearance, radius, max_error):
+        self.seg_a = []
+        self.seg_b = []
+        self.limits = []
+        self.polygons = []  # (外接矩形(left, top, right, bottom), 辺の始点, 辺の終点)
+        via_layers = list(via_layers)
+
+        def item_layer(item):  # 図形のあるビアのレイヤー 無ければNone
+            return next((layer_id for layer_id in via_layers if item.IsOnLayer(layer_id)), None)
+
+        def own_clearance(item, layer_id):  # 図形側のネットクラスのクリアランスとビア側のクリアランスの大きい方
+            try:
+                return max(via_clearance, item.GetOwnClearance(layer_id))
+            except (AttributeError, TypeError):
+                return via_clearance
+
+        for item in board.GetTracks():
+            layer_id = item_layer(item)
+            if layer_id is None:
+                continue
+            same_net = item.GetNetCode() == via_net_code and via_net_code > 0
+            if item.GetClass() == "PCB_VIA":  # 同じネットのビアにも重ねない
+                pos = item.GetPosition()
+                self.add_segments([(pos.x, pos.y)], [(pos.x, pos.y)], item.GetWidth() // 2 + radius + (0 if same_net else own_clearance(item, layer_id)))
+                continue
+            if same_net:  # 同じネットの配線とはぶつかってもよい
+                continue
+            limit = item.GetWidth() // 2 + radius + own_clearance(item, layer_id)
+            if item.GetClass() == "PCB_ARC":
+                center = item.GetCenter()
+                points = path.arc_points((center.x, center.y), item.GetRadius(), item.GetArcAngleStart().AsRadians(), item.GetAngle().AsRadians(), max_error)
+                self.add_segments(points[:-1], points[1:], limit + max_error)  # 弦は円弧の内側を通るので誤差の分だけ広げる
+            else:
+                start = item.GetStart()
+                end = item.GetEnd()
+                self.add_segments([(start.x, start.y)], [(end.x, end.y)], limit)
+
+        # パッドは同じネットでも内側には置かない(パッドの中のビアは意図しないはんだの吸い込みを招く)
+        for pad in board.GetPads():
+            layer_id = item_layer(pad)
+            if layer_id is None:
+                continue
+            poly_set = pcbnew.SHAPE_POLY_SET()
+            pad.TransformShapeToPolygon(poly_set, layer_id, 0, max_error, pcbnew.ERROR_OUTSIDE)
+            same_net = pad.GetNetCode() == via_net_code and via_net_code > 0
+            self.add_polygon(pad.GetBoundingBox(), poly_set, radius + (0 if same_net else own_clearance(pad, layer_id)))
+
+        # ビアを禁止したルールエリア(キープアウト)
+        for zone in board.Zones():
+            if zone.GetIsRuleArea() and zone.GetDoNotAllowVias() and item_layer(zone) is not None:
+                self.add_polygon(zone.GetBoundingBox(), zone.Outline(), radius)
+
+        # 基板外形の内側だけに置き,外形からは導体と基板端のクリアランスだけ離す 外形が閉じていない基板では判定しない
+        self.outline = None
+        outline = pcbnew.SHAPE_POLY_SET()
+        if board.GetBoardPolygonOutlines(outline) and outline.OutlineCount() > 0:
+            self.outline = poly_set_edges(outline)
+            self.add_segments(self.outline[0], self.outline[1], radius + board.GetDesignSettings().m_CopperEdgeClearance)
+
+        self.seg_a = np.concatenate(self.seg_a) if self.seg_a else np.empty((0, 2))
+        self.seg_b = np.concatenate(self.seg_b) if self.seg_b else np.empty((0, 2))
+        self.limits = np.concatenate(self.limits) if self.limits else np.empty(0)
+
+    def add_segments(self, seg_a, seg_b, limit):
+        seg_a = np.asarray(seg_a, dtype=np.float64).reshape(-1, 2)
+        self.seg_a.append(seg_a)
+        self.seg_b.append(np.asarray(seg_b, dtype=np.float64).reshape(-1, 2))
+        self.limits.append(np.full(len(seg_a), float(limit)))
+
+    def add_polygon(self, bbox, poly_set, limit):  # 輪郭からlimit以上離し,内側にも置かない
+        seg_a, seg_b = poly_set_edges(poly_set)
+        if len(seg_a) == 0:
+            return
+        self.add_segments(seg_a, seg_b, limit)
+        self.polygons.append(((bbox.GetLeft(), bbox.GetTop(), bbox.GetRight(), bbox.GetBottom()), seg_a, seg_b))
+
+    def clear(self, points):  # 各候補が何とも干渉しないか
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        keep = ~path.too_close(points, self.seg_a, self.seg_b, self.limits)
+        if self.outline is not None:
+            keep &= stitch_grid.points_inside(points, *self.outline)
+        for (left, top, right, bottom), seg_a, seg_b in self.polygons:  # 多角形ごとに外接矩形の中の候補だけを内外判定する
+            near = np.flatnonzero(keep & (points[:, 0] >= left) & (points[:, 0] <= right) & (points[:, 1] >= top) & (points[:, 1] <= bottom))
+            if len(near):
+                keep[near[stitch_grid.points_inside(points[near], seg_a, seg_b)]] = False
+        return keep
+
+
+def stitch_group_name(settings):  # スティッチングビアのグループ名 生成時のパラメータがわかるようにする
+    return "Via Stitching {} {}/{} mm pitch {} mm".format(
+        settings.net_name or "(no net)", pcbnew.ToMM(settings.via_diameter), pcbnew.ToMM(settings.via_drill), pcbnew.ToMM(stitch_pitch(settings)))
+
+
+def stitch_zones(brd, zones, settings, staggered=False, timer=profiling.DISABLED):  # ゾーンをスティッチングビアで埋め,配置したビアの数を返す
+    added, _ = fence.run_steps(stitch_steps(brd, zones, settings, staggered, timer))
+    return added
+
+
+def stitch_steps(brd, zones, settings, staggered=False, timer=profiling.DISABLED):  # stitch_zonesを区切りごとに進める生成器
+    # fence.fence_stepsと同じく区切るたびに(済んだ量, 全体の量)をyieldし,基板への反映は最後の区切りでまとめて行う 戻り値も同じく(追加したビアの数, 削除したビアの数=0)
+    # ゾーンごとの候補の計算,干渉判定,ビアの生成の3段階をゾーンの数ずつ数える
+    radius = settings.via_diameter // 2
+    pitch = stitch_pitch(settings)
+    origin = grid_origin(brd)
+    layers = fence.via_layers(brd, settings)
+    done = 0
+    total = 3 * len(zones)
+
+    parts = []
+    for zone in zones:
+        zone_layers = [layer_id for layer_id in layers if zone.IsOnLayer(layer_id)]  # ビアが貫通しないレイヤーの塗りつぶしはつながらないので見ない
+        if zone_layers:
+            with timer.phase("geometry"):
+                parts.append(zone_candidates(zone, zone_layers, pitch, staggered, origin, radius))
+        done += 1
+        yield done, total
+    # 格子はグリッド原点にそろえてあるので,重なったゾーンの同じ位置の候補は1つにまとめられる
+    positions = np.unique(np.concatenate(parts), axis=0) if parts else np.empty((0, 2), dtype=np.int64)
+    timer.count("zones", len(zones))
+    timer.count("candidates", len(positions))
+
+    with timer.phase("copper_index"):
+        net = brd.FindNet(settings.net_name)
+        obstacles = CopperObstacles(brd, net.GetNetCode() if net is not None else 0, layers,
+                                    max(settings.clearance, fence.via_net_clearance(brd, settings.net_name)), radius,
+                                    getattr(brd.GetDesignSettings(), "m_MaxError", pcbnew.FromMM(0.005)))
+    kept = []
+    chunk = fence.CHUNK_SIZE * 10
+    for start in range(0, len(positions), chunk):  # 候補ごとの判定は独立しているので分けても結果は同じ
+        with timer.phase("dedup"):
+            kept.append(positions[start:start + chunk][obstacles.clear(positions[start:start + chunk])])
+        yield done + len(zones) * min(start + chunk, len(positions)) // len(positions), total
+    done += len(zones)
+    positions = np.concatenate(kept) if kept else np.empty((0, 2), dtype=np.int64)
+
+    commit = BatchCommit(brd, "Via Stitching")
+    group = None
+    for start in range(0, len(positions), fence.CHUNK_SIZE):
+        with timer.phase("create_via"):
+            for pos in positions[start:start + fence.CHUNK_SIZE].tolist():
+                via = fence.create_via(brd, pos, settings.via_diameter, settings.via_drill, settings.net_name, settings.is_free, settings.via_type,
+                                       settings.start_layer_id, settings.end_layer_id, settings.remove_unconnected_annular_ring, commit)
+                if group is None:
+                    group = pcbnew.PCB_GROUP(brd)
+                    group.SetName(stitch_group_name(settings))
+                commit.AddToGroup(group, via)
+        yield done + len(zones) * min(start + fence.CHUNK_SIZE, len(positions)) // len(positions), total
+    if group is not None:
+        commit.Add(group)  # グループはビアを入れた後で追加する
+
+    with timer.phase("commit"):
+        commit.Push()
+    timer.count("vias", len(positions))
+    return len(positions), 0
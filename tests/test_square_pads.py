@@ -0,0 +1,198 @@
+import importlib.util
+import math
+import os
+import types
+
+import pytest
+
+shapely = pytest.importorskip("shapely")
+from shapely.geometry import Point, Polygon  # noqa: E402
+from shapely.ops import unary_union  # noqa: E402
+
+# 四角い配線の端をパッドの輪郭で削る処理(square_track_generator/pads.py)の確認
+# pcbnewの代わりに,多角形の演算をshapelyで行う最小限の偽物を使う
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MM = 1000000
+
+
+class VECTOR2I:
+    def __init__(self, x, y):
+        self.x = int(x)
+        self.y = int(y)
+
+
+class SHAPE_LINE_CHAIN:
+    def __init__(self, points=()):
+        self.points = list(points)
+
+    def Append(self, x, y):
+        self.points.append((x, y))
+
+    def SetClosed(self, closed):
+        pass
+
+    def PointCount(self):
+        return len(self.points)
+
+    def CPoint(self, i):
+        return VECTOR2I(*self.points[i])
+
+
+class SHAPE_POLY_SET:
+    PM_FAST = 0
+
+    def __init__(self, other=None):
+        self.geometry = other.geometry if other is not None else Polygon()
+
+    def polygons(self):
+        geometry = self.geometry
+        return [g for g in getattr(geometry, "geoms", [geometry]) if g.geom_type == "Polygon" and not g.is_empty]
+
+    def AddOutline(self, chain):
+        self.geometry = unary_union([self.geometry, Polygon(chain.points)])
+
+    def BooleanAdd(self, other):
+        self.geometry = self.geometry.union(other.geometry)
+
+    def BooleanSubtract(self, other):
+        self.geometry = self.geometry.difference(other.geometry)
+
+    def BooleanIntersection(self, other):
+        self.geometry = self.geometry.intersection(other.geometry)
+
+    def Contains(self, point):
+        return self.geometry.covers(Point(point.x, point.y))
+
+    def OutlineCount(self):
+        return len(self.polygons())
+
+    def Outline(self, i):
+        return SHAPE_LINE_CHAIN(self.polygons()[i].exterior.coords[:-1])
+
+    def HoleCount(self, i):
+        return len(self.polygons()[i].interiors)
+
+    def Hole(self, i, h):
+        return SHAPE_LINE_CHAIN(self.polygons()[i].interiors[h].coords[:-1])
+
+
+class KIID:
+    def __init__(self, name):
+        self.name = name
+
+    def AsString(self):
+        return self.name
+
+
+class PAD:  # 丸いパッド
+    def __init__(self, center, radius, net_code=1, layer=0):
+        self.center = center
+        self.radius = radius
+        self.net_code = net_code
+        self.layer = layer
+        self.m_Uuid = KIID("pad")
+
+    def GetNetCode(self):
+        return self.net_code
+
+    def IsOnLayer(self, layer):
+        return layer == self.layer
+
+    def GetBoundingBox(self):
+        box = types.SimpleNamespace()
+        box.GetLeft = lambda: self.center[0] - self.radius
+        box.GetRight = lambda: self.center[0] + self.radius
+        box.GetTop = lambda: self.center[1] - self.radius
+        box.GetBottom = lambda: self.center[1] + self.radius
+        return box
+
+    def TransformShapeToPolygon(self, poly_set, layer, clearance, max_error, error_loc):
+        poly_set.geometry = Point(self.center).buffer(self.radius + clearance, quad_segs=32)  # 頂点は円周上にある(ERROR_INSIDE)
+
+
+class PCB_TRACK:
+    def __init__(self, start, end, width, net_code=1, layer=0):
+        self.start = VECTOR2I(*start)
+        self.end = VECTOR2I(*end)
+        self.width = width
+        self.net_code = net_code
+        self.layer = layer
+
+    def GetClass(self):
+        return "PCB_TRACK"
+
+    def GetStart(self):
+        return self.start
+
+    def GetEnd(self):
+        return self.end
+
+    def GetWidth(self):
+        return self.width
+
+    def GetLayer(self):
+        return self.layer
+
+    def GetNetCode(self):
+        return self.net_code
+
+
+class BOARD:
+    def __init__(self, pads):
+        self.pads = pads
+
+    def GetPads(self):
+        return list(self.pads)
+
+
+@pytest.fixture
+def pads(monkeypatch):  # 偽物のpcbnewでpads.pyを読み込む
+    fake = types.ModuleType("pcbnew")
+    fake.VECTOR2I = VECTOR2I
+    fake.SHAPE_LINE_CHAIN = SHAPE_LINE_CHAIN
+    fake.SHAPE_POLY_SET = SHAPE_POLY_SET
+    fake.ERROR_INSIDE = 0
+    fake.FromMM = lambda mm: int(round(mm * MM))
+    monkeypatch.setitem(__import__("sys").modules, "pcbnew", fake)
+    spec = importlib.util.spec_from_file_location("square_pads", os.path.join(ROOT, "plugins", "square_track_generator", "pads.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def square_track(track):  # 端を丸めない配線の輪郭
+    poly_set = SHAPE_POLY_SET()
+    start, end = track.GetStart(), track.GetEnd()
+    length = math.hypot(end.x - start.x, end.y - start.y)
+    nx, ny = -(end.y - start.y) / length * track.GetWidth() / 2, (end.x - start.x) / length * track.GetWidth() / 2
+    poly_set.geometry = Polygon([(start.x + nx, start.y + ny), (end.x + nx, end.y + ny), (end.x - nx, end.y - ny), (start.x - nx, start.y - ny)])
+    return poly_set
+
+
+def clip(pads, track, pad):
+    poly_set = square_track(track)
+    index = pads.PadIndex(BOARD([pad]), [track], MM // 1000)
+    assert pads.clip_track_ends(track, poly_set, index)
+    return poly_set
+
+
+def test_angled_entry_keeps_copper_between_outline_and_bbox(pads):
+    # 中心で終わり45度で出ていく配線 輪郭の外で外接矩形の内側にある部分も配線とつながったまま残る
+    pad = PAD((0, 0), MM)
+    track = PCB_TRACK((0, 0), (3 * MM, 3 * MM), MM // 2)
+    poly_set = clip(pads, track, pad)
+    assert poly_set.Contains(VECTOR2I(0.85 * MM, 0.85 * MM))  # 中心から1.2mm 輪郭の外で外接矩形の内側
+    assert poly_set.geometry.geom_type == "Polygon"
+    assert poly_set.geometry.area == pytest.approx(square_track(track).geometry.area, rel=1e-3)
+
+
+def test_corner_outside_outline_is_clipped(pads):
+    # 輪郭の近くで終わり真上へ出ていく配線 端面の角のパッドからはみ出す部分は削る
+    pad = PAD((0, 0), MM)
+    track = PCB_TRACK((0.9 * MM, 0), (0.9 * MM, 3 * MM), MM // 2)
+    poly_set = clip(pads, track, pad)
+    assert not poly_set.Contains(VECTOR2I(1.1 * MM, 0.01 * MM))
+    assert poly_set.Contains(VECTOR2I(0.9 * MM, 0.01 * MM))
+    assert poly_set.Contains(VECTOR2I(0.9 * MM, 0.5 * MM))  # 中心線が輪郭を出た先は残す
+    assert poly_set.geometry.geom_type == "Polygon"